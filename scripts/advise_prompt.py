@@ -7,27 +7,39 @@ language to visualize the intent for image generation.
 
 Usage:
     python scripts/advise_prompt.py --prompt "A futuristic city"
+    python scripts/advise_prompt.py --prompt "A futuristic city" --stream
     mise run advise-prompt -- --prompt "A warrior in battle"
 """
 
 import argparse
-import os
 import sys
+import time
 
-try:
-    from openai import OpenAI
-except ImportError:
-    print("Error: openai package not installed. Run: pip install openai", file=sys.stderr)
-    sys.exit(1)
+import daemon_client
+
+if __name__ == "__main__":
+    # Hand the run to a warm image daemon when one is listening (see image_daemon.py)
+    daemon_client.delegate("advise")
+
+import cassette
+from providers import novita_chat_client, require_env, stream_chat
+import rate_limit
+import tracing
+
+
+def _print_delta(delta: str):
+    sys.stdout.write(delta)
+    sys.stdout.flush()
 
 
-def advise_prompt(prompt_idea: str, api_key: str) -> str:
+def advise_prompt(prompt_idea: str, api_key: str, stream: bool = False) -> str:
     """
     Get advice on improving an image generation prompt using Kimi K2.5.
 
     Args:
         prompt_idea: The user's initial prompt idea
         api_key: Novita.ai API key
+        stream: Print the advice to stdout token by token as it arrives
 
     Returns:
         Advice on how to improve the prompt
@@ -35,10 +47,7 @@ def advise_prompt(prompt_idea: str, api_key: str) -> str:
     Raises:
         RuntimeError: If API call fails
     """
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://api.novita.ai/openai"
-    )
+    client = novita_chat_client(api_key)
 
     system_prompt = """You are an expert image generation prompt advisor. Your task is to analyze a user's prompt idea and provide constructive feedback on how they can use better, more descriptive language to visualize their intent.
 
@@ -61,45 +70,74 @@ Keep your advice practical and actionable. Be encouraging while being specific."
     print(f"Your prompt idea: {prompt_idea}")
     print()
 
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Please provide advice on this image generation prompt:\n\n{prompt_idea}"}
+    ]
+
     try:
-        response = client.chat.completions.create(
-            model="moonshotai/kimi-k2.5",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Please provide advice on this image generation prompt:\n\n{prompt_idea}"}
-            ],
-            max_tokens=1024,
-            temperature=0.7
-        )
-
-        advice = response.choices[0].message.content.strip()
-        return advice
+        with tracing.span("advise", provider="novita", model="moonshotai/kimi-k2.5", stream=stream) as span:
+            if stream:
+                start_time = time.time()
+                advice, first_token, _ = stream_chat(
+                    client,
+                    on_delta=_print_delta,
+                    model="moonshotai/kimi-k2.5",
+                    messages=messages,
+                    max_tokens=1024,
+                    temperature=0.7
+                )
+                print()
+                span.set(first_token_s=first_token)
+                if first_token is not None:
+                    print(f"\n⏱ First token {first_token:.2f}s, total {time.time() - start_time:.2f}s")
+                return advice.strip()
+
+            with rate_limit.slot("novita:chat"):
+                response = client.chat.completions.create(
+                    model="moonshotai/kimi-k2.5",
+                    messages=messages,
+                    max_tokens=1024,
+                    temperature=0.7
+                )
+
+            advice = response.choices[0].message.content.strip()
+            if response.usage is not None:
+                span.set(completion_tokens=response.usage.completion_tokens)
+            return advice
 
     except Exception as e:
         raise RuntimeError(f"Prompt advice request failed: {e}")
 
 
-def main():
+def main(argv: list = None):
     """CLI for getting prompt advice."""
     parser = argparse.ArgumentParser(description="Get prompt advice using Kimi K2.5")
     parser.add_argument("--prompt", required=True, help="Your prompt idea to get advice on")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Show the advice token by token as Kimi K2.5 writes it",
+    )
+    tracing.add_trace_argument(parser)
+    cassette.add_cassette_arguments(parser)
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    tracing.configure(args)
+    cassette.configure(args)
 
     # Get API key from environment
-    api_key = os.environ.get("NOVITA_API_KEY")
-    if not api_key:
-        print(
-            "Error: NOVITA_API_KEY environment variable not set",
-            file=sys.stderr,
-        )
-        print(
-            "Run: export NOVITA_API_KEY=$(sops -d secrets.yaml | yq .novita_api_key)",
-            file=sys.stderr,
-        )
-        sys.exit(1)
+    api_key = require_env("NOVITA_API_KEY", "novita_api_key")
 
     try:
+        if args.stream:
+            print("=" * 80)
+            print("PROMPT ADVICE:")
+            print("=" * 80)
+            advise_prompt(args.prompt, api_key, stream=True)
+            print()
+            return
+
         advice = advise_prompt(args.prompt, api_key)
 
         print("=" * 80)
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the generation pipeline against local mock providers.
+
+Starts mock_providers.py in-process, then runs each scenario in a fresh
+Python subprocess pointed at it (so peak RSS and connection pools are per
+scenario, and the mock's own memory is not counted):
+
+  single-hunyuan   enhance -> submit -> poll -> download
+  single-openai    enhance -> DALL-E -> download
+  single-gemini    enhance -> Gemini inline image
+  batch-hunyuan    --jobs prompts through the concurrent batch mode
+
+For each scenario it reports wall time, jobs/sec, per-phase timings, polls per
+job, bytes transferred and peak RSS. --json writes the same data to a file so
+runs can be compared before and after a change to polling, pooling or caching.
+
+--replay also records each scenario to a cassette (see cassette.py) and
+replays it offline at full speed, checking that the replay writes the same
+images without a single request reaching the mock, and reports its wall time
+next to the recorded run's.
+
+Usage:
+    python scripts/bench_pipeline.py
+    python scripts/bench_pipeline.py --jobs 16 --concurrency 8 --queue-delay 3 --render-delay 5
+    python scripts/bench_pipeline.py --scenarios batch-hunyuan --error-rate 0.05 --json bench.json
+    python scripts/bench_pipeline.py --scenarios batch-hunyuan --jobs 2 --replay
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.request import urlopen
+
+from mock_providers import MockConfig, start_server
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+SCENARIOS = ("single-hunyuan", "single-openai", "single-gemini", "batch-hunyuan")
+
+
+def load_script(filename: str):
+    """Import a hyphenated script (e.g. generate-image-hunyuan.py) as a module."""
+    spec = importlib.util.spec_from_file_location(filename.replace("-", "_")[:-3], SCRIPTS_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class PhaseTimer:
+    """Collects wall-clock durations of wrapped functions by phase name."""
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+
+    def wrap(self, module, name: str, phase: str):
+        original = getattr(module, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.durations[phase].append(time.perf_counter() - start)
+
+        setattr(module, name, timed)
+
+    def summary(self) -> dict:
+        return {
+            phase: {
+                "count": len(values),
+                "total_s": round(sum(values), 3),
+                "mean_s": round(sum(values) / len(values), 3),
+                "max_s": round(max(values), 3),
+            }
+            for phase, values in sorted(self.durations.items())
+        }
+
+
+def run_scenario(scenario: str, jobs: int, concurrency: int, poll_interval: float) -> dict:
+    """Run one scenario in this process (called in the benchmark subprocess)."""
+    import enhance_prompt
+    import providers
+
+    timer = PhaseTimer()
+    timer.wrap(enhance_prompt, "enhance_prompt", "enhance")
+    timer.wrap(enhance_prompt, "enhance_prompts", "enhance_batch")
+    timer.wrap(providers, "submit_generation", "submit")
+    timer.wrap(providers, "get_task_result", "queue_render")
+    timer.wrap(providers, "poll_task", "poll")
+    timer.wrap(providers, "download_image", "download")
+    timer.wrap(providers, "render_dalle", "render_total")
+    timer.wrap(providers, "render_gemini", "render_total")
+
+    out_dir = Path(tempfile.mkdtemp(prefix="bench-"))
+    failures = 0
+    start = time.perf_counter()
+
+    if scenario == "batch-hunyuan":
+        # Loaded after wrapping, so the script imports the timed functions
+        hunyuan = load_script("generate-image-hunyuan.py")
+        batch = [
+            {
+                "prompt": f"benchmark prompt {i}",
+                "output": str(out_dir / f"{i}.png"),
+                "size": "1024x1024",
+                "seed": -1,
+            }
+            for i in range(jobs)
+        ]
+        failures = asyncio.run(
+            hunyuan.run_batch("bench", batch, concurrency=concurrency, poll_interval=poll_interval)
+        )
+    else:
+        jobs = 1
+        try:
+            prompt = enhance_prompt.enhance_prompt("benchmark prompt", "bench")
+            output_path = out_dir / "single.png"
+            if scenario == "single-hunyuan":
+                providers.render_hunyuan("bench", prompt, output_path, poll_interval=poll_interval)
+            elif scenario == "single-openai":
+                providers.render_dalle("bench", prompt, output_path, size="1024x1024")
+            else:
+                providers.render_gemini("bench", prompt, output_path)
+        except Exception as e:
+            print(f"Error: {scenario}: {e}", file=sys.stderr)
+            failures = 1
+
+    wall = time.perf_counter() - start
+    digest = hashlib.sha256()
+    for path in sorted(out_dir.iterdir()):
+        digest.update(path.name.encode("utf-8") + b"\0" + path.read_bytes())
+    return {
+        "scenario": scenario,
+        "jobs": jobs,
+        "failed": failures,
+        "wall_s": round(wall, 3),
+        "jobs_per_s": round((jobs - failures) / wall, 3) if wall else 0.0,
+        "outputs_sha256": digest.hexdigest(),
+        "phases": timer.summary(),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def mock_stats(base_url: str) -> dict:
+    with urlopen(f"{base_url}/_stats") as response:
+        return json.loads(response.read())
+
+
+def run_child(scenario: str, args, env: dict):
+    """Run one scenario in a fresh interpreter; return its result, or None if it crashed."""
+    proc = subprocess.run(
+        [
+            sys.executable,
+            __file__,
+            "--run-scenario",
+            scenario,
+            "--jobs",
+            str(args.jobs),
+            "--concurrency",
+            str(args.concurrency),
+            "--poll-interval",
+            str(args.poll_interval),
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(f"Error: {scenario} crashed:\n{proc.stderr}", file=sys.stderr)
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def check_replay(scenario: str, args, env: dict, recorded: dict, cassette_path: Path, base_url: str) -> dict:
+    """Replay a recorded scenario offline and compare it with the recorded run."""
+    with tempfile.TemporaryDirectory(prefix="bench-cache-") as cache:
+        before = mock_stats(base_url)
+        replayed = run_child(scenario, args, dict(env, WORKFORT_REPLAY=str(cassette_path), WORKFORT_CACHE_DIR=cache))
+        after = mock_stats(base_url)
+
+    if replayed is None:
+        return {"wall_s": None, "matches": False, "requests": None}
+    return {
+        "wall_s": replayed["wall_s"],
+        "matches": replayed["failed"] == recorded["failed"]
+        and replayed["outputs_sha256"] == recorded["outputs_sha256"],
+        "requests": sum(after["requests"].values()) - sum(before["requests"].values()),
+    }
+
+
+def bench(args) -> list:
+    """Start the mock server and run every requested scenario in a subprocess."""
+    config = MockConfig(
+        queue_delay=args.queue_delay,
+        render_delay=args.render_delay,
+        chat_delay=args.chat_delay,
+        token_delay=args.token_delay,
+        reply_words=args.reply_words,
+        error_rate=args.error_rate,
+        payload_bytes=args.payload_kb * 1024,
+    )
+    server = start_server(config)
+    host, port = server.server_address
+    base_url = f"http://{host}:{port}"
+
+    env = dict(
+        os.environ,
+        NOVITA_BASE_URL=base_url,
+        OPENAI_BASE_URL=f"{base_url}/v1",
+        GEMINI_BASE_URL=base_url,
+        NOVITA_API_KEY="bench",
+        OPENAI_API_KEY="bench",
+        GEMINI_API_KEY="bench",
+    )
+
+    cassettes = tempfile.TemporaryDirectory(prefix="bench-cassettes-")
+    results = []
+    for scenario in args.scenarios:
+        cassette_path = Path(cassettes.name) / f"{scenario}.json"
+        with tempfile.TemporaryDirectory(prefix="bench-cache-") as cache:
+            scenario_env = dict(env)
+            if not args.warm_cache:
+                scenario_env["WORKFORT_CACHE_DIR"] = cache
+            if args.replay:
+                scenario_env["WORKFORT_RECORD"] = str(cassette_path)
+
+            before = mock_stats(base_url)
+            result = run_child(scenario, args, scenario_env)
+            after = mock_stats(base_url)
+
+        if result is None:
+            continue
+
+        polls = after["requests"].get("task-result", 0) - before["requests"].get("task-result", 0)
+        result["polls_per_job"] = round(polls / result["jobs"], 1) if "hunyuan" in scenario else None
+        result["bytes_in"] = after["bytes_in"] - before["bytes_in"]
+        result["bytes_out"] = after["bytes_out"] - before["bytes_out"]
+        if args.replay:
+            result["replay"] = check_replay(scenario, args, env, result, cassette_path, base_url)
+        results.append(result)
+
+    server.shutdown()
+    cassettes.cleanup()
+    return results
+
+
+def print_report(results: list):
+    print(
+        f"{'scenario':16} {'jobs':>4} {'fail':>4} {'wall':>8} {'jobs/s':>7} "
+        f"{'polls/job':>9} {'MB moved':>9} {'RSS MB':>7}"
+    )
+    for r in results:
+        polls = f"{r['polls_per_job']:.1f}" if r["polls_per_job"] is not None else "-"
+        moved = (r["bytes_in"] + r["bytes_out"]) / 1024 / 1024
+        print(
+            f"{r['scenario']:16} {r['jobs']:>4} {r['failed']:>4} {r['wall_s']:>7.2f}s {r['jobs_per_s']:>7.2f} "
+            f"{polls:>9} {moved:>9.1f} {r['peak_rss_mb']:>7.1f}"
+        )
+        for phase, stats in r["phases"].items():
+            print(
+                f"    {phase:14} n={stats['count']:<4} mean {stats['mean_s']:.3f}s  "
+                f"max {stats['max_s']:.3f}s  total {stats['total_s']:.3f}s"
+            )
+        replay = r.get("replay")
+        if replay is not None:
+            if replay["wall_s"] is None:
+                print("    replay         crashed")
+            else:
+                verdict = "same images" if replay["matches"] else "DIFFERENT images"
+                print(
+                    f"    replay         {replay['wall_s']:.2f}s vs {r['wall_s']:.2f}s recorded, "
+                    f"{verdict}, {replay['requests']} requests to the mock"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the image pipeline against local mock providers")
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help=f"Comma-separated scenarios (default: all of {', '.join(SCENARIOS)})",
+    )
+    parser.add_argument("--jobs", type=int, default=8, help="Jobs in the batch scenario (default: 8)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Batch concurrency (default: 4)")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="Shortest gap between polls (default: 0.5)")
+    parser.add_argument("--queue-delay", type=float, default=1.0, help="Mock queue time in seconds (default: 1)")
+    parser.add_argument("--render-delay", type=float, default=2.0, help="Mock render time in seconds (default: 2)")
+    parser.add_argument("--chat-delay", type=float, default=0.2, help="Mock time to first chat token (default: 0.2)")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Mock seconds per chat token (default: 0.01)")
+    parser.add_argument("--reply-words", type=int, default=60, help="Words per mock chat reply (default: 60)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock requests failing (default: 0)")
+    parser.add_argument("--payload-kb", type=int, default=1500, help="Mock image size in KiB (default: 1500)")
+    parser.add_argument(
+        "--warm-cache",
+        action="store_true",
+        help="Use the normal local caches instead of an empty cache per scenario",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Also record each scenario to a cassette and check an offline replay of it",
+    )
+    parser.add_argument("--json", metavar="FILE", help="Also write results as JSON")
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        # Child process: keep script chatter off stdout, which carries the result
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run_scenario(args.run_scenario, args.jobs, args.concurrency, args.poll_interval)
+        print(json.dumps(result))
+        return
+
+    args.scenarios = [s.strip() for s in args.scenarios.split(",")]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = bench(args)
+    print_report(results)
+
+    if args.replay and not all(r["replay"]["matches"] and r["replay"]["requests"] == 0 for r in results):
+        print("\nError: a replay did not reproduce its recorded run offline", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the workfort-img subcommands.
+
+Each case runs scripts/workfort-img.py in a fresh interpreter with
+-X importtime (and WORKFORT_NO_DAEMON=1, so nothing is handed to a warm
+daemon), --runs times. It reports median wall time and import time, the
+heaviest top-level imports, and which of requests/httpx/openai/google.genai
+got loaded. The "--help" and "no-key" cases should load none of them.
+
+--json writes the results; --baseline compares against an earlier --json
+file and exits non-zero when a case got slower than --tolerance allows or
+started loading an SDK it did not before.
+
+Usage:
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --runs 10 --json startup.json
+    python scripts/bench_startup.py --baseline startup.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+CLI = SCRIPTS_DIR / "workfort-img.py"
+
+HEAVY_MODULES = ("requests", "httpx", "openai", "google.genai")
+
+KEYS = ("NOVITA_API_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY")
+
+# Case name -> workfort-img arguments; "no-key" cases run without any API keys set
+CASES = {
+    "help": ["--help"],
+    "generate-hunyuan --help": ["generate", "--help"],
+    "generate-openai --help": ["generate", "--provider", "openai", "--help"],
+    "generate-gemini --help": ["generate", "--provider", "gemini", "--help"],
+    "generate-hedged --help": ["generate", "--provider", "hedged", "--help"],
+    "batch --help": ["batch", "--help"],
+    "enhance --help": ["enhance", "--help"],
+    "advise --help": ["advise", "--help"],
+    "generate-openai no-key": ["generate", "--provider", "openai", "--prompt", "x", "--output", "{tmp}/x.png"],
+    "generate-gemini no-key": ["generate", "--provider", "gemini", "--prompt", "x", "--output", "{tmp}/x.png"],
+    "enhance no-key": ["enhance", "x"],
+}
+
+
+def parse_importtime(stderr: str) -> tuple:
+    """
+    Parse -X importtime output.
+
+    Returns:
+        (total import seconds, {top-level module: cumulative seconds}, set of all modules)
+    """
+    top_level = {}
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # the header row
+        modules.add(name.strip())
+        if not name[1:].startswith(" "):
+            top_level[name.strip()] = int(cumulative) / 1e6
+    return sum(top_level.values()), top_level, modules
+
+
+def run_case(argv: list, runs: int, env: dict) -> dict:
+    """Run one case runs times and summarize wall time, import time and loaded SDKs."""
+    walls, imports = [], []
+    heaviest, heavy_loaded = {}, set()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        argv = [arg.format(tmp=tmp) for arg in argv]
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", str(CLI), *argv],
+                capture_output=True,
+                text=True,
+                env=env,
+            )
+            walls.append(time.perf_counter() - start)
+
+            total, top_level, modules = parse_importtime(result.stderr)
+            imports.append(total)
+            heaviest = top_level
+            heavy_loaded |= {m for m in HEAVY_MODULES if m in modules}
+
+    top = sorted(heaviest.items(), key=lambda item: item[1], reverse=True)[:3]
+    return {
+        "wall_s": round(statistics.median(walls), 4),
+        "import_s": round(statistics.median(imports), 4),
+        "exit": result.returncode,
+        "sdks": sorted(heavy_loaded),
+        "top_imports": {name: round(seconds, 4) for name, seconds in top},
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of results against a baseline, as printable strings."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["wall_s"] > before["wall_s"] * (1 + tolerance):
+            regressions.append(f"{name}: {before['wall_s'] * 1000:.0f}ms -> {result['wall_s'] * 1000:.0f}ms")
+        new_sdks = set(result["sdks"]) - set(before["sdks"])
+        if new_sdks:
+            regressions.append(f"{name}: now imports {', '.join(sorted(new_sdks))} at startup")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold-start latency of the workfort-img subcommands")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per case (default: 5)")
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES), metavar="CASE", help="Cases to run")
+    parser.add_argument("--json", type=Path, help="Write results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="Compare against results from an earlier --json run")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed wall-time slowdown against --baseline, as a fraction (default: 0.2)",
+    )
+    args = parser.parse_args()
+
+    env = dict(os.environ, WORKFORT_NO_DAEMON="1")
+    no_key_env = {k: v for k, v in env.items() if k not in KEYS}
+
+    results = {}
+    print(f"{'case':26} {'wall':>8} {'imports':>8}  sdks loaded / heaviest imports")
+    for name in args.cases:
+        result = run_case(CASES[name], args.runs, no_key_env if "no-key" in name else env)
+        results[name] = result
+        top = ", ".join(f"{module} {seconds * 1000:.0f}ms" for module, seconds in result["top_imports"].items())
+        print(
+            f"{name:26} {result['wall_s'] * 1000:6.0f}ms {result['import_s'] * 1000:6.0f}ms  "
+            f"{', '.join(result['sdks']) or '-'} / {top}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+        print(f"✓ Results written to {args.json}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"✗ {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"✓ No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Record/replay transport for provider traffic, for offline, deterministic runs.
+
+--record FILE captures every HTTP exchange a script has with Novita, OpenAI
+and Gemini into a cassette: the Hunyuan submit/poll/download calls (through
+the shared requests session) and the Kimi K2.5, DALL-E and Gemini SDK calls
+(through their httpx clients). --replay FILE answers the same requests from
+the cassette and never touches the network, so a whole generation run takes
+milliseconds and costs nothing.
+
+A cassette is one compact JSON file. Text bodies (JSON, SSE streams) are kept
+inline; binary or large bodies (the images) are stored once under blobs/
+next to the cassette, named by their SHA-256, so cassettes recorded in the
+same directory share their payloads.
+
+Requests match on method, URL and body (JSON bodies compared
+canonically); credentials are never part of the match or the file. A
+request made several times (task-result polls) gets its recorded responses
+in their original order.
+
+Replays run at full speed by default: responses return at once, and the
+waits between polls and retries are skipped. --replay-timing original
+reproduces each response's recorded time to headers and transfer time and
+keeps those waits, for timing-sensitive checks. Replayed requests skip the
+shared rate limits (nothing reaches a provider).
+
+Recording and replaying runs use a fresh, temporary cache unless
+WORKFORT_CACHE_DIR is set, so cached enhancements or stored renders never
+hide a request from the cassette, and the run never touches the image
+daemon. The flags can also be given as WORKFORT_RECORD / WORKFORT_REPLAY
+(and WORKFORT_REPLAY_TIMING), which covers scripts without the options.
+
+Usage:
+    python scripts/generate-image-hunyuan.py --prompt "..." --output /tmp/a.png --record cassettes/hunyuan.json
+    python scripts/generate-image-hunyuan.py --prompt "..." --output /tmp/a.png --replay cassettes/hunyuan.json
+    python scripts/cassette.py cassettes/hunyuan.json
+"""
+
+import argparse
+import atexit
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from disk_cache import write_json_atomic
+
+RECORD = "record"
+REPLAY = "replay"
+TIMINGS = ("fast", "original")
+
+VERSION = 1
+# Bodies up to this size that are valid UTF-8 stay inline in the cassette
+INLINE_LIMIT = 64 * 1024
+# Replayed bodies are delivered in chunks of this size when paced
+REPLAY_CHUNK = 512
+# Most arrival times kept per streamed body, and steps used for bodies without them
+MAX_MARKS = 64
+DEFAULT_MARKS = 16
+
+# SDKs retry at once on a replayed error only if told to; they never wait longer than this
+SDK_MAX_RETRY_AFTER = 60
+
+# Never written to a cassette or used for matching
+SECRET_PARAMS = {"key", "api_key"}
+# Describe the body as sent on the wire, which a recorded body no longer is
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+class CassetteMiss(RuntimeError):
+    """Raised when a replayed run makes a request the cassette has no response for."""
+
+
+def add_cassette_arguments(parser: argparse.ArgumentParser):
+    """Add the shared --record/--replay options to a script's argument parser."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--record",
+        metavar="FILE",
+        default=os.environ.get("WORKFORT_RECORD"),
+        help="Record every provider exchange to a cassette (default: $WORKFORT_RECORD)",
+    )
+    group.add_argument(
+        "--replay",
+        metavar="FILE",
+        default=os.environ.get("WORKFORT_REPLAY"),
+        help="Answer provider requests from a recorded cassette, offline (default: $WORKFORT_REPLAY)",
+    )
+    parser.add_argument(
+        "--replay-timing",
+        choices=TIMINGS,
+        default=os.environ.get("WORKFORT_REPLAY_TIMING", "fast"),
+        help="Replay at full speed, or with the recorded response times and waits (default: fast)",
+    )
+
+
+def configure(args: argparse.Namespace):
+    """Switch the process to recording or replaying if the parsed arguments ask for it."""
+    record, replay = getattr(args, "record", None), getattr(args, "replay", None)
+    if not (record or replay):
+        return
+    if record and replay:
+        raise ValueError("--record and --replay cannot be combined")
+
+    os.environ.pop("WORKFORT_RECORD" if replay else "WORKFORT_REPLAY", None)
+    os.environ["WORKFORT_RECORD" if record else "WORKFORT_REPLAY"] = str(record or replay)
+    os.environ["WORKFORT_REPLAY_TIMING"] = getattr(args, "replay_timing", None) or "fast"
+    os.environ["WORKFORT_NO_DAEMON"] = "1"
+
+    if not os.environ.get("WORKFORT_CACHE_DIR"):
+        root = tempfile.mkdtemp(prefix="workfort-cassette-")
+        atexit.register(shutil.rmtree, root, ignore_errors=True)
+        os.environ["WORKFORT_CACHE_DIR"] = root
+
+    try:
+        active()
+    except (CassetteMiss, OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def requested(argv: list) -> bool:
+    """Whether a command line (or the environment) asks to record or replay."""
+    if os.environ.get("WORKFORT_RECORD") or os.environ.get("WORKFORT_REPLAY"):
+        return True
+    return any(arg.split("=")[0] in ("--record", "--replay") for arg in argv)
+
+
+def active():
+    """The process's Cassette, or None when neither recording nor replaying."""
+    global _cassette
+
+    with _cassette_lock:
+        if _cassette is None:
+            if os.environ.get("WORKFORT_REPLAY"):
+                _cassette = Cassette(os.environ["WORKFORT_REPLAY"], REPLAY, os.environ.get("WORKFORT_REPLAY_TIMING"))
+            elif os.environ.get("WORKFORT_RECORD"):
+                _cassette = Cassette(os.environ["WORKFORT_RECORD"], RECORD)
+        return _cassette
+
+
+def replaying() -> bool:
+    cassette = active()
+    return cassette is not None and cassette.mode == REPLAY
+
+
+def wait_time(seconds: float) -> float:
+    """Seconds a poll or retry wait should really last: none when replaying at full speed."""
+    cassette = active()
+    if cassette is not None and cassette.mode == REPLAY and cassette.timing == "fast":
+        return 0.0
+    return seconds
+
+
+def _hurried(status: int, headers: list) -> list:
+    """
+    Headers of a response replayed at full speed.
+
+    The SDKs sleep between their own retries (exponential backoff, or
+    Retry-After), which wait_time() cannot reach; a one-millisecond
+    retry-after-ms makes them retry at once. Responses the SDK would not
+    retry anyway (a Retry-After beyond its limit) are left alone.
+    """
+    if status < 400:
+        return headers
+    waits = {k.lower(): v for k, v in headers if k.lower() in ("retry-after", "retry-after-ms")}
+    try:
+        if float(waits.get("retry-after", 0)) > SDK_MAX_RETRY_AFTER:
+            return headers
+    except ValueError:
+        pass
+    return [[k, v] for k, v in headers if k.lower() not in waits] + [["retry-after-ms", "1"]]
+
+
+def _clean_url(url: str) -> str:
+    parts = urlsplit(str(url))
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(sorted(query))))
+
+
+def request_key(method: str, url: str, body: bytes) -> str:
+    """Match key of a request: method, URL without credentials, canonical body."""
+    body = body or b""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+    except ValueError:
+        pass
+    digest = hashlib.sha256(f"{method.upper()} {_clean_url(url)}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class Cassette:
+    """Recorded exchanges of one cassette file, in recording or replaying mode."""
+
+    def __init__(self, path, mode: str, timing: str = None):
+        self.path = Path(path)
+        self.mode = mode
+        self.timing = timing or "fast"
+        self.blob_dir = self.path.parent / "blobs"
+        self.lock = threading.Lock()
+        self.interactions = []
+        self.queues = defaultdict(deque)
+
+        if mode == REPLAY:
+            try:
+                data = json.loads(self.path.read_text())
+            except OSError as e:
+                raise CassetteMiss(f"Cannot read cassette {self.path}: {e.strerror}") from e
+            self.interactions = data["interactions"]
+            for interaction in self.interactions:
+                self.queues[interaction["key"]].append(interaction)
+        else:
+            # Start over, so a re-recorded run that makes fewer requests leaves no stale ones
+            write_json_atomic(self.path, {"version": VERSION, "interactions": []})
+
+    def _store_body(self, content: bytes) -> dict:
+        if len(content) <= INLINE_LIMIT:
+            try:
+                return {"text": content.decode("utf-8")}
+            except UnicodeDecodeError:
+                pass
+
+        sha256 = hashlib.sha256(content).hexdigest()
+        blob = self.blob_dir / sha256[:2] / sha256
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp = blob.with_name(f".{sha256}.tmp")
+            tmp.write_bytes(content)
+            os.replace(tmp, blob)
+        return {"blob": sha256, "bytes": len(content)}
+
+    def body(self, interaction: dict) -> bytes:
+        """Response body of a recorded interaction."""
+        response = interaction["response"]
+        if "blob" in response:
+            sha256 = response["blob"]
+            return (self.blob_dir / sha256[:2] / sha256).read_bytes()
+        return response.get("text", "").encode("utf-8")
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        body: bytes,
+        status: int,
+        headers,
+        content: bytes,
+        elapsed: float,
+        duration: float,
+        marks: list = None,
+    ):
+        """
+        Append one exchange and rewrite the cassette.
+
+        elapsed and duration are the seconds from sending the request to its
+        headers and to the end of its body. marks are (bytes received,
+        seconds) pairs as the body arrived, for streams such as chat
+        completions whose pace matters; at most MAX_MARKS are kept.
+        """
+        interaction = {
+            "key": request_key(method, url, body),
+            "method": method.upper(),
+            "url": _clean_url(url),
+            "response": {
+                "status": status,
+                "headers": [[k, v] for k, v in headers if k.lower() not in DROPPED_HEADERS],
+                **self._store_body(content),
+                "elapsed": round(elapsed, 4),
+                "duration": round(duration, 4),
+            },
+        }
+        if marks:
+            step = max(1, len(marks) // MAX_MARKS)
+            kept = marks[step - 1 :: step]
+            if kept[-1] != marks[-1]:
+                kept.append(marks[-1])
+            interaction["response"]["marks"] = [[size, round(seconds, 4)] for size, seconds in kept]
+        with self.lock:
+            self.interactions.append(interaction)
+            write_json_atomic(self.path, {"version": VERSION, "interactions": self.interactions})
+
+    def replay(self, method: str, url: str, body: bytes) -> dict:
+        """
+        Next recorded interaction for a request.
+
+        Raises:
+            CassetteMiss: If the cassette has no (more) responses for it
+        """
+        key = request_key(method, url, body)
+        with self.lock:
+            queue = self.queues.get(key)
+            if queue:
+                return queue.popleft()
+        recorded = sum(1 for i in self.interactions if i["key"] == key)
+        detail = f"all {recorded} recorded responses were used" if recorded else "it was never recorded"
+        raise CassetteMiss(f"{self.path} has no response for {method.upper()} {_clean_url(url)} ({detail}); re-record with --record")
+
+    def replay_body(self, interaction: dict):
+        """Body of a replayed response: bytes, or a reader paced like the original transfer."""
+        content = self.body(interaction)
+        if self.timing == "fast":
+            return content
+        response = interaction["response"]
+        elapsed, duration = response["elapsed"], response["duration"]
+        marks = response.get("marks") or [
+            [len(content) * i // DEFAULT_MARKS, elapsed + (duration - elapsed) * i / DEFAULT_MARKS]
+            for i in range(1, DEFAULT_MARKS + 1)
+        ]
+        time.sleep(elapsed)
+        return _PacedReader(content, [(size, seconds - elapsed) for size, seconds in marks])
+
+
+class _PacedReader(io.RawIOBase):
+    """Reads content no sooner than it arrived: marks are (bytes received, seconds after the headers)."""
+
+    def __init__(self, content: bytes, marks: list):
+        self.content = memoryview(content)
+        self.marks = marks
+        self.position = 0
+        self.start = None
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.start is None:
+            self.start = time.monotonic()
+        if self.position >= len(self.content):
+            return 0
+
+        # Wait for the mark that brought the next byte, then hand out what had arrived by then
+        received, seconds = next(((r, s) for r, s in self.marks if r > self.position), (len(self.content), 0.0))
+        time.sleep(max(0.0, self.start + seconds - time.monotonic()))
+        size = min(len(buffer), received - self.position)
+        buffer[:size] = self.content[self.position : self.position + size]
+        self.position += size
+        return size
+
+
+# ---------------------------------------------------------------------------
+# requests (Novita task calls and image downloads)
+# ---------------------------------------------------------------------------
+
+
+def requests_adapter(adapter):
+    """Wrap a requests adapter so it records or replays; returned unchanged otherwise."""
+    cassette = active()
+    if cassette is None:
+        return adapter
+
+    from requests.adapters import BaseAdapter
+    from urllib3 import HTTPResponse
+
+    class CassetteAdapter(BaseAdapter):
+        def send(self, request, stream=False, **kwargs):
+            body = request.body.encode() if isinstance(request.body, str) else request.body
+            if cassette.mode == REPLAY:
+                interaction = cassette.replay(request.method, request.url, body)
+                content = cassette.replay_body(interaction)
+                raw = HTTPResponse(
+                    body=io.BytesIO(content) if isinstance(content, bytes) else content,
+                    headers=interaction["response"]["headers"],
+                    status=interaction["response"]["status"],
+                    preload_content=False,
+                    decode_content=False,
+                )
+                response = adapter.build_response(request, raw)
+                if not stream:
+                    response.content
+                return response
+
+            start = time.monotonic()
+            response = adapter.send(request, stream=stream, **kwargs)
+            elapsed = time.monotonic() - start
+            content = response.content
+            cassette.record(
+                request.method,
+                request.url,
+                body,
+                response.status_code,
+                response.headers.items(),
+                content,
+                elapsed,
+                time.monotonic() - start,
+            )
+            return response
+
+        def close(self):
+            adapter.close()
+
+    return CassetteAdapter()
+
+
+# ---------------------------------------------------------------------------
+# httpx (OpenAI, Novita chat and Gemini SDK clients)
+# ---------------------------------------------------------------------------
+
+
+def httpx_transport(httpx, **transport_args):
+    """
+    A recording or replaying httpx transport, or None when neither is active.
+
+    Args:
+        httpx: The httpx package the client is built on (newer openai
+            releases ship their own fork)
+        **transport_args: Passed to the live httpx.HTTPTransport when recording (limits, ...)
+    """
+    cassette = active()
+    if cassette is None:
+        return None
+
+    inner = httpx.HTTPTransport(**transport_args) if cassette.mode == RECORD else None
+
+    class PacedStream(httpx.SyncByteStream):
+        def __init__(self, reader: _PacedReader):
+            self.reader = reader
+
+        def __iter__(self):
+            yield from iter(lambda: self.reader.read(REPLAY_CHUNK), b"")
+
+    class RecordingStream(httpx.SyncByteStream):
+        """Passes a live body through as the client reads it, and records it once closed."""
+
+        def __init__(self, response, start: float, save):
+            self.response = response
+            self.start = start
+            self.save = save
+            self.chunks = []
+            self.marks = []
+            self.received = 0
+            self.saved = False
+
+        def __iter__(self):
+            for chunk in self.response.iter_bytes():
+                self.received += len(chunk)
+                self.chunks.append(chunk)
+                self.marks.append((self.received, time.monotonic() - self.start))
+                yield chunk
+
+        def close(self):
+            self.response.close()
+            # A stream the client closed early is recorded as far as it was read,
+            # which is also where the replayed client will stop
+            if not self.saved:
+                self.saved = True
+                self.save(b"".join(self.chunks), self.marks)
+
+    class CassetteTransport(httpx.BaseTransport):
+        def handle_request(self, request):
+            body = request.read()
+            if cassette.mode == REPLAY:
+                try:
+                    interaction = cassette.replay(request.method, str(request.url), body)
+                except CassetteMiss as e:
+                    # The SDKs report transport errors as their own, without this message
+                    print(f"Error: {e}", file=sys.stderr)
+                    raise
+                status, headers = interaction["response"]["status"], interaction["response"]["headers"]
+                content = cassette.replay_body(interaction)
+                if isinstance(content, bytes):
+                    return httpx.Response(status, headers=_hurried(status, headers), content=content, request=request)
+                return httpx.Response(status, headers=headers, stream=PacedStream(content), request=request)
+
+            start = time.monotonic()
+            response = inner.handle_request(request)
+            elapsed = time.monotonic() - start
+            headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in DROPPED_HEADERS]
+
+            def save(content: bytes, marks: list):
+                cassette.record(
+                    request.method,
+                    str(request.url),
+                    body,
+                    response.status_code,
+                    headers,
+                    content,
+                    elapsed,
+                    time.monotonic() - start,
+                    marks,
+                )
+
+            stream = RecordingStream(response, start, save)
+            return httpx.Response(response.status_code, headers=headers, stream=stream, request=request)
+
+        def close(self):
+            if inner is not None:
+                inner.close()
+
+    return CassetteTransport()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a recorded cassette")
+    parser.add_argument("cassette", type=Path)
+    args = parser.parse_args()
+
+    cassette = Cassette(args.cassette, REPLAY)
+    blobs = {i["response"]["blob"]: i["response"]["bytes"] for i in cassette.interactions if "blob" in i["response"]}
+    for interaction in cassette.interactions:
+        response = interaction["response"]
+        size = response.get("bytes", len(response.get("text", "").encode()))
+        print(
+            f"{response['status']} {interaction['method']:6} {interaction['url']}  "
+            f"{size / 1024:.1f} KiB in {response['duration']:.2f}s"
+        )
+    total = sum(i["response"]["duration"] for i in cassette.interactions)
+    print(
+        f"✓ {len(cassette.interactions)} exchanges, {len(blobs)} blobs "
+        f"({sum(blobs.values()) / 1024 / 1024:.2f} MiB), {total:.1f}s of recorded response time"
+    )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
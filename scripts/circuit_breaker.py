@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Circuit breaker shared by every script run, persisted on local disk.
+
+Each breaker counts consecutive failures (and calls slower than
+slow_seconds) of one dependency in ~/.cache/workfort/circuits.json. After
+failure_threshold of them it opens: callers skip the call straight away
+instead of paying the full failure latency every run. Once cool_down
+seconds have passed, a single caller is let through as a probe
+(half-open); its success closes the breaker, its failure reopens it for
+another cool-down.
+
+The common case, a closed breaker, is a plain read of circuits.json (which
+is always replaced atomically): the lock is taken, and the file rewritten,
+only when a call changes a breaker's state.
+
+Usage:
+    python scripts/circuit_breaker.py
+    python scripts/circuit_breaker.py reset kimi-enhance
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from disk_cache import cache_dir, locked, write_json_atomic
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+def _state_path():
+    return cache_dir() / "circuits.json"
+
+
+def _load() -> dict:
+    try:
+        return json.loads(_state_path().read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+class CircuitOpen(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Failure counter for one dependency, with its state kept in circuits.json."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        slow_seconds: float = 30.0,
+        cool_down: float = 120.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_seconds = slow_seconds
+        self.cool_down = cool_down
+
+    def _update(self, change):
+        """Apply change(state) to this breaker's persisted state under the lock and return its result."""
+        with locked(cache_dir() / ".circuits.lock"):
+            circuits = _load()
+            before = circuits.get(self.name)
+            state = dict(before or {"state": CLOSED, "failures": 0})
+            result = change(state)
+            if state != before:
+                circuits[self.name] = state
+                write_json_atomic(_state_path(), circuits)
+        return result
+
+    def state(self) -> dict:
+        """Persisted state: state, failures, and opened_at/last_error once it has failed."""
+        return _load().get(self.name, {"state": CLOSED, "failures": 0})
+
+    def allow(self) -> bool:
+        """
+        Whether the caller may make the call now.
+
+        An open breaker past its cool-down turns half-open and lets exactly
+        one caller through as a probe; everyone else is refused until that
+        probe reports back (or, if it never does, for another cool-down).
+        """
+        # Lock-free for the usual answers; only a probe changes the state
+        state = self.state()
+        if state["state"] == CLOSED:
+            return True
+        if time.time() - state.get("opened_at", 0) < self.cool_down:
+            return False
+
+        def change(state):
+            now = time.time()
+            if state["state"] == CLOSED:
+                return True
+            if now - state.get("opened_at", 0) < self.cool_down:
+                return False
+            if state["state"] == HALF_OPEN and now - state.get("probe_at", 0) < self.cool_down:
+                return False
+            state["state"] = HALF_OPEN
+            state["probe_at"] = now
+            return True
+
+        return self._update(change)
+
+    def success(self, seconds: float = None):
+        """Record a completed call; one slower than slow_seconds counts as a failure."""
+        if seconds is not None and seconds > self.slow_seconds:
+            self.failure(f"slow response ({seconds:.1f}s)")
+            return
+
+        if self.state() == {"state": CLOSED, "failures": 0}:
+            return
+
+        def change(state):
+            state.clear()
+            state.update({"state": CLOSED, "failures": 0})
+
+        self._update(change)
+
+    def failure(self, error: str):
+        """Record a failed call, opening the breaker at the threshold or after a failed probe."""
+        def change(state):
+            state["failures"] = state.get("failures", 0) + 1
+            state["last_error"] = error[:200]
+            if state["state"] == HALF_OPEN or state["failures"] >= self.failure_threshold:
+                opened = state["state"] != OPEN
+                state["state"] = OPEN
+                state["opened_at"] = time.time()
+                return opened
+            return False
+
+        if self._update(change):
+            print(f"⚡ {self.name} circuit opened ({self.describe()})", file=sys.stderr)
+
+    def reset(self):
+        """Close the breaker and forget its failures."""
+        self.success()
+
+    def describe(self) -> str:
+        """One-line summary of the breaker's state for CLI output."""
+        state = self.state()
+        if state["state"] == CLOSED:
+            failures = state.get("failures", 0)
+            return f"closed, {failures} recent failures" if failures else "closed"
+
+        wait = self.cool_down - (time.time() - state.get("opened_at", 0))
+        retry = f"probe in {wait:.0f}s" if wait > 0 else "probe due"
+        return f"{state['state']} after {state['failures']} failures, {retry}; last error: {state.get('last_error')}"
+
+
+def main():
+    """Show or reset the persisted circuit breakers."""
+    parser = argparse.ArgumentParser(description="Show or reset circuit breaker state")
+    parser.add_argument("command", nargs="?", choices=["status", "reset"], default="status")
+    parser.add_argument("name", nargs="?", help="Breaker to reset (default: all)")
+    args = parser.parse_args()
+
+    circuits = _load()
+    if args.command == "reset":
+        for name in [args.name] if args.name else list(circuits):
+            CircuitBreaker(name).reset()
+            print(f"✓ Reset {name}")
+        return
+
+    if not circuits:
+        print("No circuit breakers recorded yet")
+        return
+    for name in sorted(circuits):
+        state = circuits[name]
+        error = f"  last error: {state['last_error']}" if state.get("last_error") else ""
+        print(f"{name:16} {state['state']:9} {state.get('failures', 0):3} failures{error}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Thin client for the resident image generation daemon (see image_daemon.py).
+
+The generator, enhance and advise scripts call delegate() before importing
+anything heavy. When a daemon is listening on the socket, the run is sent
+to it and its output streamed back, so the script exits in milliseconds
+with the daemon's exit code. Otherwise delegate() returns and the script
+runs in-process as before.
+
+Only the standard library is imported here, so asking costs next to nothing.
+Set WORKFORT_NO_DAEMON=1 to always run in-process.
+"""
+
+import io
+import json
+import os
+import socket
+import sys
+
+import cassette
+from disk_cache import cache_dir
+
+CONNECT_TIMEOUT = 0.5
+
+
+def socket_path() -> str:
+    """Unix socket the daemon listens on ($WORKFORT_DAEMON_SOCKET or the cache dir)."""
+    return os.environ.get("WORKFORT_DAEMON_SOCKET") or str(cache_dir() / "daemon.sock")
+
+
+def connect():
+    """Connected socket to a running daemon, or None if none is listening."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(socket_path())
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def send(sock, message: dict):
+    sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def messages(sock):
+    """Yield the JSON-lines messages the daemon sends until it closes the connection."""
+    with sock.makefile("r", encoding="utf-8") as stream:
+        for line in stream:
+            yield json.loads(line)
+
+
+def request(message: dict):
+    """Send one control message (ping, stop) and return the reply, or None without a daemon."""
+    sock = connect()
+    if sock is None:
+        return None
+    with sock:
+        send(sock, message)
+        return next(messages(sock), None)
+
+
+def delegate(job: str, argv: list = None):
+    """
+    Run this script's job on the daemon and exit with its status.
+
+    Returns (so the caller runs in-process) when no daemon is listening,
+    WORKFORT_NO_DAEMON is set, the run records or replays a cassette, or the
+    daemon declines the job.
+
+    Args:
+        job: Job name the daemon knows the script by (e.g. "hunyuan", "enhance")
+        argv: Command-line arguments (default: sys.argv[1:])
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if os.environ.get("WORKFORT_NO_DAEMON") or cassette.requested(argv):
+        return
+
+    sock = connect()
+    if sock is None:
+        return
+
+    # The daemon cannot read our stdin, so send it along when a "-" argument asks for it
+    stdin = sys.stdin.read() if "-" in argv and not sys.stdin.isatty() else None
+
+    with sock:
+        sock.settimeout(None)
+        send(
+            sock,
+            {
+                "command": "run",
+                "job": job,
+                "argv": argv,
+                "cwd": os.getcwd(),
+                "stdin": stdin,
+                "trace": os.environ.get("WORKFORT_TRACE"),
+            },
+        )
+
+        for message in messages(sock):
+            if "fallback" in message:
+                print(f"Note: daemon declined the job ({message['fallback']}); running in-process", file=sys.stderr)
+                if stdin is not None:
+                    sys.stdin = io.StringIO(stdin)
+                return
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+                sys.stderr.flush()
+            elif "exit" in message:
+                sys.exit(message["exit"])
+
+    # Never re-run the job in-process here: it may already have submitted (and paid for) a render
+    print("Error: lost connection to the image daemon before the job finished", file=sys.stderr)
+    sys.exit(1)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+End-to-end deadlines for a generation run.
+
+A Deadline is created from --deadline SECONDS and handed down the whole
+generation path. Each phase (enhance, submit, render, download) gets its
+own sub-deadline from phase(): whatever time is left, minus a reserve for
+the phases after it, so a slow enhancement gives up early and falls back to
+the raw prompt while the render still has most of the budget.
+
+Every network call takes its connect/read timeouts from timeout(), so even
+without --deadline no socket can stall a run forever.
+"""
+
+import argparse
+import time
+
+import cassette
+
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 60.0
+
+# Share of the total deadline reserved for each phase, in run order
+PHASE_SHARES = {
+    "enhance": 0.10,
+    "submit": 0.05,
+    "render": 0.70,
+    "download": 0.15,
+}
+
+
+def add_deadline_argument(parser: argparse.ArgumentParser):
+    """Add the shared --deadline SECONDS option to a script's argument parser."""
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        metavar="SECONDS",
+        help="End-to-end time limit for the whole run, split across enhance, submit, render and download",
+    )
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a run or one of its phases runs out of time."""
+
+
+class Deadline:
+    """A point in time a run (or one phase of it) must finish by; unlimited if seconds is None."""
+
+    def __init__(self, seconds: float = None, name: str = "run"):
+        self.total = seconds
+        self.name = name
+        self.expires = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self):
+        """Seconds left, or None for an unlimited deadline."""
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires is not None and time.monotonic() >= self.expires
+
+    def check(self):
+        """Raise DeadlineExceeded if no time is left."""
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.total:g}s exceeded during {self.name}")
+
+    def phase(self, name: str) -> "Deadline":
+        """
+        Sub-deadline for one phase of the run.
+
+        The phase may use all remaining time except the shares of the
+        phases that follow it.
+        """
+        if self.expires is None:
+            return Deadline(name=name)
+
+        phases = list(PHASE_SHARES)
+        later = sum(PHASE_SHARES[p] for p in phases[phases.index(name) + 1 :]) * self.total
+        sub = Deadline(max(0.0, self.remaining() - later), name)
+        sub.total = self.total
+        sub.expires = min(sub.expires, self.expires)
+        return sub
+
+    def limit(self, seconds: float, name: str = None) -> "Deadline":
+        """Sub-deadline ending after seconds, or at this deadline if that comes first."""
+        sub = Deadline(seconds, name or self.name)
+        if self.expires is not None and self.expires < sub.expires:
+            sub.total, sub.expires = self.total, self.expires
+        return sub
+
+    def seconds(self, cap: float = READ_TIMEOUT) -> float:
+        """A single timeout in seconds: the time left, capped at cap."""
+        self.check()
+        remaining = self.remaining()
+        return cap if remaining is None else min(cap, remaining)
+
+    def timeout(self, connect: float = CONNECT_TIMEOUT, read: float = READ_TIMEOUT) -> tuple:
+        """(connect, read) timeouts for requests, bounded by the time left."""
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return (connect, read)
+        return (min(connect, remaining), min(read, remaining))
+
+    def sleep(self, seconds: float):
+        """Sleep for seconds, or until the deadline if that comes first."""
+        remaining = self.remaining()
+        time.sleep(cassette.wait_time(seconds if remaining is None else min(seconds, remaining)))
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Incremental deploy of the built site to S3, with targeted CloudFront invalidation.
+
+Every file under build/ is hashed (MD5, which is what S3 reports as the
+ETag of a single-part upload) and compared with a manifest of what the
+bucket holds. Only new or changed files are uploaded, in parallel, each with
+its Content-Type and Cache-Control; files no longer in the build are
+deleted; and only paths that changed or disappeared are invalidated, instead
+of "/*".
+
+The manifest lives in the local cache (~/.cache/workfort/deploy/BUCKET.json,
+kept between CI runs with actions/cache) and is checked against a listing of
+the bucket's ETags on every run (one request per 1000 objects), so a deploy
+from another machine or a fresh CI runner is never trusted blindly. Objects
+the manifest has no headers for are HEADed once, so unchanged files whose
+Content-Type or Cache-Control rules changed are still re-uploaded.
+
+Cache-Control:
+  hashed assets (assets/js/main.1a2b3c4d.js)         a year, immutable
+  HTML, feeds, sitemap and other entry points        revalidate on every request
+  everything else (images, fonts)                    an hour; invalidated when changed
+
+Assets are uploaded before the HTML that references them, and deletions
+happen last, so a visitor mid-deploy never gets a page pointing at a missing
+file. AWS_ENDPOINT_URL (or --endpoint-url) points both clients at a local
+stand-in such as mock_s3.py for offline runs.
+
+Usage:
+    python scripts/deploy_site.py build/ --bucket workfort-website --distribution-id E123ABC
+    python scripts/deploy_site.py build/ --bucket workfort-website --dry-run
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import quote
+
+from disk_cache import cache_dir, write_json_atomic
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+SHORT = "public, max-age=3600"
+
+# Content-hashed file names (main.1a2b3c4d.js, logo-0f1e2d3c4b5a.png) from
+# webpack and from subset_fonts.py
+HASHED_NAME = re.compile(r"[.-][0-9a-f]{8,}\.[A-Za-z0-9]+$")
+HASHED_DIRS = ("assets/", "fonts/subset/")
+# Files whose URL stays the same while their content changes
+ENTRY_POINT_SUFFIXES = (".html", ".xml", ".json", ".txt", ".webmanifest")
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".json": "application/json",
+    ".xml": "application/xml",
+    ".txt": "text/plain; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+    ".ttf": "font/ttf",
+    ".webmanifest": "application/manifest+json",
+}
+
+# Above this many paths one "/*" invalidation is cheaper than listing them
+MAX_INVALIDATION_PATHS = 100
+DELETE_BATCH = 1000
+
+
+def content_type(key: str) -> str:
+    suffix = Path(key).suffix.lower()
+    return CONTENT_TYPES.get(suffix) or mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+def cache_control(key: str) -> str:
+    if key.startswith(HASHED_DIRS) and HASHED_NAME.search(key):
+        return IMMUTABLE
+    if key.endswith(ENTRY_POINT_SUFFIXES):
+        return REVALIDATE
+    return SHORT
+
+
+def file_md5(path: Path) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan_build(build_dir: Path) -> dict:
+    """{key: {md5, content_type, cache_control}} for every file in the build."""
+    objects = {}
+    for path in sorted(build_dir.rglob("*")):
+        if not path.is_file():
+            continue
+        key = path.relative_to(build_dir).as_posix()
+        objects[key] = {
+            "md5": file_md5(path),
+            "content_type": content_type(key),
+            "cache_control": cache_control(key),
+        }
+    return objects
+
+
+def manifest_path(bucket: str) -> Path:
+    return cache_dir("deploy") / f"{bucket}.json"
+
+
+def load_manifest(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def list_etags(s3, bucket: str) -> dict:
+    """{key: ETag without quotes} for every object in the bucket."""
+    etags = {}
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket):
+        for item in page.get("Contents", []):
+            etags[item["Key"]] = item["ETag"].strip('"')
+    return etags
+
+
+def reconcile(manifest: dict, etags: dict) -> dict:
+    """
+    What the bucket holds, per the manifest where it still agrees with the bucket.
+
+    Entries whose ETag changed (another machine deployed) are replaced by the
+    bare ETag, which only matches a build file with identical content.
+    """
+    current = {}
+    for key, etag in etags.items():
+        entry = manifest.get(key)
+        current[key] = entry if entry and entry["md5"] == etag else {"md5": etag}
+    return current
+
+
+def fill_headers(s3, bucket: str, build: dict, current: dict, concurrency: int = 16) -> int:
+    """
+    HeadObject unchanged objects the manifest has no headers for, recording them in current.
+
+    Without this a deploy from a fresh runner would see matching ETags and
+    never notice an object still served with an old Cache-Control.
+
+    Returns:
+        Number of objects checked
+    """
+    keys = [
+        key
+        for key, entry in current.items()
+        if "cache_control" not in entry and key in build and build[key]["md5"] == entry["md5"]
+    ]
+
+    def head(key):
+        response = s3.head_object(Bucket=bucket, Key=key)
+        return key, response.get("ContentType", ""), response.get("CacheControl", "")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for key, content_type, cache_control in pool.map(head, keys):
+            current[key] = {"md5": current[key]["md5"], "content_type": content_type, "cache_control": cache_control}
+    return len(keys)
+
+
+def plan(build: dict, current: dict) -> tuple:
+    """
+    Returns:
+        (keys to upload, keys to delete, keys to upload that replace existing objects)
+    """
+    upload, replaced = [], []
+    for key, entry in build.items():
+        existing = current.get(key)
+        if existing is None:
+            upload.append(key)
+        elif existing["md5"] != entry["md5"]:
+            upload.append(key)
+            replaced.append(key)
+        elif any(existing.get(field, entry[field]) != entry[field] for field in ("content_type", "cache_control")):
+            # Same bytes, new headers: re-upload without invalidating anything stale
+            upload.append(key)
+    delete = sorted(set(current) - set(build))
+    return upload, delete, replaced
+
+
+def invalidation_paths(keys: list, max_paths: int = MAX_INVALIDATION_PATHS) -> list:
+    """CloudFront paths serving keys (a directory's index.html is also served at dir/), or ["/*"] if too many."""
+    paths = set()
+    for key in keys:
+        paths.add("/" + quote(key, safe="/~"))
+        if key == "index.html" or key.endswith("/index.html"):
+            paths.add("/" + quote(key[: -len("index.html")], safe="/~"))
+    if len(paths) > max_paths:
+        return ["/*"]
+    return sorted(paths)
+
+
+def upload_order(keys: list) -> list:
+    """Upload batches: everything HTML pages reference first, then the pages and feeds."""
+    assets = [key for key in keys if cache_control(key) != REVALIDATE]
+    entry_points = [key for key in keys if cache_control(key) == REVALIDATE]
+    return [batch for batch in (assets, entry_points) if batch]
+
+
+def make_clients(endpoint_url: str = None, region: str = None):
+    """S3 and CloudFront clients (boto3 is imported here, so --help works without it)."""
+    try:
+        import boto3
+        from botocore.config import Config
+    except ImportError:
+        print("Error: boto3 package not installed. Run: pip install boto3", file=sys.stderr)
+        sys.exit(1)
+
+    config = Config(
+        retries={"max_attempts": 10, "mode": "adaptive"},
+        max_pool_connections=64,
+        # A local stand-in has no per-bucket DNS names
+        s3={"addressing_style": "path"} if endpoint_url else None,
+    )
+    s3 = boto3.client("s3", endpoint_url=endpoint_url, region_name=region, config=config)
+    cloudfront = boto3.client("cloudfront", endpoint_url=endpoint_url, region_name=region, config=config)
+    return s3, cloudfront
+
+
+def deploy(
+    build_dir: Path,
+    bucket: str,
+    distribution_id: str = None,
+    concurrency: int = 16,
+    dry_run: bool = False,
+    max_paths: int = MAX_INVALIDATION_PATHS,
+    endpoint_url: str = None,
+    region: str = None,
+) -> dict:
+    """
+    Upload what changed, delete what was removed and invalidate what went stale.
+
+    Returns:
+        Counts of uploaded, deleted, unchanged and invalidated objects
+    """
+    start_time = time.time()
+    s3, cloudfront = make_clients(endpoint_url, region)
+
+    build = scan_build(build_dir)
+    print(f"✓ Hashed {len(build)} files in {time.time() - start_time:.1f}s")
+
+    path = manifest_path(bucket)
+    current = reconcile(load_manifest(path), list_etags(s3, bucket))
+    checked = fill_headers(s3, bucket, build, current, concurrency)
+    if checked:
+        print(f"✓ Checked headers of {checked} objects missing from the manifest")
+    upload, delete, replaced = plan(build, current)
+    # Removed hashed assets are no longer referenced by any page, so their cached copies can stay
+    stale = replaced + [key for key in delete if cache_control(key) != IMMUTABLE]
+    paths = invalidation_paths(stale, max_paths) if stale else []
+    upload_bytes = sum((build_dir / key).stat().st_size for key in upload)
+    print(
+        f"{len(upload)} to upload ({upload_bytes / 1e6:.1f} MB), {len(delete)} to delete, "
+        f"{len(build) - len(upload)} unchanged, {len(paths)} paths to invalidate"
+    )
+
+    if dry_run:
+        for key in upload:
+            print(f"  upload {key} ({build[key]['cache_control']})")
+        for key in delete:
+            print(f"  delete {key}")
+        for invalidation in paths:
+            print(f"  invalidate {invalidation}")
+        return {"uploaded": 0, "deleted": 0, "unchanged": len(build) - len(upload), "invalidated": 0}
+
+    def put(key):
+        entry = build[key]
+        with open(build_dir / key, "rb") as f:
+            s3.put_object(
+                Bucket=bucket,
+                Key=key,
+                Body=f,
+                ContentType=entry["content_type"],
+                CacheControl=entry["cache_control"],
+                ContentMD5=_base64_md5(entry["md5"]),
+            )
+        return key
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in upload_order(upload):
+            for future in as_completed([pool.submit(put, key) for key in batch]):
+                key = future.result()
+                current[key] = build[key]
+        # Saved before deleting, so a failure from here on only repeats the deletions
+        write_json_atomic(path, current)
+    if upload:
+        print(f"✓ Uploaded {len(upload)} files")
+
+    for i in range(0, len(delete), DELETE_BATCH):
+        batch = delete[i : i + DELETE_BATCH]
+        response = s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True})
+        errors = response.get("Errors", [])
+        if errors:
+            raise RuntimeError(f"Could not delete {len(errors)} objects, e.g. {errors[0]['Key']}: {errors[0]['Message']}")
+        for key in batch:
+            current.pop(key, None)
+    write_json_atomic(path, current)
+    if delete:
+        print(f"✓ Deleted {len(delete)} files")
+
+    if paths and distribution_id:
+        response = cloudfront.create_invalidation(
+            DistributionId=distribution_id,
+            InvalidationBatch={
+                "Paths": {"Quantity": len(paths), "Items": paths},
+                "CallerReference": f"deploy-{time.time_ns()}",
+            },
+        )
+        print(f"✓ Invalidation {response['Invalidation']['Id']}: {', '.join(paths[:5])}{' ...' if len(paths) > 5 else ''}")
+    elif paths:
+        print(f"Warning: no --distribution-id, {len(paths)} changed paths were not invalidated", file=sys.stderr)
+    else:
+        print("✓ Nothing to invalidate")
+
+    print(f"✓ Deployed in {time.time() - start_time:.1f}s")
+    return {
+        "uploaded": len(upload),
+        "deleted": len(delete),
+        "unchanged": len(build) - len(upload),
+        "invalidated": len(paths) if distribution_id else 0,
+    }
+
+
+def _base64_md5(hex_digest: str) -> str:
+    return base64.b64encode(bytes.fromhex(hex_digest)).decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deploy only the changed files of the built site to S3")
+    parser.add_argument("build_dir", type=Path, nargs="?", default=Path("build"), help="Built site (default: build/)")
+    parser.add_argument("--bucket", default=os.environ.get("BUCKET"), help="S3 bucket (default: $BUCKET)")
+    parser.add_argument(
+        "--distribution-id",
+        default=os.environ.get("DIST_ID"),
+        help="CloudFront distribution to invalidate (default: $DIST_ID)",
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="Parallel uploads (default: 16)")
+    parser.add_argument(
+        "--max-paths",
+        type=int,
+        default=MAX_INVALIDATION_PATHS,
+        help=f"Invalidate /* instead above this many paths (default: {MAX_INVALIDATION_PATHS})",
+    )
+    parser.add_argument("--endpoint-url", help="S3/CloudFront endpoint, e.g. a local mock_s3.py")
+    parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-east-1"))
+    parser.add_argument("--dry-run", action="store_true", help="Show what would change without changing it")
+    args = parser.parse_args()
+
+    if not args.bucket:
+        parser.error("--bucket (or $BUCKET) is required")
+    if not args.build_dir.is_dir():
+        parser.error(f"{args.build_dir} is not a directory; run the build first")
+
+    deploy(
+        args.build_dir,
+        args.bucket,
+        args.distribution_id,
+        concurrency=args.concurrency,
+        dry_run=args.dry_run,
+        max_paths=args.max_paths,
+        endpoint_url=args.endpoint_url,
+        region=args.region,
+    )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
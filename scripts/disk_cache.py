@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Small persistent key/value cache on local disk, with LRU eviction.
+
+Entries are JSON files named by a SHA-256 key under a cache directory
+(default ~/.cache/workfort/<name>, or $WORKFORT_CACHE_DIR/<name>). Reads touch
+the entry's mtime so eviction can drop the least recently used entries first
+once the cache grows past its entry/byte limits; entries older than max_age
+are dropped on read and on eviction. Hit/miss counters persist across runs.
+
+Usage:
+    python scripts/disk_cache.py stats enhance
+    python scripts/disk_cache.py clear enhance
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def cache_dir(*parts: str) -> Path:
+    """Return (and create) a directory under the local WorkFort cache root."""
+    root = os.environ.get("WORKFORT_CACHE_DIR")
+    if root:
+        base = Path(root)
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "workfort"
+
+    path = base.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def make_key(*parts) -> str:
+    """Hash JSON-serializable key parts into a stable hex digest."""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def write_json_atomic(path: Path, data):
+    """Write JSON to path via a temp file and rename, so readers never see partial data."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def locked(path: Path):
+    """Hold an exclusive advisory lock on path for the duration of the block."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class DiskCache:
+    """JSON value cache with size/age-based LRU eviction and hit/miss counters."""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 1000,
+        max_bytes: int = 16 * 1024 * 1024,
+        max_age: float = 30 * 24 * 3600,
+    ):
+        self.root = cache_dir(name)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._stats_path = self.root / "stats.json"
+
+    def _entry_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def _entries(self):
+        return list(self.root.glob("??/*.json"))
+
+    def _count(self, field: str):
+        with locked(self.root / ".stats.lock"):
+            stats = self.stats()
+            stats[field] = stats.get(field, 0) + 1
+            write_json_atomic(self._stats_path, stats)
+
+    def stats(self) -> dict:
+        """Return persisted counters ({"hits": ..., "misses": ...})."""
+        try:
+            return json.loads(self._stats_path.read_text())
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0}
+
+    def get(self, key: str):
+        """Return the cached value for key, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            age = time.time() - path.stat().st_mtime
+            if age > self.max_age:
+                path.unlink(missing_ok=True)
+                raise FileNotFoundError(path)
+            value = json.loads(path.read_text())
+        except (OSError, ValueError):
+            self._count("misses")
+            return None
+
+        # Touch the entry so LRU eviction keeps recently used results
+        os.utime(path)
+        self._count("hits")
+        return value
+
+    def put(self, key: str, value):
+        """Store value under key and evict old entries if the cache is over its limits."""
+        write_json_atomic(self._entry_path(key), value)
+        self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until within limits."""
+        now = time.time()
+        entries = []
+        removed = 0
+
+        for path in self._entries():
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if now - st.st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((st.st_mtime, st.st_size, path))
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+            removed += 1
+
+        return removed
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+        self._stats_path.unlink(missing_ok=True)
+
+
+def main():
+    """CLI for inspecting and clearing caches."""
+    parser = argparse.ArgumentParser(description="Inspect or clear a local WorkFort cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("name", help="Cache name (e.g., enhance)")
+
+    args = parser.parse_args()
+    cache = DiskCache(args.name)
+
+    if args.command == "clear":
+        cache.clear()
+        print(f"✓ Cleared {cache.root}")
+        return
+
+    stats = cache.stats()
+    entries = cache._entries()
+    size = sum(p.stat().st_size for p in entries)
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    hit_rate = stats.get("hits", 0) / lookups * 100 if lookups else 0.0
+
+    print(f"Cache: {cache.root}")
+    print(f"Entries: {len(entries)} ({size / 1024:.1f} KiB)")
+    print(f"Hits: {stats.get('hits', 0)}, Misses: {stats.get('misses', 0)} ({hit_rate:.0f}% hit rate)")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
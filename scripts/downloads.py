@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Streaming, resumable, atomic file writes for generated images.
+
+Downloads stream in chunks to a hidden ".part" file next to the output,
+hashing the bytes as they arrive. The image signature is checked from the
+first bytes, so an HTML error page is rejected before it is written out, and
+an interrupted transfer resumes from the partial file with an HTTP Range
+request. The URL and validators (ETag/Last-Modified) the partial came from
+are kept in a sidecar next to it; a resume sends them as If-Range, and a
+partial from a different URL or a changed object is discarded rather than
+appended to. Rate limits and transient 5xx responses are retried with backoff
+(see http_retry.py). Only a complete, verified file is renamed onto the
+output path, so a crash never leaves a truncated image in static/img.
+"""
+
+import hashlib
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+from deadline import Deadline
+from http_retry import MAX_ATTEMPTS, TRANSIENT_STATUSES, backoff_delay, retry_delay, wait_if_paused
+import tracing
+
+CHUNK_SIZE = 64 * 1024
+
+# Enough leading bytes to recognise every supported format
+SIGNATURE_LENGTH = 12
+
+# Output suffix -> image format it implies
+SUFFIX_FORMATS = {".png": "png", ".jpg": "jpeg", ".jpeg": "jpeg", ".webp": "webp"}
+
+
+def sniff_image_format(header: bytes):
+    """Return "png", "jpeg" or "webp" for a file header, or None if unrecognised."""
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def partial_path(output_path: Path) -> Path:
+    """Hidden in-progress file used while writing output_path."""
+    return output_path.with_name(f".{output_path.name}.part")
+
+
+def source_path(part: Path) -> Path:
+    """Sidecar recording the URL and validators a partial file came from."""
+    return part.with_name(f"{part.name}.json")
+
+
+def _read_source(part: Path) -> dict:
+    try:
+        return json.loads(source_path(part).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_source(part: Path, url: str, response):
+    source = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    source_path(part).write_text(json.dumps(source))
+
+
+def _discard_partial(part: Path):
+    part.unlink(missing_ok=True)
+    source_path(part).unlink(missing_ok=True)
+
+
+def _same_object(source: dict, response) -> bool:
+    """Whether a 206 response continues the object the partial file holds."""
+    etag = response.headers.get("ETag")
+    if source.get("etag") and etag:
+        return etag == source["etag"]
+    last_modified = response.headers.get("Last-Modified")
+    if source.get("last_modified") and last_modified:
+        return last_modified == source["last_modified"]
+    return True
+
+
+def _hash_file(path: Path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest
+
+
+def _verify_and_replace(part: Path, output_path: Path):
+    """fsync a finished partial file and rename it onto output_path if it is an image."""
+    with tracing.span("commit", bytes=part.stat().st_size):
+        with open(part, "rb") as f:
+            header = f.read(SIGNATURE_LENGTH)
+            os.fsync(f.fileno())
+
+        if sniff_image_format(header) is None:
+            part.unlink(missing_ok=True)
+            raise ValueError(f"Downloaded data is not a PNG/JPEG/WebP image (starts with {header[:8]!r})")
+
+        # Rename over the output: never truncate it in place, since it may be
+        # hardlinked into the result store
+        os.replace(part, output_path)
+
+
+def commit_partial(part: Path, output_path: Path) -> str:
+    """
+    Verify a finished partial file and atomically rename it onto output_path.
+
+    Returns:
+        SHA-256 of the committed file
+    """
+    digest = _hash_file(part)
+    _verify_and_replace(part, output_path)
+    return digest.hexdigest()
+
+
+def write_atomic(output_path: Path, data: bytes) -> str:
+    """
+    Write image bytes to output_path via a temp file and rename.
+
+    Returns:
+        SHA-256 of the written bytes
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    part = partial_path(output_path)
+    part.write_bytes(data)
+    # Hash the bytes we already hold instead of reading the file back
+    digest = hashlib.sha256(data).hexdigest()
+    _verify_and_replace(part, output_path)
+    return digest
+
+
+def write_image(output_path: Path, data: bytes) -> str:
+    """
+    Write encoded image bytes to output_path in the format its suffix asks for.
+
+    Bytes already in that format (or for an unknown suffix) are written as-is;
+    only a mismatch, e.g. PNG bytes for a .jpg path, is decoded and re-encoded
+    with Pillow.
+
+    Returns:
+        SHA-256 of the written file
+    """
+    wanted = SUFFIX_FORMATS.get(output_path.suffix.lower())
+    if wanted is None or wanted == sniff_image_format(data[:SIGNATURE_LENGTH]):
+        return write_atomic(output_path, data)
+
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Error: pillow package not installed. Run: pip install pillow", file=sys.stderr)
+        sys.exit(1)
+
+    with tracing.span("convert", format=wanted):
+        image = Image.open(io.BytesIO(data))
+        if wanted == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        converted = io.BytesIO()
+        image.save(converted, format=wanted.upper())
+    return write_atomic(output_path, converted.getvalue())
+
+
+def stream_download(
+    session: "requests.Session",
+    url: str,
+    output_path: Path,
+    max_attempts: int = MAX_ATTEMPTS,
+    deadline: Deadline = None,
+) -> str:
+    """
+    Stream url to output_path, resuming interrupted transfers.
+
+    Args:
+        session: requests session to download with
+        url: Image URL
+        output_path: Final destination
+        max_attempts: Attempts (after connection errors, 429 or 5xx) before giving up
+        deadline: Bounds each attempt's timeouts, the waits between attempts
+            and the transfer itself; the partial file is kept for a later resume
+
+    Returns:
+        SHA-256 of the downloaded bytes
+
+    Raises:
+        ValueError: If the payload is not a PNG/JPEG/WebP image
+        DeadlineExceeded: If the deadline passes mid-transfer
+    """
+    # Imported here so scripts that never download skip its import cost
+    import requests
+
+    deadline = deadline or Deadline()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    part = partial_path(output_path)
+
+    # A partial left by another URL (a new render for the same output) would
+    # splice two images together; only resume our own bytes
+    if part.exists() and _read_source(part).get("url") != url:
+        _discard_partial(part)
+
+    for attempt in range(1, max_attempts + 1):
+        offset = part.stat().st_size if part.exists() else 0
+        source = _read_source(part) if offset else {}
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            # The server answers 200 with the whole object if it has changed
+            validator = source.get("etag") or source.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+        wait_if_paused(deadline)
+
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=deadline.timeout()) as response:
+                if response.status_code in TRANSIENT_STATUSES and attempt < max_attempts:
+                    delay = retry_delay(response, attempt)
+                    print(
+                        f"  Download got HTTP {response.status_code}; retrying in {delay:.1f}s "
+                        f"({attempt}/{max_attempts - 1})...",
+                        file=sys.stderr,
+                    )
+                    tracing.current_span().count("retries")
+                    deadline.sleep(delay)
+                    continue
+
+                if offset and (
+                    response.status_code == 416
+                    or (response.status_code == 206 and not _same_object(source, response))
+                ):
+                    # The partial file does not match the remote object; start over
+                    _discard_partial(part)
+                    tracing.current_span().count("retries")
+                    continue
+
+                if offset and response.status_code == 206:
+                    print(f"  Resuming download at {offset / 1024:.0f} KiB")
+                    digest = _hash_file(part)
+                    mode = "ab"
+                    header = part.read_bytes()[:SIGNATURE_LENGTH]
+                else:
+                    # A 200 to a Range request means the server sent everything again
+                    response.raise_for_status()
+                    digest = hashlib.sha256()
+                    mode = "wb"
+                    header = b""
+                    _write_source(part, url, response)
+
+                with open(part, mode) as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        deadline.check()
+                        if len(header) < SIGNATURE_LENGTH:
+                            header += chunk[: SIGNATURE_LENGTH - len(header)]
+                            if len(header) >= SIGNATURE_LENGTH and sniff_image_format(header) is None:
+                                raise ValueError(
+                                    f"Download is not a PNG/JPEG/WebP image "
+                                    f"(Content-Type: {response.headers.get('Content-Type')})"
+                                )
+                        f.write(chunk)
+                        digest.update(chunk)
+
+        except ValueError:
+            _discard_partial(part)
+            raise
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == max_attempts:
+                raise
+            delay = backoff_delay(attempt)
+            print(
+                f"  Download interrupted ({e}); retrying in {delay:.1f}s ({attempt}/{max_attempts - 1})...",
+                file=sys.stderr,
+            )
+            tracing.current_span().count("retries")
+            deadline.sleep(delay)
+            continue
+
+        _verify_and_replace(part, output_path)
+        source_path(part).unlink(missing_ok=True)
+        return digest.hexdigest()
+
+    raise RuntimeError(f"Download of {url} failed after {max_attempts} attempts")
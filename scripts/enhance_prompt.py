@@ -3,87 +3,450 @@
 Enhance image generation prompts using Kimi K2.5 via Novita.ai API.
 
 This module provides prompt enhancement for all image generation scripts.
+Results are cached on disk (see disk_cache.py) keyed by the original prompt,
+system prompt, model, max_tokens, temperature and word budget (and, for
+batched results, the batch instructions and size), so re-rolling
+seeds or switching providers for the same idea skips the LLM round-trip.
+
+The completion is streamed, so time to first token and total latency are
+reported separately, and the stream is closed as soon as the enhanced prompt
+reaches WORD_BUDGET words instead of waiting for max_tokens.
+
+A circuit breaker (see circuit_breaker.py) tracks Kimi failures and slow
+responses across runs. While it is open, enhancement is skipped at once
+(or answered from the cache even with --refresh-enhance) instead of every
+run waiting for the chat API to fail.
+
+enhance_prompts() enhances many prompts at once: uncached prompts are sent
+BATCH_SIZE at a time in one streamed JSON-mode request, so the system prompt is sent
+once per batch instead of once per image. Items missing or invalid in the
+reply are retried on their own; the rest are kept.
+
+Usage:
+    python scripts/enhance_prompt.py "A futuristic city"
+    python scripts/enhance_prompt.py --batch prompts.txt
 """
 
-import os
+import argparse
+import json
+import re
 import sys
+import time
+
+import daemon_client
+
+if __name__ == "__main__":
+    # Hand the run to a warm image daemon when one is listening (see image_daemon.py)
+    daemon_client.delegate("enhance")
+
+import cassette
+from circuit_breaker import CLOSED, CircuitBreaker, CircuitOpen
+from disk_cache import DiskCache, make_key
+from providers import novita_chat_client, require_env, stream_chat
+import tracing
+
+MODEL = "moonshotai/kimi-k2.5"
+MAX_TOKENS = 512
+TEMPERATURE = 0.7
+
+# The system prompt asks for under 200 words; stop streaming once we have them
+WORD_BUDGET = 200
+
+# Prompts per batched request, and attempts for items a batch reply got wrong
+BATCH_SIZE = 8
+BATCH_ATTEMPTS = 3
+
+SYSTEM_PROMPT = """You are an expert at enhancing image generation prompts. Your task is to take a user's prompt and enhance it with specific technical details that will produce better images while maintaining the original intent.
+
+Add details about:
+- Photography/camera specifics (camera models, lenses, aperture, ISO)
+- Lighting setup (low-key, three-point, studio lighting)
+- Composition and framing
+- Technical quality (sharp focus, high contrast)
+- Mood and atmosphere
+
+Keep the enhanced prompt concise (under 200 words) and focused. Return ONLY the enhanced prompt, no explanations."""
+
+BATCH_INSTRUCTIONS = """You will receive a JSON object {"prompts": [{"id": <int>, "prompt": <string>}, ...]}. Enhance every prompt independently following the rules above and reply with ONLY a JSON object {"prompts": [{"id": <same int>, "enhanced": <string>}, ...]} containing exactly one entry per input id."""
+
+# Open after 3 failed or >30s enhancements in a row; probe again after 2 minutes
+breaker = CircuitBreaker("kimi-enhance", failure_threshold=3, slow_seconds=30.0, cool_down=120.0)
+
+_cache = None
+
+
+def enhancement_cache() -> DiskCache:
+    """Shared on-disk cache of enhanced prompts."""
+    global _cache
+    if _cache is None:
+        _cache = DiskCache("enhance")
+    return _cache
 
-try:
-    from openai import OpenAI
-except ImportError:
-    print("Error: openai package not installed. Run: pip install openai", file=sys.stderr)
-    sys.exit(1)
 
+def cache_key(original_prompt: str) -> str:
+    """Cache key for an enhancement of original_prompt with the current settings."""
+    return make_key(original_prompt, SYSTEM_PROMPT, MODEL, MAX_TOKENS, TEMPERATURE, WORD_BUDGET)
 
-def enhance_prompt(original_prompt: str, api_key: str) -> str:
+
+def batch_cache_key(original_prompt: str) -> str:
+    """Cache key for an enhancement of original_prompt made by a batched request."""
+    return make_key(
+        "batch",
+        original_prompt,
+        SYSTEM_PROMPT,
+        BATCH_INSTRUCTIONS,
+        BATCH_SIZE,
+        MODEL,
+        MAX_TOKENS,
+        TEMPERATURE,
+        WORD_BUDGET,
+    )
+
+
+def _cached_enhancement(cache: DiskCache, original_prompt: str):
+    """A cached enhancement of original_prompt, preferring a single-prompt one over a batched one."""
+    for key in (cache_key(original_prompt), batch_cache_key(original_prompt)):
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    return None
+
+
+def over_budget(text: str) -> bool:
+    """True once a streamed enhancement has reached WORD_BUDGET words."""
+    return len(text.split()) >= WORD_BUDGET
+
+
+def trim_to_budget(text: str) -> str:
+    """
+    Cut an enhancement that hit the word budget back to its last full sentence.
+
+    Falls back to the first WORD_BUDGET words when no sentence ends in the
+    second half of the text.
+    """
+    words = text.split()[:WORD_BUDGET]
+    clipped = " ".join(words)
+    ends = [m.end() for m in re.finditer(r"[.!?](?=\s|$)", clipped)]
+    if ends and ends[-1] > len(clipped) // 2:
+        return clipped[: ends[-1]]
+    return clipped
+
+
+def enhance_prompt(original_prompt: str, api_key: str, refresh: bool = False, deadline=None) -> str:
     """
     Enhance an image generation prompt using Kimi K2.5.
 
     Args:
         original_prompt: The original user prompt
         api_key: Novita.ai API key
+        refresh: Skip the cache lookup and store a freshly enhanced prompt
+        deadline: Optional Deadline bounding the streamed completion
 
     Returns:
         Enhanced prompt optimized for image generation
 
     Raises:
+        CircuitOpen: If the Kimi circuit breaker is open and nothing is cached
         RuntimeError: If API call fails
     """
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://api.novita.ai/openai"
-    )
+    with tracing.span("enhance", provider="novita", model=MODEL) as span:
+        cache = enhancement_cache()
+        key = cache_key(original_prompt)
 
-    system_prompt = """You are an expert at enhancing image generation prompts. Your task is to take a user's prompt and enhance it with specific technical details that will produce better images while maintaining the original intent.
+        if not refresh:
+            cached = cache.get(key)
+            if cached is not None:
+                span.set(cache="hit")
+                stats = cache.stats()
+                print(f"✓ Enhancement cache hit (hits: {stats['hits']}, misses: {stats['misses']})")
+                print(f"✓ Enhanced: {cached['enhanced'][:80]}...")
+                return cached["enhanced"]
 
-Add details about:
-- Photography/camera specifics (camera models, lenses, aperture, ISO)
-- Lighting setup (low-key, three-point, studio lighting)
-- Composition and framing
-- Technical quality (sharp focus, high contrast)
-- Mood and atmosphere
+        span.set(cache="refresh" if refresh else "miss")
+        if not breaker.allow():
+            span.set(circuit="open")
+            cached = cache.get(key) if refresh else None
+            if cached is None:
+                raise CircuitOpen(f"Kimi circuit {breaker.describe()}")
+            print(f"⚡ Kimi circuit {breaker.describe()}")
+            print(f"✓ Using the last cached enhancement: {cached['enhanced'][:80]}...")
+            return cached["enhanced"]
 
-Keep the enhanced prompt concise (under 200 words) and focused. Return ONLY the enhanced prompt, no explanations."""
+        client = novita_chat_client(api_key)
 
-    print(f"🔄 Enhancing prompt with Kimi K2.5...")
+        print(f"🔄 Enhancing prompt with Kimi K2.5...")
+        start_time = time.time()
 
-    try:
-        response = client.chat.completions.create(
-            model="moonshotai/kimi-k2.5",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Enhance this image generation prompt:\n\n{original_prompt}"}
-            ],
-            max_tokens=512,
-            temperature=0.7
-        )
-
-        enhanced = response.choices[0].message.content.strip()
+        try:
+            enhanced, first_token, stopped = stream_chat(
+                client,
+                should_stop=over_budget,
+                deadline=deadline,
+                model=MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Enhance this image generation prompt:\n\n{original_prompt}"}
+                ],
+                max_tokens=MAX_TOKENS,
+                temperature=TEMPERATURE
+            )
+        except Exception as e:
+            # Running out of the run's own deadline only counts against Kimi if it was slow too
+            if not (deadline and deadline.expired()) or time.time() - start_time > breaker.slow_seconds:
+                breaker.failure(str(e))
+            raise RuntimeError(f"Prompt enhancement failed: {e}")
+
+        total = time.time() - start_time
+        enhanced = trim_to_budget(enhanced) if stopped else enhanced.strip()
+        if not enhanced:
+            breaker.failure("empty response")
+            raise RuntimeError("Prompt enhancement failed: empty response")
+        breaker.success(total)
+
+        span.set(first_token_s=first_token, stopped_early=stopped, words=len(enhanced.split()))
 
         print(f"✓ Original: {original_prompt[:80]}...")
         print(f"✓ Enhanced: {enhanced[:80]}...")
+        budget_note = f", stopped at {WORD_BUDGET}-word budget" if stopped else ""
+        print(f"⏱ Enhancement: first token {first_token:.2f}s, total {total:.2f}s{budget_note}")
 
+        cache.put(key, {"original": original_prompt, "enhanced": enhanced})
         return enhanced
 
+
+def _enhance_batch(client, items: dict, deadline=None) -> dict:
+    """
+    Enhance {id: prompt} in one streamed JSON-mode request.
+
+    The reply is streamed like a single enhancement, so the read timeout
+    bounds the gap between tokens rather than the whole (long) reply.
+
+    Returns:
+        {id: enhanced} for the items the reply got right; the rest are omitted
+
+    Raises:
+        DeadlineExceeded: If the deadline passes before the reply ends
+    """
+    request = {"prompts": [{"id": i, "prompt": prompt} for i, prompt in items.items()]}
+    content, _, _ = stream_chat(
+        client,
+        deadline=deadline,
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": f"{SYSTEM_PROMPT}\n\n{BATCH_INSTRUCTIONS}"},
+            {"role": "user", "content": json.dumps(request)},
+        ],
+        max_tokens=MAX_TOKENS * len(items),
+        temperature=TEMPERATURE,
+        response_format={"type": "json_object"},
+    )
+
+    try:
+        entries = json.loads(content)["prompts"]
+    except (TypeError, ValueError, KeyError):
+        return {}
+
+    results = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        item_id, enhanced = entry.get("id"), entry.get("enhanced")
+        if item_id in items and isinstance(enhanced, str) and enhanced.strip():
+            text = enhanced.strip()
+            results[item_id] = trim_to_budget(text) if over_budget(text) else text
+    return results
+
+
+def enhance_prompts(original_prompts: list, api_key: str, refresh: bool = False, deadline=None) -> list:
+    """
+    Enhance many prompts with as few Kimi K2.5 round-trips as possible.
+
+    Cached prompts are answered from the cache; duplicates are enhanced once.
+    Batched results are cached under their own keys (batch_cache_key()), so
+    enhance_prompt() never returns one, while a batch may reuse a
+    single-prompt enhancement.
+    The rest go BATCH_SIZE per request, and only items missing or invalid in
+    a reply are sent again, up to BATCH_ATTEMPTS times.
+
+    Args:
+        original_prompts: Prompts to enhance
+        api_key: Novita.ai API key
+        refresh: Skip the cache lookup and store freshly enhanced prompts
+        deadline: Optional Deadline bounding all batched requests; prompts
+            still pending when it passes are left unenhanced
+
+    Returns:
+        Enhanced prompts in the same order, with None for prompts that could
+        not be enhanced
+    """
+    cache = enhancement_cache()
+    unique = list(dict.fromkeys(original_prompts))
+    enhanced = {}
+
+    if not refresh:
+        for prompt in unique:
+            cached = _cached_enhancement(cache, prompt)
+            if cached is not None:
+                enhanced[prompt] = cached["enhanced"]
+
+    pending = [p for p in unique if p not in enhanced]
+    print(f"🔄 Enhancing {len(pending)} prompts with Kimi K2.5 ({len(unique) - len(pending)} cached)...")
+
+    with tracing.span("enhance_batch", provider="novita", model=MODEL, prompts=len(pending)) as span:
+        client = novita_chat_client(api_key) if pending else None
+
+        for attempt in range(1, BATCH_ATTEMPTS + 1):
+            if not pending or (deadline and deadline.expired()) or not breaker.allow():
+                break
+            if attempt > 1:
+                print(f"  Retrying {len(pending)} prompts the last reply missed ({attempt}/{BATCH_ATTEMPTS})...")
+                span.count("retries")
+
+            failed = []
+            for start in range(0, len(pending), BATCH_SIZE):
+                chunk = dict(enumerate(pending[start:start + BATCH_SIZE]))
+                if start and ((deadline and deadline.expired()) or not breaker.allow()):
+                    failed.extend(chunk.values())
+                    continue
+                span.count("requests")
+                try:
+                    results = _enhance_batch(client, chunk, deadline)
+                except Exception as e:
+                    print(f"Warning: batch enhancement request failed: {e}", file=sys.stderr)
+                    # Running out of the caller's deadline is not Kimi's fault
+                    if not (deadline and deadline.expired()):
+                        breaker.failure(str(e))
+                    results = {}
+                else:
+                    # Batched replies are long by design, so only failures count here
+                    breaker.success()
+
+                for item_id, prompt in chunk.items():
+                    if item_id in results:
+                        enhanced[prompt] = results[item_id]
+                        cache.put(batch_cache_key(prompt), {"original": prompt, "enhanced": results[item_id]})
+                    else:
+                        failed.append(prompt)
+            pending = failed
+
+        if pending and breaker.state()["state"] != CLOSED:
+            span.set(circuit="open")
+            print(f"⚡ Kimi circuit {breaker.describe()}")
+            if refresh:
+                for prompt in pending:
+                    cached = _cached_enhancement(cache, prompt)
+                    if cached is not None:
+                        enhanced[prompt] = cached["enhanced"]
+                pending = [p for p in pending if p not in enhanced]
+
+        span.set(failed=len(pending))
+
+    print(f"✓ Enhanced {len(unique) - len(pending)}/{len(unique)} prompts")
+    return [enhanced.get(prompt) for prompt in original_prompts]
+
+
+def resolve_prompt(
+    original_prompt: str,
+    api_key: str,
+    no_enhance: bool = False,
+    refresh: bool = False,
+    deadline=None,
+) -> str:
+    """
+    Return the prompt a generator should render.
+
+    Enhances the prompt unless no_enhance is set, falling back to the original
+    prompt (with a warning) when enhancement fails or overruns its share of
+    the run's deadline.
+    """
+    if no_enhance:
+        print("Skipping prompt enhancement (--no-enhance)")
+        return original_prompt
+
+    try:
+        return enhance_prompt(original_prompt, api_key, refresh, deadline.phase("enhance") if deadline else None)
+    except CircuitOpen as e:
+        print(f"⚡ Skipping prompt enhancement, using original prompt: {e}")
+        return original_prompt
+    except Exception as e:
+        print(f"Warning: Prompt enhancement failed, using original prompt. {e}", file=sys.stderr)
+        return original_prompt
+
+
+def resolve_prompts(
+    original_prompts: list,
+    api_key: str,
+    no_enhance: bool = False,
+    refresh: bool = False,
+    deadline=None,
+) -> list:
+    """
+    Return the prompts a batch of generators should render.
+
+    Like resolve_prompt(), but enhances all prompts through enhance_prompts()
+    within deadline; any prompt that could not be enhanced falls back to its
+    original text.
+    """
+    if no_enhance:
+        print("Skipping prompt enhancement (--no-enhance)")
+        return list(original_prompts)
+
+    try:
+        enhanced = enhance_prompts(original_prompts, api_key, refresh, deadline)
     except Exception as e:
-        raise RuntimeError(f"Prompt enhancement failed: {e}")
+        print(f"Warning: Prompt enhancement failed, using original prompts. {e}", file=sys.stderr)
+        return list(original_prompts)
+
+    for prompt, result in zip(original_prompts, enhanced):
+        if result is None:
+            print(f"Warning: Prompt enhancement failed, using original prompt: {prompt[:80]}", file=sys.stderr)
+    return [result or prompt for prompt, result in zip(original_prompts, enhanced)]
 
 
-def main():
+def main(argv: list = None):
     """CLI for testing prompt enhancement."""
-    if len(sys.argv) < 2:
-        print("Usage: python enhance_prompt.py 'your prompt here'", file=sys.stderr)
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Enhance an image generation prompt using Kimi K2.5")
+    parser.add_argument("prompt", nargs="?", help="Prompt to enhance")
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Enhance every non-empty line of FILE ('-' for stdin) in batched requests",
+    )
+    parser.add_argument(
+        "--refresh-enhance",
+        action="store_true",
+        help="Ignore any cached enhancement and ask Kimi K2.5 again",
+    )
+    tracing.add_trace_argument(parser)
+    cassette.add_cassette_arguments(parser)
 
-    api_key = os.environ.get("NOVITA_API_KEY")
-    if not api_key:
-        print("Error: NOVITA_API_KEY environment variable not set", file=sys.stderr)
-        sys.exit(1)
+    args = parser.parse_args(argv)
+    tracing.configure(args)
+    cassette.configure(args)
+
+    if (args.prompt is None) == (args.batch is None):
+        parser.error("give either a prompt or --batch FILE")
+
+    api_key = require_env("NOVITA_API_KEY", "novita_api_key")
+
+    if args.batch is not None:
+        try:
+            text = sys.stdin.read() if args.batch == "-" else open(args.batch).read()
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
 
-    prompt = sys.argv[1]
+        prompts = [line.strip() for line in text.splitlines() if line.strip()]
+        results = enhance_prompts(prompts, api_key, args.refresh_enhance)
+        for prompt, enhanced in zip(prompts, results):
+            print("\n" + "="*80)
+            print(f"ORIGINAL: {prompt}")
+            print("="*80)
+            print(enhanced if enhanced is not None else "(enhancement failed)")
+        sys.exit(1 if None in results else 0)
 
     try:
-        enhanced = enhance_prompt(prompt, api_key)
+        enhanced = enhance_prompt(args.prompt, api_key, args.refresh_enhance)
         print("\n" + "="*80)
         print("ENHANCED PROMPT:")
         print("="*80)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Generate an image with a hedged request across two providers.
+
+The enhanced prompt goes to the primary provider first. If it has not
+finished by the hedge deadline (a percentile of that provider's recorded
+render times, or --hedge-after when there is not enough history yet), the
+same prompt is sent to the secondary provider and the first image to arrive
+wins. The loser is cancelled, or kept as a bonus variant with --keep-loser.
+
+Usage:
+    python scripts/generate-image-hedged.py --prompt "..." --output static/img/featured/post.png
+    python scripts/generate-image-hedged.py --prompt "..." --output static/img/hero/post.png \\
+        --size 1536x1024 --primary hunyuan --secondary openai --hedge-percentile 90 --keep-loser
+"""
+
+import argparse
+import contextvars
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+import daemon_client
+
+if __name__ == "__main__":
+    # Hand the run to a warm image daemon when one is listening (see image_daemon.py)
+    daemon_client.delegate("hedged")
+
+import cassette
+from deadline import Deadline, add_deadline_argument
+from downloads import partial_path, source_path
+from enhance_prompt import resolve_prompt
+from providers import (
+    GEMINI_IMAGE_MODEL,
+    HUNYUAN_MODEL,
+    fit_size,
+    gemini_aspect_ratio,
+    render_dalle,
+    render_gemini,
+    render_hunyuan,
+    require_env,
+)
+import job_journal
+import latency_history
+import result_store
+import tracing
+
+PROVIDERS = ("hunyuan", "openai", "gemini")
+
+MODELS = {
+    "hunyuan": HUNYUAN_MODEL,
+    "openai": "dall-e-3",
+    "gemini": GEMINI_IMAGE_MODEL,
+}
+
+API_KEYS = {
+    "hunyuan": ("NOVITA_API_KEY", "novita_api_key"),
+    "openai": ("OPENAI_API_KEY", "openai_api_key"),
+    "gemini": ("GEMINI_API_KEY", "gemini_api_key"),
+}
+
+
+# Seconds a discarded render gets to notice its cancel event before its files are removed
+DISCARD_TIMEOUT = 5.0
+
+
+def history_size(provider: str, size: str) -> str:
+    """Size under which a provider's render times are recorded (Gemini: the aspect ratio it renders at)."""
+    return gemini_aspect_ratio(size) if provider == "gemini" else fit_size(provider, size)
+
+
+class HedgedRender:
+    """A render running on a daemon thread, so a losing request never blocks exit."""
+
+    def __init__(
+        self,
+        provider: str,
+        api_key: str,
+        prompt: str,
+        output_path: Path,
+        size: str,
+        results: queue.Queue,
+        deadline: Deadline = None,
+    ):
+        self.provider = provider
+        self.output_path = output_path
+        self.size = fit_size(provider, size)
+        self.cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._args = (api_key, prompt)
+        self._deadline = deadline
+        self._results = results
+        # Run in a copy of the caller's context so its trace span and output streams carry over
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run,), daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        api_key, prompt = self._args
+        deadline = self._deadline
+        try:
+            if self.provider == "hunyuan":
+                sha256 = render_hunyuan(
+                    api_key, prompt, self.output_path, size=self.size, cancel=self.cancel, deadline=deadline
+                )
+            elif self.provider == "openai":
+                sha256 = render_dalle(api_key, prompt, self.output_path, size=self.size, deadline=deadline)
+            else:
+                sha256 = render_gemini(api_key, prompt, self.output_path, deadline=deadline, size=self.size)
+        except Exception as e:
+            self._finish(None, e)
+            return
+        self._finish(sha256, None)
+
+    def _finish(self, sha256, error):
+        with self._lock:
+            if self.cancel.is_set():
+                # Providers without a cancel hook (DALL-E, Gemini) still write their image
+                self._remove_output()
+                return
+        self._results.put((self, sha256, error))
+
+    def _remove_output(self):
+        part = partial_path(self.output_path)
+        for path in (self.output_path, part, source_path(part)):
+            path.unlink(missing_ok=True)
+
+    def discard(self, timeout: float = DISCARD_TIMEOUT):
+        """
+        Cancel the render and delete its temp image.
+
+        Waits up to timeout seconds for the render to stop, then cleans up
+        from the calling thread: the render thread is a daemon and dies with
+        the process, so it cannot be relied on to do it. A render still
+        running after that deletes its image itself if it finishes while the
+        process is alive.
+        """
+        self.cancel.set()
+        self._thread.join(timeout)
+        with self._lock:
+            self._remove_output()
+        if self.provider == "hunyuan":
+            # Recorded now, not by the render thread, which may not outlive the process
+            job_journal.cancel_output(self.output_path, "lost a hedged request")
+
+
+def hedged_generate(
+    prompt: str,
+    output_path: Path,
+    size: str,
+    primary: str,
+    secondary: str,
+    api_keys: dict,
+    hedge_after: float,
+    keep_loser: bool,
+    deadline: Deadline = None,
+):
+    """
+    Run the hedged request.
+
+    Both renders share the same deadline, so a hedge started late only gets
+    whatever time is left.
+
+    Returns:
+        (winning render, its SHA-256, seconds until it won, seconds until the
+        kept loser finished or None)
+
+    Raises:
+        RuntimeError: If every provider that was tried failed
+    """
+    results = queue.Queue()
+    start_time = time.time()
+
+    def start(provider):
+        temp_path = output_path.with_name(f".{output_path.stem}.{provider}{output_path.suffix}")
+        return HedgedRender(provider, api_keys[provider], prompt, temp_path, size, results, deadline)
+
+    print(f"⏱ Primary: {primary} (hedging to {secondary} after {hedge_after:.1f}s)")
+    renders = {primary: start(primary)}
+    errors = {}
+
+    while True:
+        if secondary in renders and len(errors) == len(renders):
+            raise RuntimeError(f"All providers failed: {errors}")
+
+        # Until the hedge fires, wait no longer than the hedge deadline
+        timeout = None if secondary in renders else max(0.0, start_time + hedge_after - time.time())
+
+        try:
+            render, sha256, error = results.get(timeout=timeout)
+        except queue.Empty:
+            print(f"⏱ {primary} still running after {time.time() - start_time:.1f}s; hedging to {secondary}")
+            renders[secondary] = start(secondary)
+            continue
+
+        if error is not None:
+            errors[render.provider] = error
+            print(f"Warning: {render.provider} failed: {error}", file=sys.stderr)
+            if secondary not in renders:
+                renders[secondary] = start(secondary)
+            continue
+
+        winner, winner_sha256 = render, sha256
+        win_time = time.time() - start_time
+        break
+
+    winner.output_path.replace(output_path)
+
+    loser_time = None
+    for loser in renders.values():
+        if loser is winner or loser.provider in errors:
+            continue
+
+        if not keep_loser:
+            loser.discard()
+            print(f"✗ Cancelled {loser.provider} (it may still be billed if rendering had started)")
+            continue
+
+        print(f"Waiting for {loser.provider} to keep it as a bonus variant...")
+        _, _, error = results.get()
+        if error is not None:
+            print(f"Warning: {loser.provider} failed: {error}", file=sys.stderr)
+            continue
+
+        loser_time = time.time() - start_time
+        bonus_path = output_path.with_name(f"{output_path.stem}-{loser.provider}{output_path.suffix}")
+        loser.output_path.replace(bonus_path)
+        print(f"✓ Bonus variant from {loser.provider} saved to {bonus_path}")
+
+    return winner, winner_sha256, win_time, loser_time
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Generate an image with a hedged request across two providers")
+    parser.add_argument("--prompt", required=True, help="Image generation prompt")
+    parser.add_argument(
+        "--output",
+        required=True,
+        help="Output path (e.g., static/img/featured/post-name.png)",
+    )
+    parser.add_argument(
+        "--size",
+        default="1024x1024",
+        help="Target size; each provider uses its closest supported size. Default: 1024x1024",
+    )
+    parser.add_argument(
+        "--primary",
+        default="hunyuan",
+        choices=PROVIDERS,
+        help="Provider tried first (default: hunyuan)",
+    )
+    parser.add_argument(
+        "--secondary",
+        default="openai",
+        choices=PROVIDERS,
+        help="Provider hedged to (default: openai)",
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=90,
+        help="Hedge once the primary runs longer than this percentile of its past renders. Default: 90",
+    )
+    parser.add_argument(
+        "--hedge-after",
+        type=float,
+        default=45,
+        help="Hedge deadline in seconds when there is not enough latency history. Default: 45",
+    )
+    parser.add_argument(
+        "--keep-loser",
+        action="store_true",
+        help="Let the losing provider finish and save its image as <output>-<provider>.png",
+    )
+    parser.add_argument(
+        "--no-enhance",
+        action="store_true",
+        help="Skip Kimi K2.5 prompt enhancement and use the prompt as-is",
+    )
+    parser.add_argument(
+        "--refresh-enhance",
+        action="store_true",
+        help="Ignore any cached enhancement and ask Kimi K2.5 again",
+    )
+    add_deadline_argument(parser)
+    tracing.add_trace_argument(parser)
+    cassette.add_cassette_arguments(parser)
+
+    args = parser.parse_args(argv)
+    tracing.configure(args)
+    cassette.configure(args)
+    deadline = Deadline(args.deadline)
+
+    if args.primary == args.secondary:
+        parser.error("--primary and --secondary must be different providers")
+
+    # Kimi K2.5 enhancement always goes through Novita
+    novita_api_key = require_env("NOVITA_API_KEY", "novita_api_key")
+    api_keys = {p: require_env(*API_KEYS[p]) for p in (args.primary, args.secondary)}
+
+    enhanced_prompt = resolve_prompt(args.prompt, novita_api_key, args.no_enhance, args.refresh_enhance, deadline)
+
+    hedge_after = latency_history.percentile(
+        args.primary, history_size(args.primary, args.size), args.hedge_percentile
+    )
+    if hedge_after is None:
+        hedge_after = args.hedge_after
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        winner, sha256, win_time, loser_time = hedged_generate(
+            enhanced_prompt,
+            output_path,
+            args.size,
+            args.primary,
+            args.secondary,
+            api_keys,
+            hedge_after,
+            args.keep_loser,
+            deadline,
+        )
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    key = result_store.request_key(winner.provider, MODELS[winner.provider], enhanced_prompt, winner.size)
+    result_store.store(key, output_path, sha256, provider=winner.provider, prompt=enhanced_prompt)
+
+    print(f"\n✓ Winner: {winner.provider} in {win_time:.1f}s -> {output_path}")
+
+    if winner.provider == args.secondary:
+        # Compare against what the primary actually took, or its typical time
+        if loser_time is not None:
+            primary_time, basis = loser_time, "actual"
+        else:
+            primary_time = latency_history.percentile(args.primary, history_size(args.primary, args.size), 50)
+            basis = "median"
+        if primary_time is not None:
+            print(f"⏱ Time saved vs {args.primary} ({basis}): {primary_time - win_time:.1f}s")
+    else:
+        print(f"⏱ No hedge needed; {args.primary} finished within the deadline")
+
+
+if __name__ == "__main__":
+    main()
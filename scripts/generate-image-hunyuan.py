@@ -5,126 +5,288 @@ Generate images using Hunyuan Image 3 via Novita.ai API.
 Usage:
     python scripts/generate-image-hunyuan.py --prompt "..." --output static/img/hero/my-image.png
     python scripts/generate-image-hunyuan.py --prompt "..." --size 1024x1024 --output static/img/avatars/marketer.png
+    python scripts/generate-image-hunyuan.py --batch jobs.jsonl --concurrency 4
+
+Batch files contain one JSON job per line (blank lines and lines starting with
+"#" are ignored); pass "-" to read jobs from stdin:
+
+    {"prompt": "...", "output": "static/img/featured/post-1.png", "seed": 42}
+    {"prompt": "...", "output": "static/img/featured/post-2.png", "size": "1536x1024"}
 """
 
 import argparse
-import os
+import asyncio
+import json
 import sys
 import time
 from pathlib import Path
 
-try:
-    import requests
-except ImportError:
-    print("Error: requests package not installed. Run: pip install requests", file=sys.stderr)
-    sys.exit(1)
-
-# Import prompt enhancement utility
-try:
-    from enhance_prompt import enhance_prompt
-except ImportError:
-    print("Error: enhance_prompt module not found", file=sys.stderr)
-    sys.exit(1)
-
-
-def submit_generation(api_key: str, prompt: str, size: str = "1024x1024", seed: int = -1) -> str:
-    """Submit image generation request and return task_id."""
-    url = "https://api.novita.ai/v3/async/hunyuan-image-3"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-
-    payload = {
-        "prompt": prompt,
-        "size": size,
-    }
-
-    if seed != -1:
-        payload["seed"] = seed
-
-    print(f"Submitting generation request...")
-    print(f"Prompt: {prompt}")
-    print(f"Size: {size}")
+import daemon_client
 
-    response = requests.post(url, headers=headers, json=payload)
-
-    if not response.ok:
-        print(f"API Error: {response.status_code} - {response.text}", file=sys.stderr)
-
-    response.raise_for_status()
-
-    result = response.json()
-    task_id = result.get("task_id")
-
-    if not task_id:
-        raise ValueError(f"No task_id in response: {result}")
+if __name__ == "__main__":
+    # Hand the run to a warm image daemon when one is listening (see image_daemon.py)
+    daemon_client.delegate("hunyuan")
+
+import cassette
+from deadline import Deadline, add_deadline_argument
+from enhance_prompt import resolve_prompt, resolve_prompts
+from providers import (
+    HUNYUAN_MODEL,
+    GenerationFailed,
+    download_image,
+    parse_task_result,
+    poll_task,
+    record_task_phases,
+    render_hunyuan,
+    require_env,
+    submit_generation,
+)
+import job_journal
+import latency_history
+import poll_schedule
+import result_store
+import tracing
+
+
+def load_jobs(source: str, default_size: str, default_seed: int) -> list:
+    """Read batch jobs (one JSON object per line) from a file, or stdin for "-"."""
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(source).read_text().splitlines()
 
-    print(f"✓ Task submitted: {task_id}")
-    return task_id
+    jobs = []
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
 
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{source}:{line_no}: invalid JSON: {e}")
+
+        if not job.get("prompt") or not job.get("output"):
+            raise ValueError(f"{source}:{line_no}: each job needs 'prompt' and 'output'")
+
+        job.setdefault("size", default_size)
+        job.setdefault("seed", default_seed)
+        jobs.append(job)
+
+    return jobs
+
+
+class TaskPoller:
+    """
+    Poll every outstanding Novita task from a single asyncio loop.
+
+    Jobs register their task_id and await a future. Each task polls on its own
+    PollSchedule (backing off while queued, tightening near its expected
+    finish), so tasks that are nowhere near done do not cost a request every
+    cycle.
+    """
+
+    def __init__(self, api_key: str, poll_interval: float = poll_schedule.MIN_INTERVAL):
+        self.api_key = api_key
+        self.poll_interval = poll_interval
+        self.pending = {}
+        self.polls = 0
+        # task_id -> submitted/due times, poll count, first time seen out of the queue
+        self.progress = {}
+        # task_id -> asyncio task of a poll currently running
+        self._in_flight = {}
+        self._wakeup = asyncio.Event()
+
+    def watch(self, task_id: str, size: str = None) -> asyncio.Future:
+        """Register a task and return a future resolving to its image URL."""
+        future = asyncio.get_running_loop().create_future()
+        now = time.time()
+        schedule = poll_schedule.PollSchedule(
+            poll_schedule.expected_seconds(size) if size else None, min_interval=self.poll_interval
+        )
+        self.pending[task_id] = future
+        self.progress[task_id] = {
+            "submitted": now,
+            "due": now + cassette.wait_time(schedule.next_delay(0, "TASK_STATUS_QUEUED")),
+            "schedule": schedule,
+            "polls": 0,
+            "started": None,
+        }
+        self._wakeup.set()
+        return future
+
+    def forget(self, task_id: str):
+        """Stop polling a task (e.g. after its job timed out)."""
+        self.pending.pop(task_id, None)
+        self.progress.pop(task_id, None)
+
+    async def _poll_one(self, task_id: str):
+        try:
+            await self._check(task_id)
+        finally:
+            self._in_flight.pop(task_id, None)
+            self._wakeup.set()
 
-def get_task_result(api_key: str, task_id: str, timeout: int = 300, poll_interval: int = 2):
-    """Poll task result endpoint until generation completes."""
-    url = f"https://api.novita.ai/v3/async/task-result?task_id={task_id}"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-    }
+    async def _check(self, task_id: str):
+        try:
+            result = await asyncio.to_thread(poll_task, self.api_key, task_id)
+            image_url = parse_task_result(result)
+        except Exception as e:
+            future = self.pending.get(task_id)
+            self.forget(task_id)
+            if future and not future.done():
+                future.set_exception(e)
+            return
+
+        progress = self.progress.get(task_id)
+        if progress is not None:
+            now = time.time()
+            status = result.get("task", {}).get("status")
+            progress["polls"] += 1
+            if progress["started"] is None and status not in poll_schedule.QUEUED_STATUSES:
+                progress["started"] = now
+            # A replayed cassette answers at once, so every task is due again immediately
+            delay = progress["schedule"].next_delay(now - progress["submitted"], status)
+            progress["due"] = now + cassette.wait_time(delay)
+
+        if image_url is not None:
+            future = self.pending.pop(task_id, None)
+            if future and not future.done():
+                future.set_result(image_url)
+
+    async def run(self):
+        """Poll until cancelled, idling until the next task is due."""
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            waiting = [t for t in self.pending if t not in self._in_flight and t in self.progress]
+
+            for task_id in waiting:
+                if self.progress[task_id]["due"] <= now:
+                    self.polls += 1
+                    self._in_flight[task_id] = asyncio.create_task(self._poll_one(task_id))
+
+            due = [self.progress[t]["due"] for t in waiting if self.progress[t]["due"] > now]
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, min(due) - now) if due else None)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def run_job(
+    index: int,
+    total: int,
+    job: dict,
+    prompt: str,
+    api_key: str,
+    poller: TaskPoller,
+    semaphore: asyncio.Semaphore,
+    timeout: int,
+):
+    """Submit, await and download a single batch job with its resolved prompt."""
+    label = f"[{index}/{total}] {job['output']}"
+
+    async with semaphore:
+        with tracing.span("job", provider="hunyuan", model=HUNYUAN_MODEL, size=job["size"], output=job["output"]):
+            output_path = Path(job["output"])
+            key = result_store.request_key("hunyuan", HUNYUAN_MODEL, prompt, job["size"], seed=job["seed"])
+            if job["seed"] != -1 and await asyncio.to_thread(result_store.fetch, key, output_path):
+                return
+
+            size_novita = job["size"].replace("x", "*")
+            task_id = await asyncio.to_thread(submit_generation, api_key, prompt, size_novita, job["seed"])
+            start_time = time.time()
+            await asyncio.to_thread(
+                job_journal.record_submission,
+                "hunyuan",
+                HUNYUAN_MODEL,
+                task_id,
+                prompt,
+                output_path,
+                job["size"],
+                job["seed"],
+            )
+
+            try:
+                image_url = await asyncio.wait_for(poller.watch(task_id, job["size"]), timeout)
+            except asyncio.TimeoutError:
+                poller.forget(task_id)
+                raise TimeoutError(f"Task {task_id} did not complete within {timeout} seconds (journaled for resume)")
+            except GenerationFailed as e:
+                await asyncio.to_thread(job_journal.finish, task_id, job_journal.FAILED, error=str(e))
+                raise
+
+            progress = poller.progress.pop(task_id, {"polls": 0, "started": None})
+            record_task_phases(task_id, start_time, progress["started"], time.time(), progress["polls"])
+            poll_schedule.record(job["size"], time.time() - start_time)
+
+            print(f"✓ {label}: generation complete ({time.time() - start_time:.1f}s)")
+            sha256 = await asyncio.to_thread(download_image, image_url, output_path)
+            latency_history.record("hunyuan", job["size"], time.time() - start_time)
+            await asyncio.to_thread(result_store.store, key, output_path, sha256, provider="hunyuan", prompt=prompt)
+            await asyncio.to_thread(job_journal.finish, task_id, job_journal.DONE, sha256=sha256)
+
+
+async def run_batch(
+    api_key: str,
+    jobs: list,
+    concurrency: int = 4,
+    timeout: int = 300,
+    poll_interval: float = poll_schedule.MIN_INTERVAL,
+    no_enhance: bool = False,
+    refresh_enhance: bool = False,
+) -> int:
+    """Run batch jobs concurrently and return the number of failed jobs."""
+    poller = TaskPoller(api_key, poll_interval)
+    semaphore = asyncio.Semaphore(concurrency)
+    poller_task = asyncio.create_task(poller.run())
 
     start_time = time.time()
-    print(f"Polling for results (timeout: {timeout}s)...")
-
-    while True:
-        elapsed = time.time() - start_time
-        if elapsed > timeout:
-            raise TimeoutError(f"Task did not complete within {timeout} seconds")
-
-        response = requests.get(url, headers=headers)
-
-        if not response.ok:
-            print(f"API Error: {response.status_code} - {response.text}", file=sys.stderr)
-
-        response.raise_for_status()
-
-        result = response.json()
-        task_status = result.get("task", {}).get("status")
-
-        if task_status == "TASK_STATUS_SUCCEED":
-            print(f"✓ Generation complete ({elapsed:.1f}s)")
-            images = result.get("images", [])
-            if not images:
-                raise ValueError(f"No images in result: {result}")
-            return images[0].get("image_url")
-
-        elif task_status == "TASK_STATUS_FAILED":
-            error_msg = result.get("task", {}).get("reason", "Unknown error")
-            raise RuntimeError(f"Generation failed: {error_msg}")
-
-        elif task_status in ["TASK_STATUS_QUEUED", "TASK_STATUS_PENDING", "TASK_STATUS_PROCESSING"]:
-            print(f"  Status: {task_status} ({elapsed:.1f}s elapsed)")
-            time.sleep(poll_interval)
-
-        else:
-            raise ValueError(f"Unknown task status: {task_status}")
-
 
-def download_image(image_url: str, output_path: Path):
-    """Download image from URL and save to output path."""
-    print(f"Downloading image...")
-    response = requests.get(image_url)
-    response.raise_for_status()
+    try:
+        # Enhance every prompt up front in as few Kimi K2.5 requests as possible,
+        # taking no longer than one job may
+        prompts = await asyncio.to_thread(
+            resolve_prompts,
+            [job["prompt"] for job in jobs],
+            api_key,
+            no_enhance,
+            refresh_enhance,
+            Deadline(timeout, "enhance"),
+        )
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_bytes(response.content)
-    print(f"✓ Image saved to {output_path}")
+        print(f"Running {len(jobs)} jobs (concurrency: {concurrency}, timeout: {timeout}s)...")
+        results = await asyncio.gather(
+            *(
+                run_job(i, len(jobs), job, prompt, api_key, poller, semaphore, timeout)
+                for i, (job, prompt) in enumerate(zip(jobs, prompts), start=1)
+            ),
+            return_exceptions=True,
+        )
+    finally:
+        poller_task.cancel()
+
+    failures = 0
+    for job, result in zip(jobs, results):
+        if isinstance(result, BaseException):
+            failures += 1
+            print(f"Error: {job['output']}: {result}", file=sys.stderr)
+
+    elapsed = time.time() - start_time
+    print(
+        f"✓ Batch finished: {len(jobs) - failures}/{len(jobs)} succeeded "
+        f"in {elapsed:.1f}s ({poller.polls} polls)"
+    )
+    if failures:
+        print("Unfinished tasks are journaled; run: python scripts/job_journal.py resume")
+    return failures
 
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(description="Generate images using Hunyuan Image 3")
-    parser.add_argument("--prompt", required=True, help="Image generation prompt")
+    parser.add_argument("--prompt", help="Image generation prompt")
     parser.add_argument(
         "--output",
-        required=True,
         help="Output path (e.g., static/img/hero/post-name.png)",
     )
     parser.add_argument(
@@ -149,50 +311,108 @@ def main():
         action="store_true",
         help="Skip Kimi K2.5 prompt enhancement and use the prompt as-is",
     )
+    parser.add_argument(
+        "--refresh-enhance",
+        action="store_true",
+        help="Ignore any cached enhancement and ask Kimi K2.5 again",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Run many jobs from a JSON-lines file ('-' for stdin) instead of --prompt/--output",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of batch jobs in flight at once. Default: 4",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=poll_schedule.MIN_INTERVAL,
+        help="Shortest gap between task-result polls; the actual gap adapts to task status. Default: 1",
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Also write optimized WebP/AVIF variants and update the manifest (see optimize_images.py)",
+    )
+    add_deadline_argument(parser)
+    tracing.add_trace_argument(parser)
+    cassette.add_cassette_arguments(parser)
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    tracing.configure(args)
+    cassette.configure(args)
+
+    if args.batch is None and not (args.prompt and args.output):
+        parser.error("--prompt and --output are required unless --batch is given")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.batch is not None and args.deadline is not None:
+        parser.error("--deadline applies to single-image runs; use --timeout to bound each batch job")
 
     # Get Novita.ai API key from environment
-    api_key = os.environ.get("NOVITA_API_KEY")
-    if not api_key:
-        print(
-            "Error: NOVITA_API_KEY environment variable not set",
-            file=sys.stderr,
-        )
-        print(
-            "Run: export NOVITA_API_KEY=$(sops -d secrets.yaml | yq .novita_api_key)",
-            file=sys.stderr,
+    api_key = require_env("NOVITA_API_KEY", "novita_api_key")
+
+    if args.batch is not None:
+        try:
+            jobs = load_jobs(args.batch, args.size, args.seed)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+        failures = asyncio.run(
+            run_batch(
+                api_key,
+                jobs,
+                concurrency=args.concurrency,
+                timeout=args.timeout,
+                poll_interval=args.poll_interval,
+                no_enhance=args.no_enhance,
+                refresh_enhance=args.refresh_enhance,
+            )
         )
-        sys.exit(1)
+        if args.optimize:
+            from optimize_images import optimize
+
+            optimize([Path(job["output"]) for job in jobs if Path(job["output"]).exists()])
+        sys.exit(1 if failures else 0)
+
+    deadline = Deadline(args.deadline)
 
     # Enhance prompt using Kimi K2.5 (unless --no-enhance)
-    if args.no_enhance:
-        print("Skipping prompt enhancement (--no-enhance)")
-        enhanced_prompt = args.prompt
-    else:
-        try:
-            enhanced_prompt = enhance_prompt(args.prompt, api_key)
-        except Exception as e:
-            print(f"Warning: Prompt enhancement failed, using original prompt. {e}", file=sys.stderr)
-            enhanced_prompt = args.prompt
+    enhanced_prompt = resolve_prompt(args.prompt, api_key, args.no_enhance, args.refresh_enhance, deadline)
 
-    try:
-        # Convert size from "1024x1024" to "1024*1024" (Novita API format)
-        size_novita = args.size.replace("x", "*")
+    output_path = Path(args.output)
+    key = result_store.request_key("hunyuan", HUNYUAN_MODEL, enhanced_prompt, args.size, seed=args.seed)
 
-        # Submit generation request with enhanced prompt
-        task_id = submit_generation(api_key, enhanced_prompt, size_novita, args.seed)
+    # Only a fixed seed makes a render reproducible; -1 always asks for a new image
+    reused = args.seed != -1 and result_store.fetch(key, output_path)
 
-        # Poll for results
-        image_url = get_task_result(api_key, task_id, args.timeout)
-        print(f"Image URL: {image_url}")
+    if not reused:
+        try:
+            sha256 = render_hunyuan(
+                api_key,
+                enhanced_prompt,
+                output_path,
+                size=args.size,
+                seed=args.seed,
+                timeout=args.timeout,
+                poll_interval=args.poll_interval,
+                deadline=deadline,
+            )
+            result_store.store(key, output_path, sha256, provider="hunyuan", prompt=enhanced_prompt)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
 
-        # Download and save
-        download_image(image_url, Path(args.output))
+    if args.optimize:
+        # Imported lazily: Pillow is only needed for this post-processing step
+        from optimize_images import optimize
 
-    except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
-        sys.exit(1)
+        optimize([output_path])
 
 
 if __name__ == "__main__":
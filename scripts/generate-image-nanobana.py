@@ -5,28 +5,33 @@ Generate images using Google Gemini 2.5 Flash Image (nano-banana) API.
 Usage:
     python scripts/generate-image-nanobana.py --prompt "..." --output static/img/hero/my-image.png
     python scripts/generate-image-nanobana.py --prompt "..." --size 1024x1024 --output static/img/avatars/marketer.png
+    python scripts/generate-image-nanobana.py --prompt "..." --candidates 3 --output static/img/hero/my-image.png
+
+--size is sent as the closest aspect ratio Gemini supports (1792x1024 -> 16:9).
+The returned image bytes are written as-is unless the output suffix asks for
+another format. --candidates N saves every image from one request as
+my-image-1.png ... my-image-N.png.
 """
 
 import argparse
-import os
 import sys
 from pathlib import Path
 
-try:
-    import google.genai as genai
-except ImportError:
-    print("Error: google-genai package not installed. Run: pip install google-genai", file=sys.stderr)
-    sys.exit(1)
+import daemon_client
+
+if __name__ == "__main__":
+    # Hand the run to a warm image daemon when one is listening (see image_daemon.py)
+    daemon_client.delegate("nanobana")
 
-# Import prompt enhancement utility
-try:
-    from enhance_prompt import enhance_prompt
-except ImportError:
-    print("Error: enhance_prompt module not found", file=sys.stderr)
-    sys.exit(1)
+import cassette
+from deadline import Deadline, add_deadline_argument
+from enhance_prompt import resolve_prompt
+from providers import GEMINI_IMAGE_MODEL, candidate_paths, render_gemini_candidates, require_env
+import result_store
+import tracing
 
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(description="Generate images using Google Gemini 2.5 Flash Image")
     parser.add_argument("--prompt", required=True, help="Image generation prompt")
     parser.add_argument(
@@ -37,91 +42,87 @@ def main():
     parser.add_argument(
         "--size",
         default="1792x1024",
-        help="Image size (e.g., 1024x1024, 1792x1024). Supported sizes vary by model.",
+        help="Image size (e.g., 1024x1024, 1792x1024), sent as the closest supported aspect ratio",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=1,
+        help="Images to request in one call, saved as NAME-1.png ... NAME-N.png (default: 1)",
     )
     parser.add_argument(
         "--no-enhance",
         action="store_true",
         help="Skip Kimi K2.5 prompt enhancement and use the prompt as-is",
     )
+    parser.add_argument(
+        "--refresh-enhance",
+        action="store_true",
+        help="Ignore any cached enhancement and ask Kimi K2.5 again",
+    )
+    parser.add_argument(
+        "--reuse",
+        action="store_true",
+        help="Reuse a stored image from an identical earlier request instead of rendering a new variant",
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Also write optimized WebP/AVIF variants and update the manifest (see optimize_images.py)",
+    )
+    add_deadline_argument(parser)
+    tracing.add_trace_argument(parser)
+    cassette.add_cassette_arguments(parser)
+
+    args = parser.parse_args(argv)
+    tracing.configure(args)
+    cassette.configure(args)
+    deadline = Deadline(args.deadline)
 
-    args = parser.parse_args()
+    if args.candidates < 1:
+        parser.error("--candidates must be at least 1")
 
     # Get API keys from environment
-    api_key = os.environ.get("GEMINI_API_KEY")
-    novita_api_key = os.environ.get("NOVITA_API_KEY")
+    api_key = require_env("GEMINI_API_KEY", "gemini_api_key")
+    novita_api_key = require_env("NOVITA_API_KEY", "novita_api_key")
 
-    if not api_key:
-        print(
-            "Error: GEMINI_API_KEY environment variable not set",
-            file=sys.stderr,
-        )
-        print(
-            "Run: export GEMINI_API_KEY=$(sops -d secrets.yaml | yq .gemini_api_key)",
-            file=sys.stderr,
-        )
-        sys.exit(1)
+    # Enhance prompt using Kimi K2.5 (unless --no-enhance)
+    enhanced_prompt = resolve_prompt(args.prompt, novita_api_key, args.no_enhance, args.refresh_enhance, deadline)
 
-    if not novita_api_key:
-        print(
-            "Error: NOVITA_API_KEY environment variable not set",
-            file=sys.stderr,
-        )
-        print(
-            "Run: export NOVITA_API_KEY=$(sops -d secrets.yaml | yq .novita_api_key)",
-            file=sys.stderr,
+    output_paths = candidate_paths(Path(args.output), args.candidates)
+    # Gemini has no seed; the candidate index tells the images of one request apart
+    keys = [
+        result_store.request_key(
+            "gemini", GEMINI_IMAGE_MODEL, enhanced_prompt, args.size, seed=i if args.candidates > 1 else None
         )
-        sys.exit(1)
+        for i in range(1, args.candidates + 1)
+    ]
 
-    # Enhance prompt using Kimi K2.5 (unless --no-enhance)
-    if args.no_enhance:
-        print("Skipping prompt enhancement (--no-enhance)")
-        enhanced_prompt = args.prompt
-    else:
-        try:
-            enhanced_prompt = enhance_prompt(args.prompt, novita_api_key)
-        except Exception as e:
-            print(f"Warning: Prompt enhancement failed, using original prompt. {e}", file=sys.stderr)
-            enhanced_prompt = args.prompt
+    # Identical requests only reuse stored images on request
+    reused = args.reuse and all(result_store.fetch(key, path) for key, path in zip(keys, output_paths))
+
+    if not reused:
+        print(f"Generating image with enhanced prompt")
+        print(f"Size: {args.size}")
+        print(f"Model: {GEMINI_IMAGE_MODEL}")
 
-    # Configure the client
-    client = genai.Client(api_key=api_key)
+        try:
+            hashes = render_gemini_candidates(
+                api_key, enhanced_prompt, output_paths, deadline=deadline, size=args.size
+            )
+            for key, path, sha256 in zip(keys, output_paths, hashes):
+                result_store.store(key, path, sha256, provider="gemini", prompt=enhanced_prompt)
+            output_paths = output_paths[: len(hashes)]
 
-    print(f"Generating image with enhanced prompt")
-    print(f"Size: {args.size}")
-    print(f"Model: gemini-2.5-flash-image")
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
 
-    try:
-        # Generate image using Gemini with enhanced prompt
-        response = client.models.generate_content(
-            model="gemini-2.5-flash-image",
-            contents=[enhanced_prompt],
-        )
+    if args.optimize:
+        # Imported lazily: Pillow is only needed for this post-processing step
+        from optimize_images import optimize
 
-        # Ensure output directory exists
-        output_path = Path(args.output)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Extract and save image from response
-        image_saved = False
-        for part in response.parts:
-            if part.text is not None:
-                print(f"Model response: {part.text}")
-            elif part.inline_data is not None:
-                print(f"Saving image to {args.output}...")
-                image = part.as_image()
-                image.save(str(output_path))
-                image_saved = True
-                break
-
-        if not image_saved:
-            raise ValueError("No image was generated in the response")
-
-        print(f"✓ Image saved to {args.output}")
-
-    except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
-        sys.exit(1)
+        optimize(output_paths)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Generate a post's hero, featured and avatar images from a single render.
+
+One high-resolution master is rendered with the chosen provider (at its
+usual hero size), and every requested target is cropped out of it locally
+(see image_crops.py): the crop follows the most salient region of the
+master, or --focus, and is resampled with Lanczos in a worker pool. A full
+asset set therefore costs one queue-plus-render cycle instead of three.
+
+The master is kept in the result store, so re-deriving with a different
+focus or size does not render again: pass --from-master with its path (printed
+after each run), or reuse it implicitly via a fixed Hunyuan --seed or --reuse.
+--optimize also writes the WebP/AVIF variants of every derived image.
+
+Usage:
+    python scripts/generate-image-set.py --prompt "..." \\
+        --hero static/img/hero/post.png --featured static/img/featured/post.png --avatar static/img/avatars/post.png
+    python scripts/generate-image-set.py --prompt "..." --provider openai --featured static/img/featured/post.png
+    python scripts/generate-image-set.py --from-master master.png --featured static/img/featured/post.png --focus 0.6,0.4
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import daemon_client
+
+if __name__ == "__main__":
+    # Hand the run to a warm image daemon when one is listening (see image_daemon.py)
+    daemon_client.delegate("set")
+
+import cassette
+from deadline import Deadline, add_deadline_argument
+from disk_cache import cache_dir
+from image_crops import add_target_arguments, derive_all, print_results, targets_from_args
+import tracing
+
+PROVIDERS = ("hunyuan", "openai", "gemini")
+
+# Master size per provider: its largest landscape render, so the hero needs no crop
+# and squares are cut at full height
+MASTER_SIZES = {
+    "hunyuan": "1536x1024",
+    "openai": "1792x1024",
+    "gemini": "1792x1024",
+}
+
+API_KEYS = {
+    "hunyuan": ("NOVITA_API_KEY", "novita_api_key"),
+    "openai": ("OPENAI_API_KEY", "openai_api_key"),
+    "gemini": ("GEMINI_API_KEY", "gemini_api_key"),
+}
+
+
+def render_master(args, deadline: Deadline) -> Path:
+    """Render (or fetch from the result store) the master for args.prompt and return its path."""
+    from enhance_prompt import resolve_prompt
+    from providers import GEMINI_IMAGE_MODEL, HUNYUAN_MODEL, render_dalle, render_gemini, render_hunyuan, require_env
+    import result_store
+
+    # Kimi K2.5 enhancement always goes through Novita
+    novita_api_key = require_env(*API_KEYS["hunyuan"])
+    api_key = require_env(*API_KEYS[args.provider])
+    size = args.size or MASTER_SIZES[args.provider]
+
+    prompt = resolve_prompt(args.prompt, novita_api_key, args.no_enhance, args.refresh_enhance, deadline)
+
+    if args.provider == "hunyuan":
+        key = result_store.request_key("hunyuan", HUNYUAN_MODEL, prompt, size, seed=args.seed)
+        reusable = args.seed != -1 or args.reuse
+    elif args.provider == "openai":
+        key = result_store.request_key("openai", "dall-e-3", prompt, size, quality=args.quality)
+        reusable = args.reuse
+    else:
+        key = result_store.request_key("gemini", GEMINI_IMAGE_MODEL, prompt, size)
+        reusable = args.reuse
+
+    master_path = Path(args.master) if args.master else cache_dir("masters") / f"{key[:16]}.png"
+    master_path.parent.mkdir(parents=True, exist_ok=True)
+    if reusable and result_store.fetch(key, master_path):
+        return master_path
+
+    print(f"Rendering {size} master with {args.provider}...")
+    if args.provider == "hunyuan":
+        sha256 = render_hunyuan(api_key, prompt, master_path, size=size, seed=args.seed, deadline=deadline)
+    elif args.provider == "openai":
+        sha256 = render_dalle(api_key, prompt, master_path, size=size, quality=args.quality, deadline=deadline)
+    else:
+        sha256 = render_gemini(api_key, prompt, master_path, deadline=deadline, size=size)
+    result_store.store(key, master_path, sha256, provider=args.provider, prompt=prompt)
+    return master_path
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(
+        description="Generate hero, featured and avatar images from one master render"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--prompt", help="Image generation prompt for the master")
+    source.add_argument("--from-master", type=Path, metavar="PATH", help="Derive from an existing master instead")
+    parser.add_argument(
+        "--provider",
+        default="hunyuan",
+        choices=PROVIDERS,
+        help="Provider that renders the master (default: hunyuan)",
+    )
+    parser.add_argument(
+        "--size",
+        help="Master size (default: the provider's hero size: "
+        + ", ".join(f"{p} {s}" for p, s in MASTER_SIZES.items())
+        + ")",
+    )
+    parser.add_argument("--master", metavar="PATH", help="Also keep the master here (default: the local cache)")
+    parser.add_argument("--seed", type=int, default=-1, help="Hunyuan seed; a fixed seed reuses a stored master")
+    parser.add_argument(
+        "--quality",
+        default="hd",
+        choices=["standard", "hd"],
+        help="DALL-E quality (default: hd, since every target is cut from the master)",
+    )
+    parser.add_argument("--reuse", action="store_true", help="Reuse a stored master for an identical request")
+    parser.add_argument(
+        "--no-enhance",
+        action="store_true",
+        help="Skip Kimi K2.5 prompt enhancement and use the prompt as-is",
+    )
+    parser.add_argument(
+        "--refresh-enhance",
+        action="store_true",
+        help="Ignore any cached enhancement and ask Kimi K2.5 again",
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Also write optimized WebP/AVIF variants of each derived image and update the manifest "
+        "(see optimize_images.py)",
+    )
+    add_target_arguments(parser)
+    add_deadline_argument(parser)
+    tracing.add_trace_argument(parser)
+    cassette.add_cassette_arguments(parser)
+
+    args = parser.parse_args(argv)
+    tracing.configure(args)
+    cassette.configure(args)
+    targets, focus = targets_from_args(parser, args)
+    deadline = Deadline(args.deadline)
+
+    start_time = time.time()
+    if args.from_master:
+        if not args.from_master.is_file():
+            parser.error(f"--from-master: {args.from_master} does not exist")
+        master_path = args.from_master
+    else:
+        try:
+            master_path = render_master(args, deadline)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    print(f"✓ Master: {master_path}")
+
+    with tracing.span("derive", targets=len(targets)):
+        results = derive_all(master_path, targets, focus)
+    print_results(results)
+    print(f"\n✓ {len(results)} images from one master in {time.time() - start_time:.1f}s")
+
+    if args.optimize:
+        # Imported lazily: only needed for this post-processing step
+        from optimize_images import optimize
+
+        optimize([output for output, _, _ in results.values()])
+
+
+if __name__ == "__main__":
+    main()
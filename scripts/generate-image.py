@@ -8,31 +8,24 @@ Usage:
 """
 
 import argparse
-import os
 import sys
 from pathlib import Path
 
-try:
-    from openai import OpenAI
-except ImportError:
-    print("Error: openai package not installed. Run: pip install openai", file=sys.stderr)
-    sys.exit(1)
+import daemon_client
 
-try:
-    import requests
-except ImportError:
-    print("Error: requests package not installed. Run: pip install requests", file=sys.stderr)
-    sys.exit(1)
+if __name__ == "__main__":
+    # Hand the run to a warm image daemon when one is listening (see image_daemon.py)
+    daemon_client.delegate("openai")
 
-# Import prompt enhancement utility
-try:
-    from enhance_prompt import enhance_prompt
-except ImportError:
-    print("Error: enhance_prompt module not found", file=sys.stderr)
-    sys.exit(1)
+import cassette
+from deadline import Deadline, add_deadline_argument
+from enhance_prompt import resolve_prompt
+from providers import render_dalle, require_env
+import result_store
+import tracing
 
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(description="Generate images using OpenAI DALL-E")
     parser.add_argument("--prompt", required=True, help="Image generation prompt")
     parser.add_argument(
@@ -63,86 +56,68 @@ def main():
         action="store_true",
         help="Skip Kimi K2.5 prompt enhancement and use the prompt as-is",
     )
+    parser.add_argument(
+        "--refresh-enhance",
+        action="store_true",
+        help="Ignore any cached enhancement and ask Kimi K2.5 again",
+    )
+    parser.add_argument(
+        "--reuse",
+        action="store_true",
+        help="Reuse a stored image from an identical earlier request instead of rendering a new variant",
+    )
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Also write optimized WebP/AVIF variants and update the manifest (see optimize_images.py)",
+    )
+    add_deadline_argument(parser)
+    tracing.add_trace_argument(parser)
+    cassette.add_cassette_arguments(parser)
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    tracing.configure(args)
+    cassette.configure(args)
+    deadline = Deadline(args.deadline)
 
     # Get API keys from environment
-    api_key = os.environ.get("OPENAI_API_KEY")
-    novita_api_key = os.environ.get("NOVITA_API_KEY")
-
-    if not api_key:
-        print(
-            "Error: OPENAI_API_KEY environment variable not set",
-            file=sys.stderr,
-        )
-        print(
-            "Run: export OPENAI_API_KEY=$(sops -d secrets.yaml | yq .openai_api_key)",
-            file=sys.stderr,
-        )
-        sys.exit(1)
-
-    if not novita_api_key:
-        print(
-            "Error: NOVITA_API_KEY environment variable not set",
-            file=sys.stderr,
-        )
-        print(
-            "Run: export NOVITA_API_KEY=$(sops -d secrets.yaml | yq .novita_api_key)",
-            file=sys.stderr,
-        )
-        sys.exit(1)
+    api_key = require_env("OPENAI_API_KEY", "openai_api_key")
+    novita_api_key = require_env("NOVITA_API_KEY", "novita_api_key")
 
     # Enhance prompt using Kimi K2.5 (unless --no-enhance)
-    if args.no_enhance:
-        print("Skipping prompt enhancement (--no-enhance)")
-        enhanced_prompt = args.prompt
-    else:
+    enhanced_prompt = resolve_prompt(args.prompt, novita_api_key, args.no_enhance, args.refresh_enhance, deadline)
+
+    output_path = Path(args.output)
+    key = result_store.request_key("openai", args.model, enhanced_prompt, args.size, quality=args.quality)
+
+    # DALL-E has no seed, so identical requests only reuse a stored image on request
+    reused = args.reuse and result_store.fetch(key, output_path)
+
+    if not reused:
+        print(f"Generating image with enhanced prompt")
+        print(f"Size: {args.size}, Quality: {args.quality}, Model: {args.model}")
+
         try:
-            enhanced_prompt = enhance_prompt(args.prompt, novita_api_key)
+            sha256 = render_dalle(
+                api_key,
+                enhanced_prompt,
+                output_path,
+                size=args.size,
+                quality=args.quality,
+                model=args.model,
+                deadline=deadline,
+            )
+            result_store.store(key, output_path, sha256, provider="openai", prompt=enhanced_prompt)
+
         except Exception as e:
-            print(f"Warning: Prompt enhancement failed, using original prompt. {e}", file=sys.stderr)
-            enhanced_prompt = args.prompt
-
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
-
-    print(f"Generating image with enhanced prompt")
-    print(f"Size: {args.size}, Quality: {args.quality}, Model: {args.model}")
-
-    try:
-        # Generate image with enhanced prompt
-        response = client.images.generate(
-            model=args.model,
-            prompt=enhanced_prompt,
-            size=args.size,
-            quality=args.quality,
-            n=1,
-        )
-
-        # Get image URL
-        image_url = response.data[0].url
-        print(f"Image generated: {image_url}")
-
-        # Download image
-        print(f"Downloading to {args.output}...")
-        image_response = requests.get(image_url)
-        image_response.raise_for_status()
-
-        # Ensure output directory exists
-        output_path = Path(args.output)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Save image
-        output_path.write_bytes(image_response.content)
-        print(f"✓ Image saved to {args.output}")
-
-        # Print revised prompt if available
-        if hasattr(response.data[0], "revised_prompt") and response.data[0].revised_prompt:
-            print(f"\nRevised prompt: {response.data[0].revised_prompt}")
-
-    except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
-        sys.exit(1)
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.optimize:
+        # Imported lazily: Pillow is only needed for this post-processing step
+        from optimize_images import optimize
+
+        optimize([output_path])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Backoff helpers shared by the provider calls and image downloads.
+
+Rate limits (429) and transient server errors (5xx) are retried with
+jittered exponential backoff, or after the delay the server asks for in
+Retry-After. A 429 pauses every request from this process until then (or
+until the request's deadline), so concurrent batch jobs back off together
+instead of each hitting the limit.
+"""
+
+import email.utils
+import random
+import threading
+import time
+
+from deadline import Deadline
+
+# Responses worth retrying, and how many times to try a request in total
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+# Monotonic time before which no request is sent, set from 429 Retry-After
+_paused_until = 0.0
+_pause_lock = threading.Lock()
+
+
+def retry_after_seconds(response):
+    """Seconds a Retry-After header asks us to wait (delta or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter: half fixed, half random, capped at BACKOFF_MAX."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_delay(response, attempt: int) -> float:
+    """
+    How long to wait before retrying a transient error response.
+
+    Uses Retry-After when present, backoff otherwise; a 429 also pauses all
+    other requests from this process for that long.
+    """
+    wait = retry_after_seconds(response)
+    delay = wait if wait is not None else backoff_delay(attempt)
+    if response.status_code == 429:
+        pause_requests(delay)
+    return delay
+
+
+def pause_requests(seconds: float):
+    """Hold back every request made through wait_if_paused() for seconds."""
+    global _paused_until
+
+    with _pause_lock:
+        _paused_until = max(_paused_until, time.monotonic() + seconds)
+
+
+def wait_if_paused(deadline: Deadline = None):
+    """
+    Sleep until a pause set by a 429 has passed, or until the deadline if that comes first.
+
+    Raises:
+        DeadlineExceeded: If the pause outlasts the deadline
+    """
+    with _pause_lock:
+        wait = _paused_until - time.monotonic()
+    if wait > 0:
+        deadline = deadline or Deadline()
+        deadline.sleep(wait)
+        deadline.check()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Derive hero, featured and avatar crops from one master render.
+
+A crop window of each target's aspect ratio is placed where the master is
+most salient: a small saliency map (edge energy plus colour distinctiveness
+against the image's mean colour, with a mild centre bias) is searched with a
+summed-area table for the window holding the most saliency. A focus point
+(fractions of width and height) overrides the search. Avatars use a tighter
+window than featured images, so the subject fills more of the frame.
+
+Each window is resampled to its target size with Lanczos in a worker
+process and written atomically; targets are processed in parallel.
+
+Usage:
+    python scripts/image_crops.py master.png --hero static/img/hero/post.png \\
+        --featured static/img/featured/post.png --avatar static/img/avatars/post.png
+    python scripts/image_crops.py master.png --featured static/img/featured/post.png --focus 0.3,0.4
+"""
+
+import argparse
+import io
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageFilter, ImageStat
+except ImportError:
+    print("Error: Pillow package not installed. Run: pip install pillow", file=sys.stderr)
+    sys.exit(1)
+
+from downloads import SUFFIX_FORMATS, write_atomic
+from image_jobs import process_context
+
+# Target -> (default size, share of the largest window of its aspect ratio to crop);
+# the hero keeps the master's own size unless told otherwise
+TARGETS = {
+    "hero": (None, 1.0),
+    "featured": ("1024x1024", 1.0),
+    "avatar": ("1024x1024", 0.7),
+}
+
+SALIENCY_WIDTH = 128
+CENTER_BIAS = 0.35
+EDGE_WEIGHT = 0.5
+
+
+def parse_size(size: str) -> tuple:
+    width, _, height = size.lower().partition("x")
+    return int(width), int(height)
+
+
+def saliency_map(image: "Image.Image", width: int = SALIENCY_WIDTH) -> tuple:
+    """
+    A coarse saliency map of image.
+
+    Returns:
+        (map width, map height, row-major list of saliency values in [0, 1])
+    """
+    height = max(1, round(image.height * width / image.width))
+    small = image.convert("RGB").resize((width, height), Image.Resampling.BOX)
+
+    edges = small.convert("L").filter(ImageFilter.FIND_EDGES).filter(ImageFilter.GaussianBlur(2)).tobytes()
+    mean = ImageStat.Stat(small).mean
+    blurred = small.filter(ImageFilter.GaussianBlur(3)).tobytes()
+    pixels = zip(blurred[0::3], blurred[1::3], blurred[2::3])
+    distinct = [sum((c - m) ** 2 for c, m in zip(pixel, mean)) ** 0.5 for pixel in pixels]
+
+    edge_max = max(edges) or 1
+    distinct_max = max(distinct) or 1
+    values = []
+    for i, (edge, dist) in enumerate(zip(edges, distinct)):
+        y, x = divmod(i, width)
+        # Squared distance from the centre, 0 in the middle to about 1 in a corner
+        offset = ((x / width - 0.5) ** 2 + (y / height - 0.5) ** 2) * 2
+        score = EDGE_WEIGHT * edge / edge_max + (1 - EDGE_WEIGHT) * dist / distinct_max
+        values.append(score * (1 - CENTER_BIAS * offset))
+    return width, height, values
+
+
+def _summed_area(width: int, height: int, values: list) -> list:
+    """(width + 1) x (height + 1) summed-area table, row-major."""
+    table = [0.0] * ((width + 1) * (height + 1))
+    for y in range(height):
+        row_sum = 0.0
+        for x in range(width):
+            row_sum += values[y * width + x]
+            table[(y + 1) * (width + 1) + x + 1] = table[y * (width + 1) + x + 1] + row_sum
+    return table
+
+
+def crop_window(image_size: tuple, target_size: tuple, zoom: float = 1.0, focus: tuple = None, saliency=None) -> tuple:
+    """
+    Pick the crop box for a target.
+
+    Args:
+        image_size: (width, height) of the master
+        target_size: (width, height) of the target; only its aspect ratio matters here
+        zoom: Share of the largest window of the target's aspect ratio to use
+        focus: (x, y) fractions of the master to centre on, instead of the saliency search
+        saliency: saliency_map() of the master (needed without focus)
+
+    Returns:
+        (left, top, right, bottom) in master pixels
+    """
+    image_w, image_h = image_size
+    aspect = target_size[0] / target_size[1]
+    crop_w = min(image_w, image_h * aspect) * zoom
+    crop_h = crop_w / aspect
+
+    if focus is not None:
+        left = focus[0] * image_w - crop_w / 2
+        top = focus[1] * image_h - crop_h / 2
+    else:
+        map_w, map_h, values = saliency
+        scale = map_w / image_w
+        win_w = max(1, min(map_w, round(crop_w * scale)))
+        win_h = max(1, min(map_h, round(crop_h * scale)))
+        table = _summed_area(map_w, map_h, values)
+        stride = map_w + 1
+
+        best, best_key = (0, 0), None
+        for y in range(map_h - win_h + 1):
+            for x in range(map_w - win_w + 1):
+                total = (
+                    table[(y + win_h) * stride + x + win_w]
+                    - table[y * stride + x + win_w]
+                    - table[(y + win_h) * stride + x]
+                    + table[y * stride + x]
+                )
+                # Ties go to the window nearest the centre
+                distance = abs(x + win_w / 2 - map_w / 2) + abs(y + win_h / 2 - map_h / 2)
+                key = (round(total, 6), -distance)
+                if best_key is None or key > best_key:
+                    best, best_key = (x, y), key
+        left, top = best[0] / scale, best[1] / scale
+
+    left = min(max(0.0, left), image_w - crop_w)
+    top = min(max(0.0, top), image_h - crop_h)
+    return round(left), round(top), round(left + crop_w), round(top + crop_h)
+
+
+def derive(master_path: Path, output_path: Path, size: str, box: tuple) -> str:
+    """Crop box out of the master, resample it to size with Lanczos and save it; returns its SHA-256."""
+    with Image.open(master_path) as master:
+        master.load()
+        crop = master.crop(box).resize(parse_size(size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    image_format = SUFFIX_FORMATS.get(output_path.suffix.lower(), "png")
+    if image_format == "jpeg" and crop.mode != "RGB":
+        crop = crop.convert("RGB")
+    buffer = io.BytesIO()
+    crop.save(buffer, format=image_format.upper(), optimize=True)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    return write_atomic(output_path, buffer.getvalue())
+
+
+def derive_all(master_path: Path, targets: dict, focus: tuple = None, workers: int = None) -> dict:
+    """
+    Write every target from one master.
+
+    Args:
+        targets: {name: (output path, size or None for the master's size, zoom)}
+        focus: (x, y) fractions to centre every crop on, instead of the saliency search
+
+    Returns:
+        {name: (output path, crop box, SHA-256)}
+    """
+    with Image.open(master_path) as master:
+        master.load()
+        image_size = master.size
+        saliency = saliency_map(master) if focus is None else None
+
+    master_size = f"{image_size[0]}x{image_size[1]}"
+    targets = {name: (output, size or master_size, zoom) for name, (output, size, zoom) in targets.items()}
+    boxes = {
+        name: crop_window(image_size, parse_size(size), zoom, focus, saliency)
+        for name, (_, size, zoom) in targets.items()
+    }
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers or len(targets), mp_context=process_context()) as executor:
+        futures = {
+            name: executor.submit(derive, master_path, Path(output), size, boxes[name])
+            for name, (output, size, _) in targets.items()
+        }
+        for name, future in futures.items():
+            results[name] = (Path(targets[name][0]), boxes[name], future.result())
+    return results
+
+
+def add_target_arguments(parser: argparse.ArgumentParser):
+    """--hero/--featured/--avatar output paths, their sizes, and --focus."""
+    for name, (size, _) in TARGETS.items():
+        parser.add_argument(f"--{name}", metavar="PATH", help=f"Write the {name} crop here")
+        parser.add_argument(
+            f"--{name}-size",
+            default=size,
+            metavar="WxH",
+            help=f"Size of the {name} crop (default: {size or 'the master size'})",
+        )
+    parser.add_argument(
+        "--focus",
+        metavar="X,Y",
+        help="Centre every crop on this point, as fractions of width and height (default: most salient region)",
+    )
+
+
+def targets_from_args(parser: argparse.ArgumentParser, args) -> tuple:
+    """
+    Targets and focus point from add_target_arguments() options.
+
+    Returns:
+        ({name: (output path, size, zoom)}, focus or None)
+    """
+    targets = {}
+    for name, (_, zoom) in TARGETS.items():
+        output = getattr(args, name)
+        if output:
+            size = getattr(args, f"{name}_size")
+            try:
+                if size:
+                    parse_size(size)
+            except ValueError:
+                parser.error(f"--{name}-size must look like 1024x1024")
+            targets[name] = (output, size, zoom)
+    if not targets:
+        parser.error(f"give at least one of {', '.join('--' + name for name in TARGETS)}")
+
+    focus = None
+    if args.focus:
+        try:
+            focus = tuple(float(v) for v in args.focus.split(","))
+        except ValueError:
+            focus = ()
+        if len(focus) != 2 or not all(0 <= v <= 1 for v in focus):
+            parser.error("--focus must be two fractions, e.g. 0.5,0.4")
+    return targets, focus
+
+
+def print_results(results: dict):
+    for name, (output, box, _) in results.items():
+        print(f"✓ {name}: {output} (crop {box[2] - box[0]}x{box[3] - box[1]} at {box[0]},{box[1]})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive hero, featured and avatar crops from a master image")
+    parser.add_argument("master", type=Path, help="Master image to crop")
+    add_target_arguments(parser)
+    args = parser.parse_args()
+
+    targets, focus = targets_from_args(parser, args)
+    print_results(derive_all(args.master, targets, focus))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
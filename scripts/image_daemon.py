@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Resident image generation daemon with warm clients and decrypted credentials.
+
+Every generator run otherwise pays for decrypting secrets.yaml, a fresh
+interpreter, importing openai/google.genai/requests and building its API
+clients before doing any work. The daemon does all of that once: it
+decrypts secrets.yaml with a single `sops -d --output-type json` into its
+own memory (never to disk), imports the generator scripts, builds the
+provider clients and keeps their connection pools open.
+
+Jobs arrive over a Unix socket (see daemon_client.py) from the normal
+script entry points, which hand over their arguments and stream back the
+output. Each job runs the script's main() on its own thread, with
+stdout/stderr routed to that job's connection, so several jobs can run at
+once and share the warm clients. Relative paths are resolved against the
+daemon's working directory, so jobs from another directory run in-process.
+
+Usage:
+    python scripts/image_daemon.py serve [--secrets secrets.yaml]
+    python scripts/image_daemon.py status
+    python scripts/image_daemon.py stop
+"""
+
+import argparse
+import contextvars
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+import daemon_client
+from image_jobs import JOBS, load_job, run_job
+from sops_secrets import SECRETS, SECRETS_FILE, load_secrets
+import tracing
+
+# Streams of the job running in the current thread/context, None outside jobs
+_job_streams = contextvars.ContextVar("job_streams", default=None)
+
+
+class _SocketWriter(io.TextIOBase):
+    """Text stream that forwards every write to a job's client as a JSON-lines message."""
+
+    def __init__(self, connection, key: str):
+        self._connection = connection
+        self._key = key
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self._connection.send({self._key: text})
+        return len(text)
+
+
+class _JobStream:
+    """Stand-in for sys.stdout/stderr/stdin that routes to the current job's streams."""
+
+    def __init__(self, name: str, default):
+        self._name = name
+        self._default = default
+
+    def _target(self):
+        streams = _job_streams.get()
+        return self._default if streams is None else streams[self._name]
+
+    def __getattr__(self, attr):
+        return getattr(self._target(), attr)
+
+    def __iter__(self):
+        return iter(self._target())
+
+
+class _Connection:
+    """One client connection; sends are serialized and stop quietly once the client hangs up."""
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def send(self, message: dict):
+        with self._lock:
+            if self.closed:
+                return
+            try:
+                self._wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+                self._wfile.flush()
+            except OSError:
+                # The job keeps running (Hunyuan tasks stay journaled); only its output is lost
+                self.closed = True
+
+
+def warm_up():
+    """Import every job and build the provider clients, so the first job pays for neither."""
+    import providers
+
+    for job in JOBS:
+        load_job(job)
+
+    providers.http_session()
+    factories = {
+        "NOVITA_API_KEY": providers.novita_chat_client,
+        "OPENAI_API_KEY": providers.openai_client,
+        "GEMINI_API_KEY": providers.gemini_client,
+    }
+    for name, factory in factories.items():
+        if not os.environ.get(name):
+            continue
+        try:
+            factory(os.environ[name])
+        except (Exception, SystemExit) as e:
+            # A missing optional SDK only matters to jobs that use that provider
+            print(f"Warning: could not build client for {name}: {e}", file=sys.stderr)
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """Handles one client request: ping, stop, or run a job."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        connection = _Connection(self.wfile)
+        command = request.get("command")
+
+        if command == "ping":
+            connection.send(self.server.status())
+        elif command == "stop":
+            connection.send({"stopping": True})
+            threading.Thread(target=self.server.shutdown).start()
+        elif command == "run":
+            self.run(request, connection)
+        else:
+            connection.send({"fallback": f"unknown command {command!r}"})
+
+    def run(self, request: dict, connection: _Connection):
+        job = request.get("job")
+        if job not in JOBS:
+            connection.send({"fallback": f"unknown job {job!r}"})
+            return
+        if os.path.realpath(request.get("cwd", "")) != os.path.realpath(os.getcwd()):
+            connection.send({"fallback": f"daemon runs in {os.getcwd()}"})
+            return
+
+        streams = {
+            "stdout": _SocketWriter(connection, "out"),
+            "stderr": _SocketWriter(connection, "err"),
+            "stdin": io.StringIO(request.get("stdin") or ""),
+        }
+        start_time = time.time()
+        self.server.job_started()
+        token = _job_streams.set(streams)
+        try:
+            # Each job traces under its own id, to the client's $WORKFORT_TRACE unless --trace is given
+            with tracing.job_scope(request.get("trace")):
+                code = run_job(job, request.get("argv", []))
+        finally:
+            _job_streams.reset(token)
+            self.server.job_finished()
+        connection.send({"exit": code})
+        print(f"✓ {job} {' '.join(request.get('argv', []))[:80]} -> exit {code} in {time.time() - start_time:.1f}s")
+
+
+class JobServer(socketserver.ThreadingUnixStreamServer):
+    """Threaded Unix socket server that waits for running jobs on shutdown."""
+
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, path: str):
+        super().__init__(path, JobHandler)
+        self.started = time.time()
+        self.running = 0
+        self.finished = 0
+        self._lock = threading.Lock()
+
+    def job_started(self):
+        with self._lock:
+            self.running += 1
+
+    def job_finished(self):
+        with self._lock:
+            self.running -= 1
+            self.finished += 1
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "cwd": os.getcwd(),
+                "uptime": time.time() - self.started,
+                "running": self.running,
+                "finished": self.finished,
+                "keys": [name for name in SECRETS if os.environ.get(name)],
+            }
+
+
+def serve(secrets_path: Path):
+    """Start the daemon in the foreground until stopped."""
+    path = daemon_client.socket_path()
+    if daemon_client.request({"command": "ping"}) is not None:
+        raise RuntimeError(f"A daemon is already listening on {path}")
+    Path(path).unlink(missing_ok=True)
+
+    load_secrets(secrets_path, verbose=True)
+    start_time = time.time()
+    warm_up()
+    print(f"✓ Clients warm in {time.time() - start_time:.2f}s")
+
+    sys.stdout = _JobStream("stdout", sys.stdout)
+    sys.stderr = _JobStream("stderr", sys.stderr)
+    sys.stdin = _JobStream("stdin", sys.stdin)
+
+    server = JobServer(path)
+    os.chmod(path, 0o600)
+    print(f"✓ Listening on {path} (Ctrl-C or `python scripts/image_daemon.py stop` to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Waiting for running jobs to finish...")
+        server.server_close()
+        Path(path).unlink(missing_ok=True)
+    print("✓ Daemon stopped")
+
+
+def main():
+    """CLI for the image daemon."""
+    parser = argparse.ArgumentParser(description="Resident image generation daemon")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="Run the daemon in the foreground")
+    serve_parser.add_argument(
+        "--secrets",
+        type=Path,
+        default=SECRETS_FILE,
+        help="sops-encrypted secrets to decrypt once at startup (default: secrets.yaml at the repository root)",
+    )
+    subparsers.add_parser("status", help="Show whether a daemon is running")
+    subparsers.add_parser("stop", help="Stop the running daemon after its current jobs")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.secrets)
+        return
+
+    reply = daemon_client.request({"command": "ping" if args.command == "status" else "stop"})
+    if reply is None:
+        print(f"No daemon listening on {daemon_client.socket_path()}")
+        sys.exit(1)
+    if args.command == "stop":
+        print("✓ Daemon stopping after its running jobs")
+        return
+    print(
+        f"✓ Daemon pid {reply['pid']} in {reply['cwd']}, up {reply['uptime'] / 60:.0f}m, "
+        f"{reply['running']} running, {reply['finished']} finished, keys: {', '.join(reply['keys']) or 'none'}"
+    )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
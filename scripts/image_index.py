@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Perceptual-hash similarity index over the image library (static/img).
+
+Every image gets a 64-bit DCT perceptual hash (pHash) and a 48-value colour
+layout vector (mean RGB of a 4x4 grid).
+Hashes are computed in batches with NumPy: decoded thumbnails are stacked
+into one array and hashed with a couple of matrix products. The index is
+kept in the local cache (~/.cache/workfort/image_index) and updated
+incrementally; only files whose size or mtime changed are hashed again.
+Generation runs add just their new render; the CLI scans the whole library.
+
+Two images are near-duplicates when their pHashes differ in at most
+--threshold bits and their colour layouts are close. Queries compare a
+hash against the whole index in one vectorized XOR/popcount, so
+result_store.store() runs one after every generation and warns when a new
+render repeats something already on disk.
+
+Usage:
+    python scripts/image_index.py update
+    python scripts/image_index.py query static/img/featured/new-render.png
+    python scripts/image_index.py dups
+    python scripts/image_index.py prune --dry-run
+"""
+
+import argparse
+import io
+import itertools
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from disk_cache import cache_dir, locked, make_key
+
+ROOT = Path(__file__).resolve().parent.parent
+STATIC_ROOT = ROOT / "static"
+LIBRARY_ROOT = STATIC_ROOT / "img"
+# Derived variants (optimize_images.py) are not part of the library
+SKIP_DIRS = {"optimized"}
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp"}
+
+# Near-duplicate: pHash Hamming distance and mean absolute colour difference (0-1)
+PHASH_THRESHOLD = 10
+COLOR_THRESHOLD = 0.08
+
+# Numbered renders of one prompt: post-1.png, post-2.png, ...
+VARIANT_SUFFIX = re.compile(r"-\d+$")
+
+HASH_SIZE = 32
+BATCH_SIZE = 64
+
+# Where prune looks for references to an image's site path (/img/...)
+REFERENCE_ROOTS = tuple(ROOT / name for name in ("blog", "docs", "src", "docusaurus.config.ts"))
+REFERENCE_SUFFIXES = {".md", ".mdx", ".yml", ".ts", ".tsx", ".js", ".jsx", ".css", ".json"}
+
+
+def _numpy():
+    """
+    Import NumPy (and Pillow) on first use.
+
+    Raises:
+        ImportError: With an install hint, if either package is missing
+    """
+    try:
+        import numpy
+        from PIL import Image  # noqa: F401
+    except ImportError as e:
+        raise ImportError(f"{e.name} package not installed. Run: pip install numpy pillow", name=e.name) from e
+    return numpy
+
+
+def _dct_matrix(n: int):
+    np = _numpy()
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+
+
+def _popcount(values):
+    """Set bits of each uint64."""
+    np = _numpy()
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(*values.shape, 8), axis=-1).sum(axis=-1)
+
+
+def _pack(bits):
+    """(N, 64) booleans -> N uint64."""
+    np = _numpy()
+    return np.packbits(bits, axis=1).view(">u8").astype(np.uint64).ravel()
+
+
+def load_thumbnails(path: Path) -> tuple:
+    """(32x32 grayscale, 4x4 RGB) thumbnails of an image, as arrays."""
+    np = _numpy()
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.draft("RGB", (HASH_SIZE * 2, HASH_SIZE * 2))
+        rgb = image.convert("RGB")
+    gray = rgb.convert("L")
+    return (
+        np.asarray(gray.resize((HASH_SIZE, HASH_SIZE), Image.Resampling.BOX), dtype=np.float32),
+        np.asarray(rgb.resize((4, 4), Image.Resampling.BOX), dtype=np.float32),
+    )
+
+
+def compute(paths: list) -> dict:
+    """
+    Hash images in batches.
+
+    Returns:
+        {"phash": uint64 array, "colors": (N, 48) float32 array}
+    """
+    np = _numpy()
+    dct = _dct_matrix(HASH_SIZE)
+    phashes, colors = [], []
+
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+        for start in range(0, len(paths), BATCH_SIZE):
+            thumbs = list(pool.map(load_thumbnails, paths[start : start + BATCH_SIZE]))
+            gray = np.stack([t[0] for t in thumbs])
+            rgb = np.stack([t[1] for t in thumbs])
+
+            # 2-D DCT of every thumbnail at once; keep the 8x8 lowest frequencies
+            low = (dct @ gray @ dct.T)[:, :8, :8].reshape(len(thumbs), 64)
+            median = np.median(low[:, 1:], axis=1, keepdims=True)
+            phashes.append(_pack(low > median))
+            colors.append((rgb / 255.0).reshape(len(thumbs), 48).astype(np.float32))
+
+    if not paths:
+        return {"phash": np.zeros(0, np.uint64), "colors": np.zeros((0, 48), np.float32)}
+    return {"phash": np.concatenate(phashes), "colors": np.concatenate(colors)}
+
+
+def library_images(root: Path) -> list:
+    """Image files in the library, skipping derived variants."""
+    return sorted(
+        path
+        for path in root.rglob("*")
+        if path.suffix.lower() in IMAGE_SUFFIXES
+        and path.is_file()
+        and not SKIP_DIRS.intersection(path.relative_to(root).parts)
+    )
+
+
+class ImageIndex:
+    """Hashes, colour vectors and file stats of every image under root, persisted as one .npz."""
+
+    def __init__(self, root: Path = LIBRARY_ROOT):
+        np = _numpy()
+        # Paths are indexed absolute, so every caller agrees whatever its working directory
+        self.root = root.resolve()
+        self.dir = cache_dir("image_index", make_key(str(self.root))[:12])
+        self.paths = []
+        self.stats = np.zeros((0, 2), np.int64)
+        self.phash = np.zeros(0, np.uint64)
+        self.colors = np.zeros((0, 48), np.float32)
+
+    @property
+    def file(self) -> Path:
+        return self.dir / "index.npz"
+
+    def lock(self):
+        return locked(self.dir / ".lock")
+
+    def load(self) -> "ImageIndex":
+        np = _numpy()
+        try:
+            with np.load(self.file) as data:
+                self.paths = [str(p) for p in data["paths"]]
+                self.stats, self.phash, self.colors = data["stats"], data["phash"], data["colors"]
+        except (OSError, KeyError, ValueError):
+            pass
+        return self
+
+    def save(self):
+        np = _numpy()
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            paths=np.array(self.paths, dtype=str),
+            stats=self.stats,
+            phash=self.phash,
+            colors=self.colors,
+        )
+        fd, tmp_name = tempfile.mkstemp(dir=self.dir, prefix=".index.", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_name, self.file)
+
+    def update(self, paths: list = None) -> tuple:
+        """
+        Hash new or changed images and drop missing ones.
+
+        Args:
+            paths: Only look at these files, leaving the rest of the index
+                untouched (default: scan the whole library)
+
+        Returns:
+            (number hashed, number removed)
+        """
+        np = _numpy()
+        full_scan = paths is None
+        if full_scan:
+            paths = library_images(self.root)
+        else:
+            requested = {str(Path(p).resolve()) for p in paths}
+            paths = [Path(p) for p in sorted(requested) if Path(p).exists()]
+        stats = {str(p): (p.stat().st_size, p.stat().st_mtime_ns) for p in paths}
+        position = {p: i for i, p in enumerate(self.paths)}
+
+        stale = [p for p in stats if p not in position or tuple(self.stats[position[p]]) != stats[p]]
+        gone = [p for p in self.paths if p not in stats and (full_scan or p in requested)]
+        keep = [i for i, p in enumerate(self.paths) if p not in gone and p not in stale]
+
+        fresh = compute([Path(p) for p in stale])
+        self.paths = [self.paths[i] for i in keep] + stale
+        self.stats = np.concatenate([self.stats[keep], np.array([stats[p] for p in stale], np.int64).reshape(-1, 2)])
+        self.phash = np.concatenate([self.phash[keep], fresh["phash"]])
+        self.colors = np.concatenate([self.colors[keep], fresh["colors"]])
+        return len(stale), len(gone)
+
+    def neighbors(self, phash, colors, exclude: str = None, k: int = None, threshold: int = PHASH_THRESHOLD) -> list:
+        """
+        Indexed images near one hash, nearest first.
+
+        Returns:
+            [(path, pHash distance, colour distance)] within threshold and
+            COLOR_THRESHOLD (or the k nearest regardless, with k)
+        """
+        np = _numpy()
+        distance = _popcount(self.phash ^ np.uint64(phash)).astype(np.int64)
+        color_distance = np.abs(self.colors - colors).mean(axis=1)
+        order = np.lexsort((color_distance, distance))
+        results = []
+        for i in order:
+            if self.paths[i] == exclude:
+                continue
+            if k is None and distance[i] > threshold:
+                break
+            if k is None and color_distance[i] > COLOR_THRESHOLD:
+                continue
+            results.append((self.paths[i], int(distance[i]), float(color_distance[i])))
+            if k is not None and len(results) == k:
+                break
+        return results
+
+    def groups(self, threshold: int = PHASH_THRESHOLD, variants: bool = False) -> list:
+        """
+        Clusters of linked near-duplicates, largest first.
+
+        Args:
+            variants: Also link numbered renders of one name (post-1.png, post-2.png, post.png)
+
+        Returns:
+            Lists of paths, each sorted
+        """
+        np = _numpy()
+        close = _popcount(self.phash[:, None] ^ self.phash[None, :]) <= threshold
+        # Colours are only compared for the few pairs whose pHash already matches
+        first, second = np.nonzero(np.triu(close, k=1))
+        color_distance = np.abs(self.colors[first] - self.colors[second]).mean(axis=1)
+        keep = color_distance <= COLOR_THRESHOLD
+        pairs = [zip(first[keep], second[keep])]
+        if variants:
+            family = np.array([variant_family(p) for p in self.paths], dtype=str)
+            pairs.append(zip(*np.nonzero(np.triu(family[:, None] == family[None, :], k=1))))
+
+        parent = list(range(len(self.paths)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in itertools.chain(*pairs):
+            parent[find(i)] = find(j)
+
+        clusters = {}
+        for i, path in enumerate(self.paths):
+            clusters.setdefault(find(i), []).append(path)
+        return sorted((sorted(c) for c in clusters.values() if len(c) > 1), key=len, reverse=True)
+
+
+def variant_family(path: str) -> str:
+    """Path without the numeric variant suffix: static/img/featured/post-3.png -> static/img/featured/post."""
+    path = Path(path)
+    return (path.parent / VARIANT_SUFFIX.sub("", path.stem)).as_posix()
+
+
+def record(path: Path, root: Path = LIBRARY_ROOT) -> list:
+    """
+    Add a new image to the index and check it against the images already there.
+
+    Only this one file is hashed (and only indexed if it lies under root);
+    scanning the whole library is left to `image_index.py update`.
+
+    Returns:
+        Near-duplicates already indexed, as neighbors() tuples
+    """
+    index = ImageIndex(root)
+    target = str(path.resolve())
+    with index.lock():
+        index.load()
+        if index.root in Path(target).parents:
+            hashed, removed = index.update([path])
+            if hashed or removed:
+                index.save()
+        if target in index.paths:
+            i = index.paths.index(target)
+            phash, colors = index.phash[i], index.colors[i]
+        else:
+            target = None
+            fresh = compute([path])
+            phash, colors = fresh["phash"][0], fresh["colors"][0]
+        return index.neighbors(phash, colors, exclude=target)
+
+
+def flag_duplicates(path: Path):
+    """record() a new render and warn about near-duplicates; never fails the caller."""
+    try:
+        matches = record(path)
+    except ImportError:
+        # NumPy or Pillow is not installed: the index is optional
+        return
+    except Exception as e:
+        print(f"Warning: image index check skipped: {e}", file=sys.stderr)
+        return
+    for match, distance, _ in matches[:3]:
+        print(f"⚠ {path} looks like a near-duplicate of {os.path.relpath(match)} (pHash distance {distance})")
+
+
+def referenced(paths: list) -> set:
+    """Paths whose site URL (/img/...) appears in the blog, docs or site source."""
+    text = []
+    for root in REFERENCE_ROOTS:
+        files = [root] if root.is_file() else (root.rglob("*") if root.exists() else [])
+        for path in files:
+            if path.suffix in REFERENCE_SUFFIXES and path.is_file():
+                text.append(path.read_text(encoding="utf-8", errors="ignore"))
+    corpus = "\n".join(text)
+
+    found = set()
+    for path in paths:
+        site_path = "/" + Path(path).relative_to(STATIC_ROOT).as_posix()
+        if re.search(re.escape(site_path) + r"\b", corpus):
+            found.add(path)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate images in static/img by perceptual hash")
+    parser.add_argument("--root", type=Path, default=LIBRARY_ROOT, help="Image library (default: static/img)")
+    parser.add_argument(
+        "--threshold",
+        type=int,
+        default=PHASH_THRESHOLD,
+        help=f"Max pHash bits that differ between near-duplicates (default: {PHASH_THRESHOLD})",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("update", help="Hash new and changed images")
+    query_parser = subparsers.add_parser("query", help="Show the images nearest to one image")
+    query_parser.add_argument("image", type=Path)
+    query_parser.add_argument("-k", type=int, default=5, help="Neighbours to show (default: 5)")
+    dups_parser = subparsers.add_parser("dups", help="List groups of near-duplicates")
+    prune_parser = subparsers.add_parser(
+        "prune",
+        help="Delete near-duplicates, keeping referenced images; groups with none are skipped unless --keep-newest",
+    )
+    for sub in (dups_parser, prune_parser):
+        sub.add_argument(
+            "--variants",
+            action="store_true",
+            help="Also group numbered renders of one name (post-1.png, post-2.png), however different they look",
+        )
+    prune_parser.add_argument(
+        "--keep-newest",
+        action="store_true",
+        help="In groups the site does not reference, keep the most recently modified image instead of skipping",
+    )
+    prune_parser.add_argument("--dry-run", action="store_true", help="Only show what would be deleted")
+    args = parser.parse_args()
+
+    try:
+        index = ImageIndex(args.root)
+    except ImportError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    with index.lock():
+        index.load()
+        hashed, removed = index.update()
+        if hashed or removed:
+            index.save()
+    if args.command == "update":
+        print(f"✓ {len(index.paths)} images indexed ({hashed} hashed, {removed} removed)")
+        return
+
+    if args.command == "query":
+        fresh = compute([args.image])
+        exclude = str(args.image.resolve())
+        for path, distance, color in index.neighbors(fresh["phash"][0], fresh["colors"][0], exclude, k=args.k):
+            print(f"{distance:3d} bits  colour {color:.3f}  {os.path.relpath(path)}")
+        return
+
+    groups = index.groups(args.threshold, args.variants)
+    if args.command == "dups":
+        for group in groups:
+            print(f"{len(group)} near-duplicates:")
+            for path in group:
+                print(f"  {os.path.relpath(path)}")
+        print(f"✓ {len(groups)} groups, {sum(len(g) - 1 for g in groups)} redundant images")
+        return
+
+    in_use = referenced([p for group in groups for p in group])
+    freed = 0
+    deleted = []
+    skipped = 0
+    for group in groups:
+        keep = [p for p in group if p in in_use]
+        if not keep and not args.keep_newest:
+            skipped += 1
+            continue
+        keep = keep or [max(group, key=lambda p: Path(p).stat().st_mtime_ns)]
+        for path in group:
+            if path in keep:
+                continue
+            kept = ", ".join(os.path.relpath(p) for p in keep)
+            print(f"{'Would delete' if args.dry_run else 'Deleting'} {os.path.relpath(path)} (kept: {kept})")
+            freed += Path(path).stat().st_size
+            if not args.dry_run:
+                Path(path).unlink()
+                deleted.append(path)
+    if deleted:
+        with index.lock():
+            index.load()
+            index.update()
+            index.save()
+    if skipped:
+        print(f"Skipped {skipped} groups with no referenced image (pass --keep-newest to prune them)")
+    print(f"✓ {'Reclaimable' if args.dry_run else 'Reclaimed'}: {freed / 1024 / 1024:.2f} MiB")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+The image scripts as named jobs, imported only when one is run.
+
+workfort-img.py and image_daemon.py refer to the generator, enhance and
+advise scripts by job name and run their main(argv) in-process. A script is
+imported the first time its job runs, so a subcommand never pays for
+another provider's modules.
+"""
+
+import importlib
+import importlib.util
+import multiprocessing
+import sys
+import threading
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# Job name -> script whose main(argv) runs it
+JOBS = {
+    "openai": "generate-image.py",
+    "hunyuan": "generate-image-hunyuan.py",
+    "nanobana": "generate-image-nanobana.py",
+    "hedged": "generate-image-hedged.py",
+    "set": "generate-image-set.py",
+    "enhance": "enhance_prompt.py",
+    "advise": "advise_prompt.py",
+}
+
+_modules = {}
+
+
+def load_job(job: str):
+    """Import a job's script once (hyphenated names via their file path) and return the module."""
+    if job not in _modules:
+        script = SCRIPTS_DIR / JOBS[job]
+        if script.stem.isidentifier():
+            module = importlib.import_module(script.stem)
+        else:
+            spec = importlib.util.spec_from_file_location(f"workfort_job_{job}", script)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        _modules[job] = module
+    return _modules[job]
+
+
+def process_context():
+    """
+    multiprocessing context for a job's worker pool.
+
+    Forking a process with other threads running (the image daemon runs jobs
+    on threads) can copy a lock one of them holds into the workers, so there
+    they start from a forkserver instead.
+    """
+    if threading.active_count() > 1 and "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context()
+
+
+def run_job(job: str, argv: list) -> int:
+    """Run a job's main(argv) in the current thread and return its exit code."""
+    try:
+        load_job(job).main(argv)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Manifest-driven, incremental image generation for the blog.
+
+Images referenced from blog front-matter (`image: /img/featured/post.png`)
+and author `image_url`s in blog/authors.yml are described in a sidecar
+spec, blog/images.toml:
+
+    ["/img/featured/day-four-first-light-5.png"]
+    prompt = "..."
+    provider = "hunyuan"   # hunyuan (default), openai or gemini
+    size = "1536x1024"     # default: 1024x1024
+    seed = 42              # Hunyuan only; -1 (default) for random
+    quality = "standard"   # DALL-E only
+    enhance = true         # Kimi K2.5 prompt enhancement (default: true)
+
+Each spec entry is hashed, and blog/images.lock.json records the hash every
+image was last generated from. A run generates only the referenced images
+that are missing or whose spec changed, in parallel, like an incremental
+build; prompts needing enhancement go to Kimi together in batched requests.
+An image that already exists when it first gets a spec is recorded as it is
+rather than regenerated.
+
+Nothing beyond the standard library is imported, and secrets.yaml is not
+decrypted, until there is something to generate, so a no-op run over the
+whole blog takes milliseconds. API keys missing from the environment are
+then decrypted from --secrets with a single `sops -d`.
+
+Asset paths resolve against the site root that holds --blog (its parent
+directory), so a blog elsewhere writes its images under that site's static/.
+--force also regenerates spec entries no post references.
+
+Usage:
+    python scripts/image_manifest.py
+    python scripts/image_manifest.py --dry-run
+    python scripts/image_manifest.py --force /img/featured/post.png --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import cassette
+from disk_cache import make_key
+from sops_secrets import SECRETS_FILE
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROVIDERS = ("hunyuan", "openai", "gemini")
+
+DEFAULTS = {
+    "provider": "hunyuan",
+    "size": "1024x1024",
+    "seed": -1,
+    "quality": "standard",
+    "enhance": True,
+}
+
+# Front-matter keys (in posts) and YAML keys (in authors.yml) that reference images
+IMAGE_KEYS = ("image", "image_url")
+
+
+def _yaml_value(line: str):
+    """Value of a flat `key: value` line, unquoted, or None for other lines."""
+    key, sep, value = line.strip().partition(":")
+    if not sep or key not in IMAGE_KEYS:
+        return None
+    value = value.strip().strip("'\"")
+    return value or None
+
+
+def front_matter_images(path: Path) -> list:
+    """Image references in a post's front-matter (only the header is read)."""
+    images = []
+    with open(path, encoding="utf-8") as f:
+        if f.readline().strip() != "---":
+            return images
+        for line in f:
+            if line.strip() == "---":
+                break
+            value = _yaml_value(line)
+            if value:
+                images.append(value)
+    return images
+
+
+def referenced_images(blog_dir: Path) -> dict:
+    """
+    Every image the blog references.
+
+    Returns:
+        {asset path as written (e.g. /img/featured/x.png): [files referencing it]}
+    """
+    references = {}
+    posts = sorted([*blog_dir.glob("*.md"), *blog_dir.glob("*.mdx")])
+    for post in posts:
+        for image in front_matter_images(post):
+            references.setdefault(image, []).append(post.name)
+
+    authors = blog_dir / "authors.yml"
+    if authors.exists():
+        for line in authors.read_text(encoding="utf-8").splitlines():
+            value = _yaml_value(line)
+            if value:
+                references.setdefault(value, []).append(authors.name)
+    return references
+
+
+def asset_path(asset: str, root: Path) -> Path:
+    """Where a site path like /img/featured/x.png lives on disk (under static/)."""
+    return root / "static" / asset.lstrip("/")
+
+
+def load_spec(path: Path) -> dict:
+    """
+    Read the sidecar spec, filling in defaults.
+
+    Raises:
+        ValueError: If an entry is missing its prompt or has an invalid field
+    """
+    if not path.exists():
+        return {}
+    with open(path, "rb") as f:
+        raw = tomllib.load(f)
+
+    spec = {}
+    for asset, fields in raw.items():
+        entry = {**DEFAULTS, **fields}
+        if not isinstance(entry.get("prompt"), str) or not entry["prompt"].strip():
+            raise ValueError(f"{path}: [{asset}] needs a prompt")
+        if entry["provider"] not in PROVIDERS:
+            raise ValueError(f"{path}: [{asset}] provider must be one of {', '.join(PROVIDERS)}")
+        width, sep, height = entry["size"].lower().partition("x")
+        if not (sep and width.isdigit() and height.isdigit()):
+            raise ValueError(f"{path}: [{asset}] size must look like 1024x1024")
+        spec[asset] = entry
+    return spec
+
+
+def spec_hash(asset: str, entry: dict) -> str:
+    """Hash of everything that determines how an image is generated."""
+    return make_key(asset, entry)[:16]
+
+
+def load_lock(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_lock(path: Path, lock: dict):
+    """Write the lock file atomically, sorted and indented so it diffs well in git."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(lock, indent=2, sort_keys=True) + "\n")
+    os.replace(tmp, path)
+
+
+def plan(references: dict, spec: dict, lock: dict, root: Path, force: set) -> tuple:
+    """
+    Decide what a run has to do.
+
+    Returns:
+        (jobs: [(asset, reason)], adopted: [asset], unmanaged: [asset], missing: [asset])
+        where adopted images exist and get recorded without regenerating,
+        unmanaged ones exist without a spec, and missing ones have neither;
+        forced spec entries are jobs whether or not anything references them
+    """
+    jobs, adopted, unmanaged, missing = [], [], [], []
+    for asset in sorted(set(references) | (force & set(spec))):
+        exists = asset_path(asset, root).exists()
+        entry = spec.get(asset)
+        if entry is None:
+            (unmanaged if exists else missing).append(asset)
+            continue
+
+        recorded = lock.get(asset, {}).get("spec")
+        if asset in force:
+            jobs.append((asset, "forced"))
+        elif not exists:
+            jobs.append((asset, "missing"))
+        elif recorded is None:
+            adopted.append(asset)
+        elif recorded != spec_hash(asset, entry):
+            jobs.append((asset, "stale"))
+    return jobs, adopted, unmanaged, missing
+
+
+def _render(asset: str, entry: dict, prompt: str, output_path: Path, api_keys: dict) -> str:
+    """Render one image with its spec's provider and return its SHA-256."""
+    from providers import (
+        GEMINI_IMAGE_MODEL,
+        HUNYUAN_MODEL,
+        fit_size,
+        render_dalle,
+        render_gemini,
+        render_hunyuan,
+    )
+    import result_store
+
+    provider = entry["provider"]
+    if provider == "hunyuan":
+        size = fit_size("hunyuan", entry["size"])
+        key = result_store.request_key("hunyuan", HUNYUAN_MODEL, prompt, size, seed=entry["seed"])
+        # Only a fixed seed makes a render reproducible
+        if entry["seed"] != -1 and result_store.fetch(key, output_path):
+            return result_store.file_sha256(output_path)
+        sha256 = render_hunyuan(api_keys["hunyuan"], prompt, output_path, size=size, seed=entry["seed"])
+    elif provider == "openai":
+        size = fit_size("openai", entry["size"])
+        key = result_store.request_key("openai", "dall-e-3", prompt, size, quality=entry["quality"])
+        sha256 = render_dalle(api_keys["openai"], prompt, output_path, size=size, quality=entry["quality"])
+    else:
+        key = result_store.request_key("gemini", GEMINI_IMAGE_MODEL, prompt, entry["size"])
+        sha256 = render_gemini(api_keys["gemini"], prompt, output_path, size=entry["size"])
+
+    result_store.store(key, output_path, sha256, provider=provider, prompt=prompt)
+    return sha256
+
+
+def generate(
+    jobs: list, spec: dict, lock: dict, lock_path: Path, root: Path, concurrency: int, secrets: Path = None
+) -> int:
+    """
+    Generate the planned images in parallel, recording each success in the lock file.
+
+    Args:
+        secrets: sops file to decrypt (once) for API keys missing from the environment
+
+    Returns:
+        Number of images that failed
+    """
+    # Imported only now: a no-op run never pays for them
+    from enhance_prompt import resolve_prompts
+    from providers import require_env
+
+    if secrets is not None:
+        from sops_secrets import load_secrets
+
+        load_secrets(secrets)
+
+    key_names = {
+        "hunyuan": ("NOVITA_API_KEY", "novita_api_key"),
+        "openai": ("OPENAI_API_KEY", "openai_api_key"),
+        "gemini": ("GEMINI_API_KEY", "gemini_api_key"),
+    }
+    providers = {spec[asset]["provider"] for asset, _ in jobs}
+    api_keys = {provider: require_env(*key_names[provider]) for provider in providers}
+
+    prompts = {asset: spec[asset]["prompt"] for asset, _ in jobs}
+    to_enhance = [asset for asset, _ in jobs if spec[asset]["enhance"]]
+    if to_enhance:
+        novita_key = require_env(*key_names["hunyuan"])
+        enhanced = resolve_prompts([prompts[asset] for asset in to_enhance], novita_key)
+        prompts.update(zip(to_enhance, enhanced))
+
+    lock_guard = threading.Lock()
+    failures = 0
+
+    def run(asset):
+        output_path = asset_path(asset, root)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        return _render(asset, spec[asset], prompts[asset], output_path, api_keys)
+
+    print(f"Generating {len(jobs)} images (concurrency: {concurrency})...")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(run, asset): asset for asset, _ in jobs}
+        for future in as_completed(futures):
+            asset = futures[future]
+            try:
+                sha256 = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"✗ {asset}: {e}", file=sys.stderr)
+                continue
+
+            with lock_guard:
+                lock[asset] = {"spec": spec_hash(asset, spec[asset]), "sha256": sha256, "prompt": prompts[asset]}
+                write_lock(lock_path, lock)
+            print(f"✓ {asset}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate missing or stale blog images from a spec file")
+    parser.add_argument("--blog", type=Path, default=ROOT / "blog", help="Blog directory to scan (default: blog/)")
+    parser.add_argument(
+        "--spec",
+        type=Path,
+        help="Sidecar spec (default: BLOG/images.toml); the lock file sits next to it",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Show what would be generated and exit")
+    parser.add_argument("--force", nargs="+", default=[], metavar="ASSET", help="Regenerate these images regardless")
+    parser.add_argument("--concurrency", type=int, default=4, help="Images generated at once (default: 4)")
+    parser.add_argument(
+        "--secrets",
+        type=Path,
+        default=SECRETS_FILE,
+        help="sops-encrypted secrets for API keys not in the environment, decrypted only if there is work "
+        "(default: secrets.yaml at the repository root)",
+    )
+    cassette.add_cassette_arguments(parser)
+    args = parser.parse_args()
+    cassette.configure(args)
+
+    start_time = time.perf_counter()
+    # Assets live under the static/ of the site the blog belongs to
+    root = args.blog.resolve().parent
+    spec_path = args.spec or args.blog / "images.toml"
+    lock_path = spec_path.with_name(f"{spec_path.stem}.lock.json")
+
+    references = referenced_images(args.blog)
+    spec = load_spec(spec_path)
+    lock = load_lock(lock_path)
+
+    unknown = set(args.force) - set(spec)
+    if unknown:
+        parser.error(f"--force: no spec entry for {', '.join(sorted(unknown))}")
+
+    jobs, adopted, unmanaged, missing = plan(references, spec, lock, root, set(args.force))
+
+    for asset in missing:
+        print(f"Warning: {asset} (from {', '.join(references[asset])}) is missing and has no spec entry", file=sys.stderr)
+    unused = sorted(set(spec) - set(references) - set(args.force))
+    if unused:
+        print(f"Note: {len(unused)} spec entries are not referenced by any post: {', '.join(unused)}")
+
+    if adopted and not args.dry_run:
+        for asset in adopted:
+            lock[asset] = {"spec": spec_hash(asset, spec[asset])}
+        write_lock(lock_path, lock)
+        print(f"✓ Recorded {len(adopted)} existing images against their spec")
+
+    summary = (
+        f"{len(references)} referenced images: {len(jobs)} to generate, "
+        f"{len(unmanaged)} without a spec, {len(missing)} missing"
+    )
+    if not jobs:
+        print(f"✓ Up to date ({summary}) in {(time.perf_counter() - start_time) * 1000:.0f}ms")
+        sys.exit(1 if missing else 0)
+
+    print(summary)
+    for asset, reason in jobs:
+        entry = spec[asset]
+        print(f"  {reason:8} {asset} ({entry['provider']} {entry['size']})")
+    if args.dry_run:
+        return
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    failures = generate(jobs, spec, lock, lock_path, root, args.concurrency, args.secrets)
+    print(f"✓ Generated {len(jobs) - failures}/{len(jobs)} images")
+    sys.exit(1 if failures or missing else 0)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Crash-safe journal of submitted image generation tasks.
+
+Every Hunyuan task is written to a local SQLite database
+(~/.cache/workfort/jobs.sqlite3) as soon as Novita returns its task_id,
+together with the prompt, size, seed and output path. A run that times out,
+crashes or is interrupted leaves its task as "submitted"; resume re-attaches
+to those tasks and downloads any finished render without submitting (and
+paying for) it again. A task whose output has since been rewritten (by a
+later task or by hand) is marked "superseded" instead of being downloaded
+over it, and hedged renders that lost are marked "cancelled" when they are
+discarded.
+
+Usage:
+    python scripts/job_journal.py list [--status submitted]
+    python scripts/job_journal.py resume [--wait] [--timeout 300]
+    python scripts/job_journal.py gc [--days 7] [--include-unfinished]
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from disk_cache import cache_dir
+
+SUBMITTED = "submitted"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+SUPERSEDED = "superseded"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    task_id TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    size TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    output TEXT NOT NULL,
+    status TEXT NOT NULL,
+    sha256 TEXT,
+    error TEXT,
+    submitted_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted_at);
+"""
+
+
+def journal_path() -> Path:
+    return cache_dir() / "jobs.sqlite3"
+
+
+@contextmanager
+def _connect():
+    """Open the journal, commit on success and always close the connection."""
+    db = sqlite3.connect(journal_path(), timeout=30)
+    db.row_factory = sqlite3.Row
+    try:
+        # WAL lets concurrent batch runs and resume write without blocking readers
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(SCHEMA)
+        with db:
+            yield db
+    finally:
+        db.close()
+
+
+def record_submission(
+    provider: str,
+    model: str,
+    task_id: str,
+    prompt: str,
+    output_path: Path,
+    size: str,
+    seed: int = -1,
+):
+    """Journal a task the moment the provider has accepted it."""
+    now = time.time()
+    with _connect() as db:
+        db.execute(
+            "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL, NULL, ?, ?)",
+            (task_id, provider, model, prompt, size, seed, str(Path(output_path).resolve()), SUBMITTED, now, now),
+        )
+
+
+def finish(task_id: str, status: str, sha256: str = None, error: str = None):
+    """Mark a journaled task done, failed or cancelled."""
+    with _connect() as db:
+        db.execute(
+            "UPDATE jobs SET status = ?, sha256 = ?, error = ?, updated_at = ? WHERE task_id = ?",
+            (status, sha256, error, time.time(), task_id),
+        )
+
+
+def cancel_output(output_path: Path, error: str = None) -> int:
+    """
+    Mark every unfinished task writing to output_path cancelled.
+
+    Returns:
+        Number of tasks cancelled
+    """
+    with _connect() as db:
+        return db.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE output = ? AND status = ?",
+            (CANCELLED, error, time.time(), str(Path(output_path).resolve()), SUBMITTED),
+        ).rowcount
+
+
+def superseded(job: dict):
+    """
+    Why downloading a journaled task would overwrite a newer image, or None.
+
+    The output is newer when a task submitted later has finished into it, or
+    when the file was modified after this task was submitted.
+    """
+    with _connect() as db:
+        later = db.execute(
+            "SELECT task_id FROM jobs WHERE output = ? AND status = ? AND submitted_at > ? LIMIT 1",
+            (job["output"], DONE, job["submitted_at"]),
+        ).fetchone()
+    if later is not None:
+        return f"superseded by task {later['task_id']}"
+
+    try:
+        modified = Path(job["output"]).stat().st_mtime
+    except OSError:
+        return None
+    if modified > job["submitted_at"]:
+        return "output was modified after this task was submitted"
+    return None
+
+
+def note_error(task_id: str, error: str):
+    """Record why a still-unfinished task could not be completed this time."""
+    with _connect() as db:
+        db.execute(
+            "UPDATE jobs SET error = ?, updated_at = ? WHERE task_id = ?",
+            (error, time.time(), task_id),
+        )
+
+
+def jobs(status: str = None, limit: int = None) -> list:
+    """Journaled jobs, newest first, optionally filtered by status."""
+    query = "SELECT * FROM jobs"
+    params = []
+    if status:
+        query += " WHERE status = ?"
+        params.append(status)
+    query += " ORDER BY submitted_at DESC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    with _connect() as db:
+        return [dict(row) for row in db.execute(query, params)]
+
+
+def gc(days: float, include_unfinished: bool = False) -> int:
+    """
+    Delete journal entries last updated more than days ago.
+
+    Unfinished tasks are kept unless include_unfinished is set, since they
+    may still be resumable.
+
+    Returns:
+        Number of entries removed
+    """
+    cutoff = time.time() - days * 24 * 3600
+    query = "DELETE FROM jobs WHERE updated_at < ?"
+    if not include_unfinished:
+        query += f" AND status != '{SUBMITTED}'"
+
+    with _connect() as db:
+        return db.execute(query, (cutoff,)).rowcount
+
+
+def resume_job(job: dict, api_key: str, wait: bool, timeout: int) -> str:
+    """
+    Re-attach to one unfinished task and download its image if it is ready.
+
+    A task whose output is newer than it (see superseded()) is marked
+    SUPERSEDED without being downloaded.
+
+    Returns:
+        The job's new status (still SUBMITTED if it has not finished yet)
+    """
+    # Imported here: providers journals its own submissions through this module
+    import requests
+
+    from providers import GenerationFailed, download_image, get_task_result, parse_task_result, poll_task
+    import result_store
+
+    task_id = job["task_id"]
+    output_path = Path(job["output"])
+
+    reason = superseded(job)
+    if reason:
+        finish(task_id, SUPERSEDED, error=reason)
+        return SUPERSEDED
+
+    try:
+        image_url = parse_task_result(poll_task(api_key, task_id))
+        if image_url is None and wait:
+            image_url = get_task_result(api_key, task_id, timeout)
+    except GenerationFailed as e:
+        finish(task_id, FAILED, error=str(e))
+        return FAILED
+    except requests.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        if status is not None and 400 <= status < 500 and status != 429:
+            # Novita no longer knows the task (e.g. its result expired)
+            finish(task_id, FAILED, error=str(e))
+            return FAILED
+        note_error(task_id, str(e))
+        return SUBMITTED
+    except Exception as e:
+        note_error(task_id, str(e))
+        return SUBMITTED
+
+    if image_url is None:
+        return SUBMITTED
+
+    # With --wait the output may have been rewritten while we polled
+    reason = superseded(job)
+    if reason:
+        finish(task_id, SUPERSEDED, error=reason)
+        return SUPERSEDED
+
+    sha256 = download_image(image_url, output_path)
+    key = result_store.request_key(job["provider"], job["model"], job["prompt"], job["size"], seed=job["seed"])
+    result_store.store(key, output_path, sha256, provider=job["provider"], prompt=job["prompt"])
+    finish(task_id, DONE, sha256=sha256)
+    return DONE
+
+
+def resume(api_key: str, wait: bool = False, timeout: int = 300) -> dict:
+    """
+    Resume every unfinished journaled task.
+
+    Returns:
+        Count of tasks per resulting status
+    """
+    pending = jobs(SUBMITTED)
+    counts = {DONE: 0, FAILED: 0, SUPERSEDED: 0, SUBMITTED: 0}
+    print(f"Resuming {len(pending)} unfinished tasks...")
+
+    for i, job in enumerate(reversed(pending), start=1):
+        label = f"[{i}/{len(pending)}] {job['task_id']} -> {job['output']}"
+        try:
+            status = resume_job(job, api_key, wait, timeout)
+        except Exception as e:
+            note_error(job["task_id"], str(e))
+            print(f"Error: {label}: {e}", file=sys.stderr)
+            status = SUBMITTED
+
+        counts[status] += 1
+        if status == DONE:
+            print(f"✓ {label}")
+        elif status == FAILED:
+            print(f"✗ {label}: render failed on the provider")
+        elif status == SUPERSEDED:
+            print(f"↷ {label}: skipped, the output is newer")
+        else:
+            print(f"… {label}: still running")
+
+    return counts
+
+
+def _age(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f}h"
+    return f"{seconds / 86400:.1f}d"
+
+
+def main():
+    """CLI for the job journal."""
+    parser = argparse.ArgumentParser(description="List, resume and clean up journaled generation tasks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="Show journaled tasks, newest first")
+    list_parser.add_argument("--status", choices=[SUBMITTED, DONE, FAILED, CANCELLED, SUPERSEDED], help="Only this status")
+    list_parser.add_argument("--limit", type=int, default=50, help="Maximum rows (default: 50)")
+
+    resume_parser = subparsers.add_parser("resume", help="Download finished renders of unfinished tasks")
+    resume_parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="Keep polling tasks that are still running instead of leaving them for later",
+    )
+    resume_parser.add_argument(
+        "--timeout",
+        type=int,
+        default=300,
+        help="With --wait, maximum seconds to wait per task. Default: 300",
+    )
+
+    gc_parser = subparsers.add_parser("gc", help="Delete old finished entries")
+    gc_parser.add_argument("--days", type=float, default=7, help="Keep entries newer than this (default: 7)")
+    gc_parser.add_argument(
+        "--include-unfinished",
+        action="store_true",
+        help="Also delete old tasks that never finished (their results have likely expired)",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        rows = jobs(args.status, args.limit)
+        if not rows:
+            print("No journaled tasks")
+            return
+        now = time.time()
+        for row in rows:
+            print(
+                f"{row['status']:10} {_age(now - row['submitted_at']):>6}  {row['provider']:8} "
+                f"{row['task_id'][:12]}  {row['size']:10} {row['output']}"
+            )
+            if row["error"] and row["status"] != DONE:
+                print(f"{'':18}{row['error'][:100]}")
+        return
+
+    if args.command == "gc":
+        removed = gc(args.days, args.include_unfinished)
+        print(f"✓ Removed {removed} journal entries older than {args.days:g} days")
+        return
+
+    from providers import require_env
+
+    api_key = require_env("NOVITA_API_KEY", "novita_api_key")
+    counts = resume(api_key, args.wait, args.timeout)
+    print(
+        f"✓ Resume finished: {counts[DONE]} downloaded, {counts[FAILED]} failed, "
+        f"{counts[SUPERSEDED]} superseded, {counts[SUBMITTED]} still running"
+    )
+    sys.exit(1 if counts[SUBMITTED] and args.wait else 0)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Per-provider render latency history shared across runs.
+
+Every completed generation records how long it took (submit to image on disk)
+under its provider and size, keeping the most recent samples in
+~/.cache/workfort/latency.json. Percentiles over that history drive the
+hedging deadline in generate-image-hedged.py.
+
+Usage:
+    python scripts/latency_history.py
+"""
+
+import json
+import math
+import sys
+
+from disk_cache import cache_dir, locked, write_json_atomic
+
+MAX_SAMPLES = 50
+MIN_SAMPLES = 5
+
+
+def _history_path():
+    return cache_dir() / "latency.json"
+
+
+def _load() -> dict:
+    try:
+        return json.loads(_history_path().read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _key(provider: str, size: str) -> str:
+    return f"{provider}|{size}"
+
+
+def record(provider: str, size: str, seconds: float):
+    """Add a completed render duration to the history."""
+    with locked(cache_dir() / ".latency.lock"):
+        history = _load()
+        samples = history.setdefault(_key(provider, size), [])
+        samples.append(round(seconds, 2))
+        del samples[:-MAX_SAMPLES]
+        write_json_atomic(_history_path(), history)
+
+
+def samples(provider: str, size: str) -> list:
+    """Recorded durations for a provider and size, oldest first."""
+    return _load().get(_key(provider, size), [])
+
+
+def percentile(provider: str, size: str, pct: float):
+    """
+    Return the pct-th percentile render time, or None without enough history.
+
+    Args:
+        provider: Provider name (hunyuan, openai, gemini)
+        size: Requested size (e.g., 1024x1024)
+        pct: Percentile between 0 and 100
+    """
+    values = sorted(samples(provider, size))
+    if len(values) < MIN_SAMPLES:
+        return None
+
+    rank = max(0, math.ceil(pct / 100 * len(values)) - 1)
+    return values[rank]
+
+
+def main():
+    """Print p50/p90 render latency per provider and size."""
+    history = _load()
+    if not history:
+        print("No latency history yet")
+        return
+
+    for key in sorted(history):
+        provider, size = key.split("|", 1)
+        values = history[key]
+        p50 = percentile(provider, size, 50)
+        p90 = percentile(provider, size, 90)
+        summary = f"p50 {p50:.1f}s, p90 {p90:.1f}s" if p50 is not None else "not enough samples"
+        print(f"{provider:8} {size:10} {len(values):3} samples  {summary}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
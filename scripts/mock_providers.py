@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the Novita, OpenAI and Gemini endpoints the scripts use.
+
+Serves, on one port:
+  POST /v3/async/hunyuan-image-3                    Hunyuan task submission
+  GET  /v3/async/task-result?task_id=...            Task status (queued -> processing -> succeed)
+  POST /openai/chat/completions                     Novita Kimi K2.5 chat completions (SSE with "stream")
+  POST /v1/chat/completions                         OpenAI chat completions (SSE with "stream")
+  POST /v1/images/generations                       OpenAI DALL-E
+  POST /v1beta/models/<model>:generateContent       Gemini inline image generation
+  GET  /images/<name>.png                           Generated image download (supports Range)
+  GET  /_stats                                      Request, poll and byte counters
+
+Chat requests with response_format json_object are treated as batched
+enhancements and answered with {"prompts": [{"id", "enhanced"}, ...]}.
+
+Queue delay, render delay, chat delay (time to first token), per-token delay,
+reply length, error rate and image size are configurable so benchmarks can
+model slow queues or flaky providers. Point the scripts at it with
+NOVITA_BASE_URL=http://HOST:PORT, OPENAI_BASE_URL=http://HOST:PORT/v1 and
+GEMINI_BASE_URL=http://HOST:PORT.
+
+Usage:
+    python scripts/mock_providers.py --port 8765 --queue-delay 2 --render-delay 5
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class MockConfig:
+    queue_delay: float = 1.0
+    render_delay: float = 2.0
+    chat_delay: float = 0.2
+    token_delay: float = 0.01
+    reply_words: int = 60
+    error_rate: float = 0.0
+    payload_bytes: int = 1_500_000
+
+
+FILLER = (
+    "Shot on a Canon EOS R5 with an 85mm f/1.4 lens at ISO 200. "
+    "Low-key three-point lighting with a soft rim light. "
+    "Rule-of-thirds composition with shallow depth of field. "
+)
+
+
+def make_reply(prompt: str, words: int) -> str:
+    """A plausible enhanced prompt of roughly the requested number of words."""
+    text = f"Photo of {prompt}, sharp focus, high contrast. "
+    while len(text.split()) < words:
+        text += FILLER
+    return " ".join(text.split()[:words])
+
+
+def make_png(payload_bytes: int) -> bytes:
+    """A valid 1x1 PNG padded with an ancillary chunk to roughly payload_bytes."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return len(data).to_bytes(4, "big") + body + zlib.crc32(body).to_bytes(4, "big")
+
+    ihdr = chunk(b"IHDR", (1).to_bytes(4, "big") + (1).to_bytes(4, "big") + bytes([8, 2, 0, 0, 0]))
+    idat = chunk(b"IDAT", zlib.compress(b"\x00\x00\xf0\xff"))
+    padding = chunk(b"raNd", os.urandom(max(0, payload_bytes - 70)))
+    return b"\x89PNG\r\n\x1a\n" + ihdr + padding + idat + chunk(b"IEND", b"")
+
+
+class MockState:
+    """Shared task table and counters for all request handler threads."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.image = make_png(config.payload_bytes)
+        self.tasks = {}
+        self.requests = Counter()
+        self.polls = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.lock = threading.Lock()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "polls_per_task": dict(self.polls),
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+            }
+
+
+def make_handler(state: MockState):
+    config = state.config
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str = "application/json", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+            with state.lock:
+                state.bytes_out += len(body)
+
+        def _json(self, status: int, data, headers=None):
+            self._send(status, json.dumps(data).encode(), headers=headers)
+
+        def _read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            with state.lock:
+                state.bytes_in += length
+            return json.loads(body) if body else {}
+
+        def _count(self, endpoint: str) -> bool:
+            """Count the request; return True if it should fail with an injected error."""
+            with state.lock:
+                state.requests[endpoint] += 1
+            if config.error_rate and random.random() < config.error_rate:
+                if random.random() < 0.5:
+                    self._json(429, {"error": "rate limited"}, headers={"Retry-After": "1"})
+                else:
+                    self._json(500, {"error": "injected failure"})
+                return True
+            return False
+
+        def _chat_stream(self, model: str, content: str):
+            """Send content as OpenAI-style server-sent events, one word per chunk."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+            def event(delta: dict, finish_reason=None):
+                data = {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                send(f"data: {json.dumps(data)}\n\n".encode())
+
+            def send(payload: bytes):
+                self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+                self.wfile.flush()
+                with state.lock:
+                    state.bytes_out += len(payload)
+
+            try:
+                event({"role": "assistant", "content": ""})
+                for i, word in enumerate(content.split(" ")):
+                    time.sleep(config.token_delay)
+                    event({"content": word if i == 0 else f" {word}"})
+                event({}, "stop")
+                send(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client closed the stream early (e.g. a length budget)
+                self.close_connection = True
+
+        def _image_url(self) -> str:
+            host = self.headers.get("Host")
+            return f"http://{host}/images/{uuid.uuid4().hex}.png"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+
+            if url.path == "/_stats":
+                self._json(200, state.stats())
+
+            elif url.path == "/v3/async/task-result":
+                task_id = parse_qs(url.query).get("task_id", [""])[0]
+                with state.lock:
+                    state.polls[task_id] += 1
+                if self._count("task-result"):
+                    return
+                task = state.tasks.get(task_id)
+                if task is None:
+                    self._json(404, {"error": f"unknown task {task_id}"})
+                    return
+
+                elapsed = time.time() - task["created"]
+                if elapsed < config.queue_delay:
+                    status = "TASK_STATUS_QUEUED"
+                elif elapsed < config.queue_delay + config.render_delay:
+                    status = "TASK_STATUS_PROCESSING"
+                else:
+                    status = "TASK_STATUS_SUCCEED"
+
+                result = {"task": {"task_id": task_id, "status": status}, "images": []}
+                if status == "TASK_STATUS_SUCCEED":
+                    result["images"] = [{"image_url": task["image_url"], "image_type": "png"}]
+                self._json(200, result)
+
+            elif url.path.startswith("/images/"):
+                if self._count("image"):
+                    return
+                data = state.image
+                range_header = self.headers.get("Range")
+                if range_header and range_header.startswith("bytes="):
+                    start = int(range_header[len("bytes="):].split("-")[0])
+                    if start >= len(data):
+                        self._send(416, b"", headers={"Content-Range": f"bytes */{len(data)}"})
+                        return
+                    self._send(
+                        206,
+                        data[start:],
+                        "image/png",
+                        {"Content-Range": f"bytes {start}-{len(data) - 1}/{len(data)}"},
+                    )
+                else:
+                    self._send(200, data, "image/png", {"Accept-Ranges": "bytes"})
+
+            else:
+                self._json(404, {"error": f"no mock for GET {url.path}"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = self._read_body()
+
+            if url.path == "/v3/async/hunyuan-image-3":
+                if self._count("hunyuan-submit"):
+                    return
+                task_id = uuid.uuid4().hex
+                state.tasks[task_id] = {"created": time.time(), "image_url": self._image_url()}
+                self._json(200, {"task_id": task_id})
+
+            elif url.path in ("/openai/chat/completions", "/v1/chat/completions"):
+                if self._count("chat"):
+                    return
+                time.sleep(config.chat_delay)
+                prompt = body.get("messages", [{}])[-1].get("content", "")
+                if (body.get("response_format") or {}).get("type") == "json_object":
+                    # Batched enhancement; drop items at the error rate to exercise retries
+                    items = json.loads(prompt).get("prompts", [])
+                    content = json.dumps(
+                        {
+                            "prompts": [
+                                {"id": item["id"], "enhanced": make_reply(item["prompt"], config.reply_words)}
+                                for item in items
+                                if random.random() >= config.error_rate
+                            ]
+                        }
+                    )
+                else:
+                    content = make_reply(prompt.splitlines()[-1], config.reply_words)
+                if body.get("stream"):
+                    self._chat_stream(body.get("model", "mock"), content)
+                    return
+                time.sleep(config.token_delay * len(content.split()))
+                self._json(
+                    200,
+                    {
+                        "id": f"chatcmpl-{uuid.uuid4().hex}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": content},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+                    },
+                )
+
+            elif url.path == "/v1/images/generations":
+                if self._count("openai-images"):
+                    return
+                time.sleep(config.render_delay)
+                self._json(
+                    200,
+                    {
+                        "created": int(time.time()),
+                        "data": [{"url": self._image_url(), "revised_prompt": body.get("prompt")}],
+                    },
+                )
+
+            elif url.path.startswith("/v1beta/models/") and url.path.endswith(":generateContent"):
+                if self._count("gemini"):
+                    return
+                time.sleep(config.render_delay)
+                data = base64.b64encode(state.image).decode()
+                count = body.get("generationConfig", {}).get("candidateCount") or 1
+                self._json(
+                    200,
+                    {
+                        "candidates": [
+                            {
+                                "content": {
+                                    "role": "model",
+                                    "parts": [{"inlineData": {"mimeType": "image/png", "data": data}}],
+                                },
+                                "finishReason": "STOP",
+                                "index": i,
+                            }
+                            for i in range(count)
+                        ]
+                    },
+                )
+
+            else:
+                self._json(404, {"error": f"no mock for POST {url.path}"})
+
+    return Handler
+
+
+def start_server(config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the mock server on a background thread and return it."""
+    server = ThreadingHTTPServer((host, port), make_handler(MockState(config)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local stand-ins for the Novita, OpenAI and Gemini APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--queue-delay", type=float, default=1.0, help="Seconds a Hunyuan task stays queued")
+    parser.add_argument("--render-delay", type=float, default=2.0, help="Seconds a render takes")
+    parser.add_argument("--chat-delay", type=float, default=0.2, help="Seconds until a chat completion starts")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed chat tokens")
+    parser.add_argument("--reply-words", type=int, default=60, help="Words in each chat completion")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 429/500")
+    parser.add_argument("--payload-kb", type=int, default=1500, help="Size of generated images in KiB")
+
+    args = parser.parse_args()
+
+    config = MockConfig(
+        queue_delay=args.queue_delay,
+        render_delay=args.render_delay,
+        chat_delay=args.chat_delay,
+        token_delay=args.token_delay,
+        reply_words=args.reply_words,
+        error_rate=args.error_rate,
+        payload_bytes=args.payload_kb * 1024,
+    )
+    server = start_server(config, args.host, args.port)
+    host, port = server.server_address
+    print(f"Mock providers listening on http://{host}:{port}")
+    print(f"  export NOVITA_BASE_URL=http://{host}:{port}")
+    print(f"  export OPENAI_BASE_URL=http://{host}:{port}/v1")
+    print(f"  export GEMINI_BASE_URL=http://{host}:{port}")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
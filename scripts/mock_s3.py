@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the S3 and CloudFront calls deploy_site.py makes.
+
+Serves, on one port (path-style, objects kept in memory):
+  PUT    /<bucket>/<key>                                  PutObject
+  GET    /<bucket>/<key>, HEAD /<bucket>/<key>            GetObject, HeadObject
+  GET    /<bucket>?list-type=2                            ListObjectsV2 (paged)
+  POST   /<bucket>?delete                                 DeleteObjects
+  POST   /2020-05-31/distribution/<id>/invalidation       CloudFront CreateInvalidation
+  GET    /_stats                                          Request counters and invalidated paths
+
+Buckets are created on first use and credentials are not checked. Point
+deploy_site.py at it with --endpoint-url http://HOST:PORT (or
+AWS_ENDPOINT_URL) and any AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY.
+
+Usage:
+    python scripts/mock_s3.py --port 9000
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+S3_NS = "http://s3.amazonaws.com/doc/2006-03-01/"
+CLOUDFRONT_NS = "http://cloudfront.amazonaws.com/doc/2020-05-31/"
+INVALIDATION_PATH = re.compile(r"^/2020-05-31/distribution/([^/]+)/invalidation$")
+
+
+class MockStore:
+    """Buckets of {key: (body, headers)}, request counters and every invalidation."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.requests = Counter()
+        self.invalidations = []
+
+    def bucket(self, name: str) -> dict:
+        return self.buckets.setdefault(name, {})
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _decode_aws_chunked(body: bytes) -> bytes:
+    """Payload of an aws-chunked body (chunks of "size;ext\\r\\ndata\\r\\n", then trailers)."""
+    data, position = b"", 0
+    while True:
+        line_end = body.index(b"\r\n", position)
+        size = int(body[position:line_end].split(b";")[0], 16)
+        if size == 0:
+            return data
+        data += body[line_end + 2 : line_end + 2 + size]
+        position = line_end + 2 + size + 2
+
+
+def make_handler(store: MockStore):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: bytes = b"", headers=None, content_type="application/xml"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def _xml(self, status: int, xml: str, headers=None):
+            self._send(status, ('<?xml version="1.0" encoding="UTF-8"?>\n' + xml).encode(), headers)
+
+        def _error(self, status: int, code: str, message: str):
+            self._xml(status, f"<Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>")
+
+        def _read_body(self) -> bytes:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            if "aws-chunked" in (self.headers.get("Content-Encoding") or "") or (
+                self.headers.get("x-amz-content-sha256", "").startswith("STREAMING-")
+            ):
+                body = _decode_aws_chunked(body)
+            return body
+
+        def _target(self):
+            """(parsed URL, bucket, key) of an S3 request."""
+            url = urlparse(self.path)
+            bucket, _, key = url.path.lstrip("/").partition("/")
+            return url, unquote(bucket), unquote(key)
+
+        def do_GET(self):
+            url, bucket, key = self._target()
+            if url.path == "/_stats":
+                with store.lock:
+                    stats = {
+                        "requests": dict(store.requests),
+                        "objects": {name: len(objects) for name, objects in store.buckets.items()},
+                        "invalidations": store.invalidations,
+                    }
+                self._send(200, json.dumps(stats).encode(), content_type="application/json")
+                return
+
+            if not key:
+                self._list(bucket, parse_qs(url.query))
+                return
+            self._get(bucket, key)
+
+        def do_HEAD(self):
+            _, bucket, key = self._target()
+            self._get(bucket, key)
+
+        def _get(self, bucket: str, key: str):
+            with store.lock:
+                store.requests[self.command.lower()] += 1
+                item = store.bucket(bucket).get(key)
+            if item is None:
+                self._error(404, "NoSuchKey", f"{key} does not exist")
+                return
+            body, headers = item
+            extra = {"ETag": headers["ETag"]}
+            if headers.get("Cache-Control"):
+                extra["Cache-Control"] = headers["Cache-Control"]
+            self._send(200, body, extra, content_type=headers["Content-Type"])
+
+        def _list(self, bucket: str, query: dict):
+            prefix = query.get("prefix", [""])[0]
+            max_keys = int(query.get("max-keys", ["1000"])[0])
+            start_after = query.get("continuation-token", query.get("start-after", [""]))[0]
+            with store.lock:
+                store.requests["list"] += 1
+                keys = sorted(k for k in store.bucket(bucket) if k.startswith(prefix) and k > start_after)
+                page = [(k, store.bucket(bucket)[k]) for k in keys[:max_keys]]
+
+            truncated = len(keys) > max_keys
+            contents = "".join(
+                f"<Contents><Key>{escape(k)}</Key><LastModified>{headers['Last-Modified']}</LastModified>"
+                f"<ETag>{escape(headers['ETag'])}</ETag><Size>{len(body)}</Size>"
+                f"<StorageClass>STANDARD</StorageClass></Contents>"
+                for k, (body, headers) in page
+            )
+            next_token = f"<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>" if truncated else ""
+            self._xml(
+                200,
+                f'<ListBucketResult xmlns="{S3_NS}"><Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix>'
+                f"<KeyCount>{len(page)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>"
+                f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>{next_token}{contents}"
+                f"</ListBucketResult>",
+            )
+
+        def do_PUT(self):
+            _, bucket, key = self._target()
+            body = self._read_body()
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            headers = {
+                "ETag": etag,
+                "Content-Type": self.headers.get("Content-Type") or "binary/octet-stream",
+                "Cache-Control": self.headers.get("Cache-Control"),
+                "Last-Modified": _timestamp(),
+            }
+            with store.lock:
+                store.requests["put"] += 1
+                store.bucket(bucket)[key] = (body, headers)
+            self._send(200, headers={"ETag": etag})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = self._read_body()
+
+            match = INVALIDATION_PATH.match(url.path)
+            if match:
+                self._invalidate(match.group(1), body)
+                return
+
+            _, bucket, _ = self._target()
+            if "delete" not in parse_qs(url.query, keep_blank_values=True):
+                self._error(400, "NotImplemented", f"no mock for POST {self.path}")
+                return
+
+            root = ElementTree.fromstring(body)
+            keys = [element.text for element in root.iter() if element.tag.endswith("Key")]
+            with store.lock:
+                store.requests["delete"] += len(keys)
+                for key in keys:
+                    store.bucket(bucket).pop(key, None)
+            deleted = "".join(f"<Deleted><Key>{escape(key)}</Key></Deleted>" for key in keys)
+            self._xml(200, f'<DeleteResult xmlns="{S3_NS}">{deleted}</DeleteResult>')
+
+        def _invalidate(self, distribution_id: str, body: bytes):
+            root = ElementTree.fromstring(body)
+            paths = [element.text for element in root.iter() if element.tag.endswith("Path")]
+            reference = next((element.text for element in root.iter() if element.tag.endswith("CallerReference")), "")
+            invalidation_id = "I" + uuid.uuid4().hex[:13].upper()
+            with store.lock:
+                store.requests["invalidation"] += 1
+                store.invalidations.append({"distribution": distribution_id, "id": invalidation_id, "paths": paths})
+
+            items = "".join(f"<Path>{escape(path)}</Path>" for path in paths)
+            self._xml(
+                201,
+                f'<Invalidation xmlns="{CLOUDFRONT_NS}"><Id>{invalidation_id}</Id><Status>InProgress</Status>'
+                f"<CreateTime>{_timestamp()}</CreateTime><InvalidationBatch>"
+                f"<Paths><Quantity>{len(paths)}</Quantity><Items>{items}</Items></Paths>"
+                f"<CallerReference>{escape(reference)}</CallerReference></InvalidationBatch></Invalidation>",
+                headers={"Location": f"/2020-05-31/distribution/{distribution_id}/invalidation/{invalidation_id}"},
+            )
+
+    return Handler
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the mock server on a background thread and return it."""
+    server = ThreadingHTTPServer((host, port), make_handler(MockStore()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for S3 and CloudFront invalidations")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+
+    server = start_server(args.host, args.port)
+    host, port = server.server_address
+    print(f"Mock S3/CloudFront listening on http://{host}:{port}")
+    print(f"  python scripts/deploy_site.py build/ --bucket site --distribution-id MOCK --endpoint-url http://{host}:{port}")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Produce optimized web variants of generated images.
+
+For every PNG/JPEG under static/img this writes, into static/img/optimized/:
+  - a losslessly optimized PNG at full size (PNG sources only)
+  - WebP and AVIF encodings at a set of responsive widths
+
+and records every variant with its byte size in
+static/img/optimized/manifest.json. Each entry keeps the content hash and
+encoder settings it was produced with; sources whose hash and settings both
+match are skipped, so re-runs only process new or changed images, and a run
+with other widths or formats re-encodes only the images it was given.
+Entries (and variants) whose source image is gone are pruned. Work is spread
+over a process pool.
+
+Usage:
+    python scripts/optimize_images.py
+    python scripts/optimize_images.py static/img/featured/day-four-first-light-5.png
+    python scripts/optimize_images.py --widths 640,1280 --formats webp
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+try:
+    from PIL import Image, features
+except ImportError:
+    print("Error: Pillow package not installed. Run: pip install pillow", file=sys.stderr)
+    sys.exit(1)
+
+from disk_cache import write_json_atomic
+from image_jobs import process_context
+from result_store import file_sha256
+
+IMAGE_ROOT = Path("static/img")
+OUTPUT_DIR = IMAGE_ROOT / "optimized"
+MANIFEST_NAME = "manifest.json"
+
+DEFAULT_WIDTHS = (480, 960, 1536)
+DEFAULT_FORMATS = ("webp", "avif")
+WEBP_QUALITY = 82
+AVIF_QUALITY = 60
+
+SOURCE_SUFFIXES = {".png", ".jpg", ".jpeg"}
+
+
+def avif_supported() -> bool:
+    """Whether this Pillow build can write AVIF (natively or via pillow-avif-plugin)."""
+    try:
+        if features.check("avif"):
+            return True
+    except ValueError:
+        pass
+
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF plugin)
+    except ImportError:
+        return False
+    return True
+
+
+def _save(image: Image.Image, path: Path, **params) -> int:
+    """Encode image to path atomically and return the number of bytes written."""
+    buffer = io.BytesIO()
+    image.save(buffer, **params)
+    data = buffer.getvalue()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+def process_image(source: Path, rel: Path, output_dir: Path, widths: tuple, formats: tuple) -> dict:
+    """Write every variant of one source image and return its manifest entry."""
+    with Image.open(source) as image:
+        image.load()
+
+    width, height = image.size
+    base = output_dir / rel.parent / rel.stem
+    variants = []
+
+    def record(path: Path, fmt: str, variant_width: int, variant_height: int, size: int):
+        variants.append(
+            {
+                "path": "/" + path.relative_to(IMAGE_ROOT.parent).as_posix(),
+                "format": fmt,
+                "width": variant_width,
+                "height": variant_height,
+                "bytes": size,
+            }
+        )
+
+    if source.suffix.lower() == ".png":
+        path = base.with_suffix(".png")
+        record(path, "png", width, height, _save(image, path, format="PNG", optimize=True))
+
+    # Never upscale: responsive widths above the source collapse to the source width
+    target_widths = sorted({min(w, width) for w in widths})
+
+    for target_width in target_widths:
+        target_height = round(height * target_width / width)
+        if target_width == width:
+            resized = image
+        else:
+            resized = image.resize((target_width, target_height), Image.LANCZOS)
+
+        if "webp" in formats:
+            path = base.parent / f"{base.name}-{target_width}.webp"
+            size = _save(resized, path, format="WEBP", quality=WEBP_QUALITY, method=6)
+            record(path, "webp", target_width, target_height, size)
+
+        if "avif" in formats:
+            path = base.parent / f"{base.name}-{target_width}.avif"
+            size = _save(resized, path, format="AVIF", quality=AVIF_QUALITY)
+            record(path, "avif", target_width, target_height, size)
+
+    return {
+        "source_bytes": source.stat().st_size,
+        "width": width,
+        "height": height,
+        "variants": variants,
+    }
+
+
+def find_sources(paths: list) -> list:
+    """Expand files/directories into source images, excluding existing variants."""
+    output_dir = OUTPUT_DIR.resolve()
+    sources = []
+    for path in paths:
+        candidates = [path] if path.is_file() else sorted(path.rglob("*"))
+        for candidate in candidates:
+            if candidate.suffix.lower() not in SOURCE_SUFFIXES or candidate.name.startswith("."):
+                continue
+            if output_dir in candidate.resolve().parents:
+                continue
+            sources.append(candidate)
+    return sources
+
+
+def load_manifest() -> dict:
+    """Read the variant manifest, or an empty one if there is none yet."""
+    try:
+        return json.loads((OUTPUT_DIR / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _remove_variants(entry: dict, keep: set = frozenset()):
+    """Delete an entry's variant files other than the paths in keep."""
+    for variant in entry.get("variants", []):
+        if variant["path"] not in keep:
+            (IMAGE_ROOT.parent / variant["path"].lstrip("/")).unlink(missing_ok=True)
+
+
+def prune(images: dict) -> int:
+    """Drop entries, and their variants, whose source image no longer exists; return how many."""
+    gone = [key for key in images if not (IMAGE_ROOT / key).exists()]
+    for key in gone:
+        _remove_variants(images.pop(key))
+        print(f"✓ Pruned {key} (source removed)")
+    return len(gone)
+
+
+def optimize(paths: list, widths=DEFAULT_WIDTHS, formats=DEFAULT_FORMATS, jobs=None, force=False) -> dict:
+    """
+    Optimize images (files or directories under static/img) and update the manifest.
+
+    Returns:
+        The updated manifest
+    """
+    if "avif" in formats and not avif_supported():
+        print("Warning: this Pillow build cannot write AVIF; skipping AVIF variants", file=sys.stderr)
+        formats = tuple(f for f in formats if f != "avif")
+
+    settings = {
+        "widths": list(widths),
+        "formats": list(formats),
+        "webp_quality": WEBP_QUALITY,
+        "avif_quality": AVIF_QUALITY,
+    }
+    manifest = load_manifest()
+    images = manifest.get("images", {})
+    for entry in images.values():
+        # Manifests written before settings were kept per entry
+        entry.setdefault("settings", manifest.get("settings"))
+    prune(images)
+
+    pending = {}
+    skipped = 0
+    for source in find_sources(paths):
+        try:
+            rel = source.resolve().relative_to(IMAGE_ROOT.resolve())
+        except ValueError:
+            print(f"Warning: {source} is outside {IMAGE_ROOT}; skipping", file=sys.stderr)
+            continue
+
+        sha256 = file_sha256(source)
+        entry = images.get(rel.as_posix())
+        if (
+            not force
+            and entry
+            and entry.get("sha256") == sha256
+            and entry.get("settings") == settings
+            and all((IMAGE_ROOT.parent / v["path"].lstrip("/")).exists() for v in entry["variants"])
+        ):
+            skipped += 1
+            continue
+
+        pending[rel.as_posix()] = (source, rel, sha256)
+
+    print(f"Optimizing {len(pending)} images ({skipped} unchanged)...")
+
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=process_context()) as executor:
+        futures = {
+            executor.submit(process_image, source, rel, OUTPUT_DIR, tuple(widths), tuple(formats)): (key, sha256)
+            for key, (source, rel, sha256) in pending.items()
+        }
+        for future in as_completed(futures):
+            key, sha256 = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"Error: {key}: {e}", file=sys.stderr)
+                continue
+
+            entry["sha256"] = sha256
+            entry["settings"] = settings
+            if key in images:
+                # Widths or formats the new settings no longer produce
+                _remove_variants(images[key], {v["path"] for v in entry["variants"]})
+            images[key] = entry
+            smallest = min(v["bytes"] for v in entry["variants"])
+            print(f"✓ {key}: {entry['source_bytes'] / 1024:.0f} KiB -> {smallest / 1024:.0f} KiB smallest variant")
+
+    manifest = {"images": dict(sorted(images.items()))}
+    write_json_atomic(OUTPUT_DIR / MANIFEST_NAME, manifest)
+    return manifest
+
+
+def main():
+    """CLI for optimizing images."""
+    parser = argparse.ArgumentParser(description="Generate optimized PNG/WebP/AVIF variants of site images")
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=[str(IMAGE_ROOT)],
+        help="Images or directories under static/img (default: static/img)",
+    )
+    parser.add_argument(
+        "--widths",
+        default=",".join(str(w) for w in DEFAULT_WIDTHS),
+        help="Comma-separated responsive widths (default: 480,960,1536)",
+    )
+    parser.add_argument(
+        "--formats",
+        default=",".join(DEFAULT_FORMATS),
+        help="Comma-separated variant formats: webp, avif (default: webp,avif)",
+    )
+    parser.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Re-encode even unchanged images")
+
+    args = parser.parse_args()
+
+    widths = tuple(int(w) for w in args.widths.split(","))
+    formats = tuple(f.strip().lower() for f in args.formats.split(","))
+    unknown = set(formats) - set(DEFAULT_FORMATS)
+    if unknown:
+        parser.error(f"unsupported formats: {', '.join(sorted(unknown))}")
+
+    optimize([Path(p) for p in args.paths], widths, formats, args.jobs, args.force)
+
+
+if __name__ == "__main__":
+    main()
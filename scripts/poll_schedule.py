@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Adaptive poll intervals for Novita async tasks.
+
+Instead of polling task-result every few seconds regardless of state,
+PollSchedule backs off while a task sits in the queue, polls at half the
+remaining time as a render approaches its expected finish, and backs off
+again once it runs late. Every delay is jittered so many batch jobs do not
+poll in lockstep.
+
+The expected finish is learned per size: each completed task records its
+submit-to-done time in the shared latency history (see latency_history.py)
+under TASK_HISTORY, and the median of those samples is used once enough
+have been collected.
+"""
+
+import random
+
+import latency_history
+
+TASK_HISTORY = "hunyuan-task"
+
+QUEUED_STATUSES = ("TASK_STATUS_QUEUED", "TASK_STATUS_PENDING")
+
+MIN_INTERVAL = 1.0
+MAX_INTERVAL = 10.0
+JITTER = 0.2
+
+
+def expected_seconds(size: str):
+    """Median submit-to-done time of past tasks at this size, or None without history."""
+    return latency_history.percentile(TASK_HISTORY, size, 50)
+
+
+def record(size: str, seconds: float):
+    """Add a completed task's submit-to-done time to the history."""
+    latency_history.record(TASK_HISTORY, size, seconds)
+
+
+class PollSchedule:
+    """Chooses the delay before each poll of one task."""
+
+    def __init__(
+        self,
+        expected: float = None,
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        jitter: float = JITTER,
+    ):
+        self.expected = expected
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.jitter = jitter
+        self._queued_polls = 0
+        self._late_polls = 0
+
+    def next_delay(self, elapsed: float, status: str) -> float:
+        """
+        Seconds to wait before the next poll.
+
+        Args:
+            elapsed: Seconds since the task was submitted
+            status: Task status from the last poll
+        """
+        if status in QUEUED_STATUSES:
+            # Nothing to see until it leaves the queue; back off geometrically
+            delay = self.min_interval * 1.5 ** self._queued_polls
+            self._queued_polls += 1
+        elif self.expected is not None and elapsed < self.expected:
+            # Halve the remaining gap, so polls get denser near the expected finish
+            delay = (self.expected - elapsed) / 2
+        else:
+            # Running late (or no history yet): back off slowly from the minimum
+            delay = self.min_interval * 1.3 ** self._late_polls
+            self._late_polls += 1
+
+        delay = min(max(delay, self.min_interval), self.max_interval)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,775 @@
+#!/usr/bin/env python3
+"""
+Shared provider clients for the image generation scripts.
+
+Every script talks to Novita.ai (Hunyuan Image 3 and Kimi K2.5), OpenAI and
+Gemini through the long-lived clients in this module. Clients are built once
+per process and reused, so the submit -> poll -> download cycle runs over
+pooled keep-alive connections instead of a fresh TCP+TLS handshake per call.
+
+Pool sizes default to 10 connections per host. Override them with the
+IMAGE_POOL_SIZE environment variable or configure_pools().
+
+NOVITA_BASE_URL, OPENAI_BASE_URL and GEMINI_BASE_URL point the clients at
+other endpoints, e.g. the local stand-ins in mock_providers.py. Under
+--record/--replay every client talks through a cassette instead (see
+cassette.py).
+
+Novita task calls and image downloads retry 429 and transient 5xx responses
+(see http_retry.py). Provider calls queue for the token buckets shared by
+every process on the machine (see rate_limit.py), and their 429s slow those
+buckets down.
+
+requests and the provider SDKs (openai, google-genai) are imported only when
+a client is first built, so --help, argument errors and missing API keys
+never pay their import cost.
+"""
+
+import math
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cassette
+from deadline import CONNECT_TIMEOUT, READ_TIMEOUT, Deadline
+from downloads import stream_download, write_image
+from http_retry import (
+    MAX_ATTEMPTS,
+    TRANSIENT_STATUSES,
+    backoff_delay,
+    retry_after_seconds,
+    retry_delay,
+    wait_if_paused,
+)
+import job_journal
+import latency_history
+import poll_schedule
+import rate_limit
+import sops_secrets
+import tracing
+
+
+NOVITA_BASE_URL = os.environ.get("NOVITA_BASE_URL", "https://api.novita.ai")
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL")
+GEMINI_IMAGE_MODEL = "gemini-2.5-flash-image"
+HUNYUAN_MODEL = "hunyuan-image-3"
+
+PENDING_STATUSES = ("TASK_STATUS_QUEUED", "TASK_STATUS_PENDING", "TASK_STATUS_PROCESSING")
+
+# Synchronous renders (DALL-E, Gemini) can take well over a normal read timeout
+RENDER_TIMEOUT = 180.0
+
+# Sizes each provider accepts, as "WIDTHxHEIGHT"
+DALLE_SIZES = ("1024x1024", "1792x1024", "1024x1792")
+HUNYUAN_MAX_SIDE = 1536
+
+# Aspect ratios Gemini image models can render
+GEMINI_ASPECT_RATIOS = ("1:1", "2:3", "3:2", "3:4", "4:3", "4:5", "5:4", "9:16", "16:9", "21:9")
+
+_pool_size = int(os.environ.get("IMAGE_POOL_SIZE", "10"))
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def configure_pools(pool_size: int):
+    """Set the per-host connection pool size and drop any clients already built."""
+    global _pool_size
+
+    with _clients_lock:
+        _pool_size = pool_size
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def _cached_client(key: tuple, factory):
+    """Return the client stored under key, building it on first use."""
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = factory()
+        return client
+
+
+def _missing_package(package: str):
+    print(f"Error: {package} package not installed. Run: pip install {package}", file=sys.stderr)
+    sys.exit(1)
+
+
+def _requests():
+    """Import requests on first use, or exit with an install hint."""
+    try:
+        import requests
+    except ImportError:
+        _missing_package("requests")
+    return requests
+
+
+def _httpx_limits():
+    import httpx
+
+    return httpx.Limits(max_connections=_pool_size, max_keepalive_connections=_pool_size)
+
+
+def _httpx_client_args(client_class=None) -> dict:
+    """
+    Connection limits for an httpx client, through a cassette transport when recording or replaying.
+
+    Args:
+        client_class: The SDK's httpx client class, whose own httpx package
+            the transport must come from (default: httpx)
+    """
+    import httpx
+
+    if client_class is not None:
+        base = next(c for c in client_class.__mro__ if c.__name__ == "Client")
+        httpx = sys.modules[base.__module__.split(".")[0]]
+    transport = cassette.httpx_transport(httpx, limits=_httpx_limits())
+    return {"transport": transport} if transport is not None else {"limits": _httpx_limits()}
+
+
+def _httpx_timeout(read: float = READ_TIMEOUT):
+    import httpx
+
+    return httpx.Timeout(read, connect=CONNECT_TIMEOUT)
+
+
+class GenerationCancelled(Exception):
+    """Raised when a render is abandoned through its cancel event."""
+
+
+class GenerationFailed(RuntimeError):
+    """Raised when the provider reports that a render failed."""
+
+
+def fit_size(provider: str, size: str) -> str:
+    """
+    Map a requested size onto the closest size a provider supports.
+
+    DALL-E only offers three sizes, so the one with the matching orientation
+    is used; Hunyuan is scaled down to fit its 1536px limit. Gemini sizes are
+    passed through and sent as the closest aspect ratio (gemini_aspect_ratio).
+    """
+    width, height = (int(v) for v in size.lower().split("x"))
+
+    if provider == "openai":
+        if width > height:
+            return "1792x1024"
+        if height > width:
+            return "1024x1792"
+        return "1024x1024"
+
+    if provider == "hunyuan" and max(width, height) > HUNYUAN_MAX_SIDE:
+        scale = HUNYUAN_MAX_SIDE / max(width, height)
+        # Keep dimensions multiples of 16 for the model
+        width, height = (max(256, int(v * scale) // 16 * 16) for v in (width, height))
+
+    return f"{width}x{height}"
+
+
+def _ratio_value(ratio: str) -> float:
+    width, height = (int(v) for v in ratio.split(":"))
+    return width / height
+
+
+def gemini_aspect_ratio(size: str) -> str:
+    """Closest aspect ratio Gemini can render for a WIDTHxHEIGHT size (e.g. 1792x1024 -> 16:9)."""
+    width, height = (int(v) for v in size.lower().split("x"))
+    return min(GEMINI_ASPECT_RATIOS, key=lambda ratio: abs(math.log(width / height / _ratio_value(ratio))))
+
+
+def require_env(name: str, secret_key: str) -> str:
+    """Return an API key from the environment (or secrets.yaml), or exit with a hint on how to set it."""
+    value = os.environ.get(name)
+    if not value:
+        # Only now, when this process runs the job itself, is secrets.yaml decrypted
+        sops_secrets.load_secrets()
+        value = os.environ.get(name)
+    if not value:
+        print(f"Error: {name} environment variable not set", file=sys.stderr)
+        print(f"Run: export {name}=$(sops -d secrets.yaml | yq .{secret_key})", file=sys.stderr)
+        sys.exit(1)
+    return value
+
+
+def http_session() -> "requests.Session":
+    """Shared requests session for Novita task calls and image downloads."""
+    requests = _requests()
+    from requests.adapters import HTTPAdapter
+
+    def build():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size)
+        adapter = cassette.requests_adapter(adapter)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    return _cached_client(("http",), build)
+
+
+def request_with_retries(
+    method: str,
+    url: str,
+    retry_statuses=TRANSIENT_STATUSES,
+    retry_connection_errors: bool = True,
+    max_attempts: int = MAX_ATTEMPTS,
+    deadline: Deadline = None,
+    bucket: str = None,
+    **kwargs,
+) -> "requests.Response":
+    """
+    Send a request on the shared session, retrying rate limits and transient failures.
+
+    Args:
+        method: HTTP method
+        url: Request URL
+        retry_statuses: Status codes to retry
+        retry_connection_errors: Also retry connection errors and timeouts
+            (only safe when repeating the request cannot duplicate work)
+        max_attempts: Attempts before the last response or error is returned/raised
+        deadline: Bounds each attempt's timeouts and the waits between them
+        bucket: rate_limit bucket each attempt queues for and reports to
+        **kwargs: Passed to requests.Session.request
+
+    Returns:
+        The final response, which may still be an error for the caller to raise
+
+    Raises:
+        DeadlineExceeded: If the deadline passes before a usable response
+    """
+    requests = _requests()
+    deadline = deadline or Deadline()
+
+    for attempt in range(1, max_attempts + 1):
+        wait_if_paused(deadline)
+
+        try:
+            with rate_limit.slot(bucket, deadline) as slot:
+                response = http_session().request(method, url, timeout=deadline.timeout(), **kwargs)
+                slot.report(response.status_code, retry_after_seconds(response))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if not retry_connection_errors or attempt == max_attempts:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"  {type(e).__name__}; retrying in {delay:.1f}s ({attempt}/{max_attempts - 1})", file=sys.stderr)
+            tracing.current_span().count("retries")
+            deadline.sleep(delay)
+            continue
+
+        if response.status_code not in retry_statuses or attempt == max_attempts:
+            return response
+
+        delay = retry_delay(response, attempt)
+        print(
+            f"  HTTP {response.status_code}; retrying in {delay:.1f}s ({attempt}/{max_attempts - 1})",
+            file=sys.stderr,
+        )
+        tracing.current_span().count("retries")
+        response.close()
+        deadline.sleep(delay)
+
+    return response
+
+
+def openai_client(api_key: str):
+    """Shared OpenAI client (DALL-E)."""
+
+    def build():
+        try:
+            from openai import DefaultHttpxClient, OpenAI
+        except ImportError:
+            _missing_package("openai")
+        return OpenAI(
+            api_key=api_key,
+            timeout=_httpx_timeout(RENDER_TIMEOUT),
+            http_client=DefaultHttpxClient(**_httpx_client_args(DefaultHttpxClient)),
+        )
+
+    return _cached_client(("openai", api_key), build)
+
+
+def novita_chat_client(api_key: str):
+    """Shared OpenAI-compatible client for Novita.ai chat completions (Kimi K2.5)."""
+
+    def build():
+        try:
+            from openai import DefaultHttpxClient, OpenAI
+        except ImportError:
+            _missing_package("openai")
+        return OpenAI(
+            api_key=api_key,
+            base_url=f"{NOVITA_BASE_URL}/openai",
+            timeout=_httpx_timeout(),
+            http_client=DefaultHttpxClient(**_httpx_client_args(DefaultHttpxClient)),
+        )
+
+    return _cached_client(("novita-chat", api_key), build)
+
+
+def gemini_client(api_key: str):
+    """Shared Google Gemini client."""
+
+    def build():
+        try:
+            import google.genai as genai
+            from google.genai import types
+        except ImportError:
+            _missing_package("google-genai")
+        return genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(
+                base_url=GEMINI_BASE_URL,
+                timeout=int(RENDER_TIMEOUT * 1000),
+                client_args=_httpx_client_args(),
+            ),
+        )
+
+    return _cached_client(("gemini", api_key), build)
+
+
+def stream_chat(
+    client,
+    on_delta=None,
+    should_stop=None,
+    deadline: Deadline = None,
+    bucket: str = "novita:chat",
+    **create_args,
+):
+    """
+    Run a streaming chat completion and accumulate its content deltas.
+
+    Args:
+        client: OpenAI-compatible client (e.g. novita_chat_client())
+        on_delta: Called with each content delta as it arrives
+        should_stop: Called with the text so far; returning True closes the
+            stream early so the remaining tokens are neither generated nor billed
+        deadline: Bounds the request timeout and closes the stream when it passes
+        bucket: rate_limit bucket held for the whole stream
+        **create_args: Passed to chat.completions.create (model, messages, ...)
+
+    Returns:
+        (text, seconds to the first content token or None, True if stopped early)
+
+    Raises:
+        DeadlineExceeded: If the deadline passes before the completion ends
+    """
+    deadline = deadline or Deadline()
+    start_time = time.time()
+    first_token = None
+    parts = []
+
+    if deadline.total is not None:
+        # SDK retries would each get the full timeout again; the caller falls back instead
+        client = client.with_options(max_retries=0)
+    # The slot is held until the stream ends, so it bounds concurrent completions too
+    with rate_limit.slot(bucket, deadline):
+        stream = client.chat.completions.create(stream=True, timeout=deadline.seconds(), **create_args)
+        try:
+            for chunk in stream:
+                deadline.check()
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+
+                if first_token is None:
+                    first_token = time.time() - start_time
+                parts.append(delta)
+                if on_delta is not None:
+                    on_delta(delta)
+
+                if should_stop is not None and should_stop("".join(parts)):
+                    return "".join(parts), first_token, True
+        finally:
+            stream.close()
+
+    return "".join(parts), first_token, False
+
+
+# ---------------------------------------------------------------------------
+# Hunyuan Image 3 (Novita.ai async task API)
+# ---------------------------------------------------------------------------
+
+
+def submit_generation(
+    api_key: str,
+    prompt: str,
+    size: str = "1024x1024",
+    seed: int = -1,
+    deadline: Deadline = None,
+) -> str:
+    """Submit image generation request and return task_id."""
+    url = f"{NOVITA_BASE_URL}/v3/async/{HUNYUAN_MODEL}"
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+
+    payload = {
+        "prompt": prompt,
+        "size": size,
+    }
+
+    if seed != -1:
+        payload["seed"] = seed
+
+    print(f"Submitting generation request...")
+    print(f"Prompt: {prompt}")
+    print(f"Size: {size}")
+
+    with tracing.span("submit", provider="hunyuan", model=HUNYUAN_MODEL, size=size) as span:
+        # A 5xx may mean the task was created anyway, so only retry responses
+        # that guarantee it was not: rate limits and an unavailable service
+        response = request_with_retries(
+            "POST",
+            url,
+            retry_statuses=(429, 503),
+            retry_connection_errors=False,
+            deadline=deadline,
+            bucket="novita:submit",
+            headers=headers,
+            json=payload,
+        )
+
+        if not response.ok:
+            print(f"API Error: {response.status_code} - {response.text}", file=sys.stderr)
+
+        response.raise_for_status()
+
+        result = response.json()
+        task_id = result.get("task_id")
+
+        if not task_id:
+            raise ValueError(f"No task_id in response: {result}")
+        span.set(task_id=task_id)
+
+    print(f"✓ Task submitted: {task_id}")
+    return task_id
+
+
+def poll_task(api_key: str, task_id: str, deadline: Deadline = None) -> dict:
+    """Fetch the current task-result payload for a task once."""
+    url = f"{NOVITA_BASE_URL}/v3/async/task-result"
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+    }
+
+    response = request_with_retries(
+        "GET", url, deadline=deadline, bucket="novita:poll", headers=headers, params={"task_id": task_id}
+    )
+
+    if not response.ok:
+        print(f"API Error: {response.status_code} - {response.text}", file=sys.stderr)
+
+    response.raise_for_status()
+    return response.json()
+
+
+def parse_task_result(result: dict):
+    """Return the image URL of a finished task, or None while it is still running."""
+    task_status = result.get("task", {}).get("status")
+
+    if task_status == "TASK_STATUS_SUCCEED":
+        images = result.get("images", [])
+        if not images:
+            raise ValueError(f"No images in result: {result}")
+        return images[0].get("image_url")
+
+    elif task_status == "TASK_STATUS_FAILED":
+        error_msg = result.get("task", {}).get("reason", "Unknown error")
+        raise GenerationFailed(f"Generation failed: {error_msg}")
+
+    elif task_status in PENDING_STATUSES:
+        return None
+
+    else:
+        raise ValueError(f"Unknown task status: {task_status}")
+
+
+def record_task_phases(task_id: str, submitted: float, started, finished: float, polls: int):
+    """
+    Trace the queue wait and render time of a finished Hunyuan task.
+
+    started is when polling first saw the task leave the queue, so both
+    phases are only as precise as the poll interval.
+    """
+    started = started or finished
+    tracing.record("queue", submitted, started, provider="hunyuan", model=HUNYUAN_MODEL, task_id=task_id, polls=polls)
+    tracing.record("render", started, finished, provider="hunyuan", model=HUNYUAN_MODEL, task_id=task_id)
+
+
+def get_task_result(
+    api_key: str,
+    task_id: str,
+    timeout: int = 300,
+    poll_interval: float = poll_schedule.MIN_INTERVAL,
+    cancel: threading.Event = None,
+    size: str = None,
+    deadline: Deadline = None,
+):
+    """
+    Poll task result endpoint until generation completes (or cancel is set).
+
+    Polls follow a PollSchedule with poll_interval as the shortest gap. When
+    size is given, the schedule aims at the typical completion time for that
+    size, and this task's time is added to the history. Polling stops at
+    timeout seconds or the deadline, whichever comes first.
+    """
+    deadline = deadline or Deadline()
+    window = deadline.limit(timeout, "polling")
+    start_time = time.time()
+    expected = poll_schedule.expected_seconds(size) if size else None
+    schedule = poll_schedule.PollSchedule(expected, min_interval=poll_interval)
+    started = None
+    polls = 0
+
+    hint = f", typically done in {expected:.0f}s" if expected else ""
+    print(f"Polling for results (timeout: {timeout}s{hint})...")
+
+    # A task is never done the moment it is accepted
+    delay = schedule.next_delay(0, "TASK_STATUS_QUEUED")
+
+    while True:
+        delay = cassette.wait_time(min(delay, window.remaining()))
+        if cancel is not None:
+            cancel.wait(delay)
+        else:
+            time.sleep(delay)
+
+        deadline.check()
+        if window.expired():
+            raise TimeoutError(f"Task did not complete within {timeout} seconds")
+        if cancel is not None and cancel.is_set():
+            raise GenerationCancelled(f"Stopped polling task {task_id}")
+
+        result = poll_task(api_key, task_id, window)
+        polls += 1
+        image_url = parse_task_result(result)
+
+        task_status = result.get("task", {}).get("status")
+        if started is None and task_status not in poll_schedule.QUEUED_STATUSES:
+            started = time.time()
+
+        if image_url is not None:
+            elapsed = time.time() - start_time
+            print(f"✓ Generation complete ({elapsed:.1f}s, {polls} polls)")
+            record_task_phases(task_id, start_time, started, time.time(), polls)
+            if size:
+                poll_schedule.record(size, elapsed)
+            return image_url
+
+        # Never sleep past the timeout; poll once more right at it
+        elapsed = time.time() - start_time
+        delay = min(schedule.next_delay(elapsed, task_status), window.remaining())
+        print(f"  Status: {task_status} ({elapsed:.1f}s elapsed, next poll in {delay:.1f}s)")
+
+
+def download_image(image_url: str, output_path: Path, deadline: Deadline = None) -> str:
+    """Stream image from URL to output path and return its SHA-256."""
+    print(f"Downloading image...")
+    with tracing.span("download") as span:
+        sha256 = stream_download(http_session(), image_url, output_path, deadline=deadline)
+        span.set(bytes=output_path.stat().st_size)
+    print(f"✓ Image saved to {output_path}")
+    return sha256
+
+
+def render_hunyuan(
+    api_key: str,
+    prompt: str,
+    output_path: Path,
+    size: str = "1024x1024",
+    seed: int = -1,
+    timeout: int = 300,
+    poll_interval: float = poll_schedule.MIN_INTERVAL,
+    cancel: threading.Event = None,
+    deadline: Deadline = None,
+) -> str:
+    """
+    Generate one image with Hunyuan Image 3, save it to output_path and return its SHA-256.
+
+    With a deadline, submission, queue/render and download each get their
+    own phase budget; polling also stops after timeout seconds.
+    """
+    deadline = deadline or Deadline()
+    start_time = time.time()
+
+    # Convert size from "1024x1024" to "1024*1024" (Novita API format)
+    size_novita = size.replace("x", "*")
+
+    with tracing.span("generate", provider="hunyuan", model=HUNYUAN_MODEL, size=size):
+        task_id = submit_generation(api_key, prompt, size_novita, seed, deadline.phase("submit"))
+        # Journaled before polling, so a timeout or crash can be resumed
+        job_journal.record_submission("hunyuan", HUNYUAN_MODEL, task_id, prompt, output_path, size, seed)
+
+        try:
+            image_url = get_task_result(
+                api_key, task_id, timeout, poll_interval, cancel, size, deadline.phase("render")
+            )
+            print(f"Image URL: {image_url}")
+
+            sha256 = download_image(image_url, output_path, deadline.phase("download"))
+        except GenerationCancelled:
+            job_journal.finish(task_id, job_journal.CANCELLED)
+            raise
+        except GenerationFailed as e:
+            job_journal.finish(task_id, job_journal.FAILED, error=str(e))
+            raise
+        except TimeoutError:
+            print(f"Task {task_id} is journaled; run: python scripts/job_journal.py resume", file=sys.stderr)
+            raise
+
+        job_journal.finish(task_id, job_journal.DONE, sha256=sha256)
+    latency_history.record("hunyuan", size, time.time() - start_time)
+    return sha256
+
+
+# ---------------------------------------------------------------------------
+# OpenAI DALL-E
+# ---------------------------------------------------------------------------
+
+
+def render_dalle(
+    api_key: str,
+    prompt: str,
+    output_path: Path,
+    size: str = "1792x1024",
+    quality: str = "standard",
+    model: str = "dall-e-3",
+    deadline: Deadline = None,
+) -> str:
+    """Generate one image with DALL-E, save it to output_path and return its SHA-256."""
+    deadline = deadline or Deadline()
+    start_time = time.time()
+    with tracing.span("generate", provider="openai", model=model, size=size, quality=quality):
+        with tracing.span("render", provider="openai", model=model, size=size, quality=quality):
+            client = openai_client(api_key)
+            if deadline.total is not None:
+                # The SDK's own retries would each get the full timeout again
+                client = client.with_options(max_retries=0)
+            render_deadline = deadline.phase("render")
+            with rate_limit.slot("openai:images", render_deadline):
+                response = client.images.generate(
+                    model=model,
+                    prompt=prompt,
+                    size=size,
+                    quality=quality,
+                    n=1,
+                    timeout=render_deadline.seconds(RENDER_TIMEOUT),
+                )
+
+        image_url = response.data[0].url
+        print(f"Image generated: {image_url}")
+
+        sha256 = download_image(image_url, output_path, deadline.phase("download"))
+
+    # Print revised prompt if available
+    revised_prompt = getattr(response.data[0], "revised_prompt", None)
+    if revised_prompt:
+        print(f"\nRevised prompt: {revised_prompt}")
+
+    latency_history.record("openai", size, time.time() - start_time)
+    return sha256
+
+
+# ---------------------------------------------------------------------------
+# Google Gemini (nano-banana)
+# ---------------------------------------------------------------------------
+
+
+def candidate_paths(output_path: Path, candidates: int) -> list:
+    """Output paths for candidates images: output_path itself for one, name-1.png, name-2.png, ... for more."""
+    if candidates == 1:
+        return [output_path]
+    return [output_path.with_name(f"{output_path.stem}-{i}{output_path.suffix}") for i in range(1, candidates + 1)]
+
+
+def render_gemini(
+    api_key: str,
+    prompt: str,
+    output_path: Path,
+    model: str = GEMINI_IMAGE_MODEL,
+    deadline: Deadline = None,
+    size: str = None,
+) -> str:
+    """Generate one image with Gemini, save it to output_path and return its SHA-256."""
+    return render_gemini_candidates(api_key, prompt, [output_path], model, deadline, size)[0]
+
+
+def render_gemini_candidates(
+    api_key: str,
+    prompt: str,
+    output_paths: list,
+    model: str = GEMINI_IMAGE_MODEL,
+    deadline: Deadline = None,
+    size: str = None,
+) -> list:
+    """
+    Ask Gemini for one candidate per output path in a single request and save each image.
+
+    The inline image bytes are written as returned; they are only decoded and
+    re-encoded when an output path's suffix asks for a different format.
+
+    Args:
+        output_paths: Where to save the candidates, in order
+        size: WIDTHxHEIGHT, sent as the closest supported aspect ratio
+            (None lets the model choose)
+
+    Returns:
+        SHA-256 of each saved image; fewer than requested if Gemini returned fewer
+
+    Raises:
+        ValueError: If the response contains no image
+    """
+    client = gemini_client(api_key)
+    from google.genai import types
+
+    deadline = deadline or Deadline()
+    aspect_ratio = gemini_aspect_ratio(size) if size else None
+    # Spans and the latency history both label renders by aspect ratio
+    history_size = aspect_ratio or "auto"
+    candidates = len(output_paths)
+    start_time = time.time()
+    with tracing.span("generate", provider="gemini", model=model, size=history_size, candidates=candidates):
+        with tracing.span("render", provider="gemini", model=model, size=history_size, candidates=candidates):
+            with rate_limit.slot("gemini:images", deadline):
+                # The image comes back inline, so render and download share what is left
+                timeout = deadline.seconds(RENDER_TIMEOUT)
+                response = client.models.generate_content(
+                    model=model,
+                    contents=[prompt],
+                    config=types.GenerateContentConfig(
+                        candidate_count=len(output_paths) if len(output_paths) > 1 else None,
+                        image_config=types.ImageConfig(aspect_ratio=aspect_ratio) if aspect_ratio else None,
+                        http_options=types.HttpOptions(timeout=int(timeout * 1000)),
+                    ),
+                )
+
+        images = []
+        for candidate in response.candidates or []:
+            for part in candidate.content.parts if candidate.content else []:
+                if part.text is not None:
+                    print(f"Model response: {part.text}")
+                elif part.inline_data is not None:
+                    images.append(part.inline_data.data)
+
+        if not images:
+            raise ValueError("No image was generated in the response")
+        if len(images) < len(output_paths):
+            print(f"Warning: asked for {len(output_paths)} candidates, Gemini returned {len(images)}", file=sys.stderr)
+
+        hashes = []
+        for data, path in zip(images, output_paths):
+            print(f"Saving image to {path}...")
+            with tracing.span("write", provider="gemini", bytes=len(data)):
+                hashes.append(write_image(path, data))
+            print(f"✓ Image saved to {path}")
+
+        # Several candidates take longer than one; only single renders set hedge deadlines
+        if candidates == 1:
+            latency_history.record("gemini", history_size, time.time() - start_time)
+        return hashes
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Token-bucket rate limits shared by every script run on this machine.
+
+Each provider endpoint has a bucket (a sustained request rate and a burst)
+and a concurrency limit, kept in ~/.cache/workfort/rate_limits.json under
+a file lock, so parallel generators, batch workers and the image daemon all
+draw on the same allowance. Endpoints whose provider also has a bucket
+(Kimi and Hunyuan share NOVITA_API_KEY) need a token and a free slot in
+both. A caller that would exceed a limit waits its turn instead of sending
+a request the provider would refuse.
+
+429 responses feed back into the endpoint's bucket: its rate halves (down
+to a floor), its tokens are drained, and it pauses for Retry-After. Each
+success adds back a tenth of the configured rate, so throughput climbs
+back to the configured maximum once the provider stops refusing.
+
+LIMITS holds conservative defaults. WORKFORT_RATE_LIMITS takes JSON
+overrides for accounts with higher limits, e.g.
+'{"openai:images": {"rate": 0.25, "concurrency": 8}}'.
+
+Usage:
+    python scripts/rate_limit.py
+    python scripts/rate_limit.py reset openai:images
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+import cassette
+from deadline import Deadline
+from disk_cache import cache_dir, locked, write_json_atomic
+
+# Bucket -> sustained requests per second, burst size and requests in flight.
+# "provider:endpoint" buckets also draw on their "provider" bucket if it has one.
+LIMITS = {
+    "novita": {"rate": 5.0, "burst": 10, "concurrency": 12},
+    "novita:chat": {"rate": 1.0, "burst": 4, "concurrency": 4},
+    "novita:submit": {"rate": 1.0, "burst": 4, "concurrency": 4},
+    "novita:poll": {"rate": 4.0, "burst": 8, "concurrency": 8},
+    "openai:images": {"rate": 5 / 60, "burst": 2, "concurrency": 4},
+    "gemini:images": {"rate": 10 / 60, "burst": 4, "concurrency": 4},
+}
+DEFAULT_LIMIT = {"rate": 1.0, "burst": 4, "concurrency": 4}
+
+# A 429 halves the rate, never below this fraction of the configured rate;
+# each success restores this fraction of it
+MIN_RATE_FRACTION = 1 / 16
+RECOVERY_FRACTION = 0.1
+
+# Longest single sleep while queued, so freed slots are noticed promptly
+MAX_WAIT_STEP = 0.5
+# Slots held longer than this (or by a process that no longer exists) are reclaimed
+LEASE_MAX_SECONDS = 3600
+
+
+def _state_path():
+    return cache_dir() / "rate_limits.json"
+
+
+def _lock_path():
+    return cache_dir() / ".rate_limits.lock"
+
+
+def _load() -> dict:
+    try:
+        return json.loads(_state_path().read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+@functools.cache
+def _overrides() -> dict:
+    try:
+        return json.loads(os.environ.get("WORKFORT_RATE_LIMITS") or "{}")
+    except ValueError:
+        print("Warning: ignoring WORKFORT_RATE_LIMITS, it is not valid JSON", file=sys.stderr)
+        return {}
+
+
+def limit(name: str) -> dict:
+    """Configured rate, burst and concurrency of a bucket, including overrides."""
+    return {**DEFAULT_LIMIT, **LIMITS.get(name, {}), **_overrides().get(name, {})}
+
+
+def buckets_for(name: str) -> list:
+    """Buckets a request to name draws on: its provider's (if configured) and its own."""
+    provider = name.split(":")[0]
+    if provider != name and (provider in LIMITS or provider in _overrides()):
+        return [provider, name]
+    return [name]
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _refill(state: dict, config: dict, now: float):
+    """Bring a bucket's tokens up to now and drop slots of dead or stuck holders."""
+    state["rate"] = min(config["rate"], state.get("rate", config["rate"]))
+    elapsed = max(0.0, now - state.get("updated", now))
+    state["tokens"] = min(config["burst"], state.get("tokens", config["burst"]) + elapsed * state["rate"])
+    state["updated"] = now
+
+    leases = state.setdefault("leases", {})
+    for lease, started in list(leases.items()):
+        if now - started > LEASE_MAX_SECONDS or not _alive(int(lease.split(":")[0])):
+            del leases[lease]
+
+
+def _wait(state: dict, config: dict, now: float) -> float:
+    """Seconds until the bucket could grant a request (0 if it can now)."""
+    waits = [state.get("paused_until", 0.0) - now]
+    if state["tokens"] < 1:
+        waits.append((1 - state["tokens"]) / state["rate"])
+    if len(state["leases"]) >= config["concurrency"]:
+        # Freed by another holder's release; check again shortly
+        waits.append(MAX_WAIT_STEP)
+    return max(0.0, *waits)
+
+
+def acquire(name: str, deadline: Deadline = None) -> str:
+    """
+    Wait for a token and a free slot in every bucket name draws on and take them.
+
+    Returns:
+        Lease id to pass to release()
+
+    Raises:
+        DeadlineExceeded: If the deadline passes while queued
+    """
+    deadline = deadline or Deadline()
+    names = buckets_for(name)
+    lease = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    announced = False
+
+    while True:
+        with locked(_lock_path()):
+            buckets = _load()
+            now = time.time()
+            wait = 0.0
+            for bucket in names:
+                state = buckets.setdefault(bucket, {})
+                _refill(state, limit(bucket), now)
+                wait = max(wait, _wait(state, limit(bucket), now))
+            if wait == 0:
+                for bucket in names:
+                    buckets[bucket]["tokens"] -= 1
+                    buckets[bucket]["leases"][lease] = now
+            write_json_atomic(_state_path(), buckets)
+
+        if wait == 0:
+            return lease
+
+        deadline.check()
+        if not announced and wait > 1:
+            print(f"  Rate limit: queued for {name} (~{wait:.1f}s)", file=sys.stderr)
+            announced = True
+        deadline.sleep(min(wait, MAX_WAIT_STEP))
+
+
+def release(name: str, lease: str, status: int = None, retry_after: float = None):
+    """
+    Give back a slot and feed the outcome into the endpoint's rate.
+
+    Args:
+        status: HTTP status of the response; 429 throttles the bucket, other
+            errors and None (no response) leave the rate alone
+        retry_after: Seconds the provider asked to wait, for a 429
+    """
+    names = buckets_for(name)
+    with locked(_lock_path()):
+        buckets = _load()
+        now = time.time()
+        for bucket in names:
+            state = buckets.get(bucket)
+            if state is None:
+                continue
+            config = limit(bucket)
+            _refill(state, config, now)
+            state["leases"].pop(lease, None)
+            if bucket != name:
+                continue
+
+            if status == 429:
+                state["rate"] = max(config["rate"] * MIN_RATE_FRACTION, state["rate"] / 2)
+                state["tokens"] = 0.0
+                pause = retry_after if retry_after is not None else 1 / state["rate"]
+                state["paused_until"] = max(state.get("paused_until", 0.0), now + pause)
+                state["throttled"] = state.get("throttled", 0) + 1
+            elif status is not None and status < 400:
+                state["rate"] = min(config["rate"], state["rate"] + config["rate"] * RECOVERY_FRACTION)
+        write_json_atomic(_state_path(), buckets)
+
+
+def error_status(error: BaseException) -> tuple:
+    """(HTTP status, Retry-After seconds) carried by an SDK or requests exception, or (None, None)."""
+    response = getattr(error, "response", None)
+    status = (
+        getattr(error, "status_code", None)
+        or getattr(error, "code", None)
+        or getattr(response, "status_code", None)
+    )
+    if not isinstance(status, int):
+        return None, None
+
+    headers = getattr(response, "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        retry_after = None
+    return status, retry_after
+
+
+class Slot:
+    """A granted request; report() its response status so the rate can adapt."""
+
+    def __init__(self):
+        self.status = None
+        self.retry_after = None
+
+    def report(self, status: int, retry_after: float = None):
+        self.status = status
+        self.retry_after = retry_after
+
+
+@contextmanager
+def slot(name: str, deadline: Deadline = None):
+    """
+    Hold one request's worth of name's rate and concurrency for the block.
+
+    The block's outcome is fed back on exit: whatever it report()ed, else
+    the status of an exception it raised (a 429 from an SDK, say), else
+    success. A None name is unlimited, for callers that take a bucket
+    optionally, and so is a replayed run, which never reaches the provider.
+    """
+    granted = Slot()
+    if name is None or cassette.replaying():
+        yield granted
+        return
+
+    lease = acquire(name, deadline)
+    try:
+        yield granted
+    except BaseException as e:
+        if granted.status is None:
+            granted.report(*error_status(e))
+        release(name, lease, granted.status, granted.retry_after)
+        raise
+    release(name, lease, granted.status if granted.status is not None else 200, granted.retry_after)
+
+
+def status():
+    """Print each bucket's current rate, tokens, slots in use and 429 count."""
+    buckets = _load()
+    now = time.time()
+    names = sorted(set(LIMITS) | set(buckets))
+    print(f"{'bucket':16} {'rate/s':>13} {'tokens':>8} {'in flight':>10} {'429s':>5}")
+    for name in names:
+        config = limit(name)
+        state = buckets.get(name, {})
+        _refill(state, config, now)
+        rate = f"{state['rate']:.3g}/{config['rate']:.3g}"
+        flight = f"{len(state['leases'])}/{config['concurrency']}"
+        paused = state.get("paused_until", 0.0) - now
+        note = f"  paused {paused:.1f}s" if paused > 0 else ""
+        print(
+            f"{name:16} {rate:>13} {state['tokens']:>8.1f} {flight:>10} {state.get('throttled', 0):>5}{note}"
+        )
+
+
+def reset(names: list) -> list:
+    """Forget the adapted state of the named buckets (all if none are named)."""
+    with locked(_lock_path()):
+        buckets = _load()
+        removed = [name for name in (names or list(buckets)) if buckets.pop(name, None) is not None]
+        write_json_atomic(_state_path(), buckets)
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or reset the shared provider rate limits")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("status", help="Show every bucket (default)")
+    reset_parser = subparsers.add_parser("reset", help="Restore buckets to their configured rates")
+    reset_parser.add_argument("names", nargs="*", help="Buckets to reset (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "reset":
+        removed = reset(args.names)
+        print(f"✓ Reset {len(removed)} buckets")
+    else:
+        status()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store of generated images.
+
+Every image a generator produces is kept under the local cache
+(~/.cache/workfort/results) by the SHA-256 of its bytes, and indexed by a key
+built from provider, model, final prompt, size, quality and seed. When the
+same request comes round again the stored bytes are placed at the output path
+(reflink, then hardlink, then copy) instead of paying for a new render.
+Each new render is also checked against the perceptual index
+(image_index.py), which warns when it nearly duplicates an existing image.
+
+Usage:
+    python scripts/result_store.py stats
+    python scripts/result_store.py dedupe static/img --dry-run
+"""
+
+import argparse
+import fcntl
+import hashlib
+import os
+import shutil
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from disk_cache import DiskCache, cache_dir, make_key
+
+# Linux FICLONE ioctl (copy-on-write clone on btrfs/XFS)
+FICLONE = 0x40049409
+
+_index = None
+
+
+def index() -> DiskCache:
+    """Shared request-key -> object index."""
+    global _index
+    if _index is None:
+        _index = DiskCache("results/index", max_entries=100_000, max_bytes=256 * 1024 * 1024, max_age=365 * 24 * 3600)
+    return _index
+
+
+def request_key(provider: str, model: str, prompt: str, size: str, quality=None, seed=None) -> str:
+    """Key identifying a generation request."""
+    return make_key(provider, model, prompt, size, quality, seed)
+
+
+def file_sha256(path: Path) -> str:
+    """Hash a file in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_path(sha256: str, suffix: str) -> Path:
+    """Location of a stored object."""
+    return cache_dir("results", "objects", sha256[:2]) / f"{sha256}{suffix}"
+
+
+def place(source: Path, dest: Path) -> str:
+    """
+    Materialize source at dest as cheaply as the filesystem allows.
+
+    Any existing dest is unlinked first, so writing to a linked file later can
+    never modify the stored copy through a shared inode.
+
+    Returns:
+        "reflink", "hardlink" or "copy"
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.unlink(missing_ok=True)
+
+    try:
+        with open(source, "rb") as src, open(dest, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return "reflink"
+    except OSError:
+        dest.unlink(missing_ok=True)
+
+    try:
+        os.link(source, dest)
+        return "hardlink"
+    except OSError:
+        pass
+
+    shutil.copyfile(source, dest)
+    return "copy"
+
+
+def fetch(key: str, output_path: Path) -> bool:
+    """Place a stored result for key at output_path. Returns False on a miss."""
+    entry = index().get(key)
+    if entry is None:
+        return False
+
+    source = object_path(entry["sha256"], entry["suffix"])
+    if not source.exists():
+        return False
+
+    method = place(source, output_path)
+    print(f"✓ Result store hit ({method}): {output_path}")
+    return True
+
+
+def store(key: str, output_path: Path, sha256: str = None, **metadata) -> str:
+    """
+    Add a generated image to the store and index it under key.
+
+    Args:
+        key: Request key from request_key()
+        output_path: The freshly generated image
+        sha256: Digest of output_path if already known
+        **metadata: Extra fields recorded in the index entry
+
+    Returns:
+        SHA-256 of the stored image
+    """
+    sha256 = sha256 or file_sha256(output_path)
+    dest = object_path(sha256, output_path.suffix)
+
+    if not dest.exists():
+        tmp = dest.with_name(f".{dest.name}.tmp")
+        place(output_path, tmp)
+        os.replace(tmp, dest)
+
+    index().put(key, {"sha256": sha256, "suffix": output_path.suffix, **metadata})
+
+    from image_index import flag_duplicates
+
+    flag_duplicates(output_path)
+    return sha256
+
+
+def dedupe(root: Path, dry_run: bool = False) -> int:
+    """
+    Hardlink byte-identical files under root together.
+
+    Returns:
+        Number of bytes reclaimed (or reclaimable, with dry_run)
+    """
+    by_size = defaultdict(list)
+    for path in sorted(root.rglob("*")):
+        if path.is_file() and not path.is_symlink():
+            by_size[path.stat().st_size].append(path)
+
+    saved = 0
+    for size, paths in by_size.items():
+        if len(paths) < 2:
+            continue
+
+        by_hash = defaultdict(list)
+        for path in paths:
+            by_hash[file_sha256(path)].append(path)
+
+        for duplicates in by_hash.values():
+            keep, *rest = duplicates
+            for path in rest:
+                if path.stat().st_ino == keep.stat().st_ino:
+                    continue
+                print(f"{'Would link' if dry_run else 'Linking'} {path} -> {keep}")
+                if not dry_run:
+                    tmp = path.with_name(f".{path.name}.dedupe")
+                    os.link(keep, tmp)
+                    os.replace(tmp, path)
+                saved += size
+
+    return saved
+
+
+def main():
+    """CLI for the result store."""
+    parser = argparse.ArgumentParser(description="Inspect the generated-image store and dedupe image trees")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("stats", help="Show store size and hit/miss counters")
+
+    dedupe_parser = subparsers.add_parser("dedupe", help="Hardlink identical files under a directory")
+    dedupe_parser.add_argument("root", nargs="?", default="static/img", help="Directory to scan (default: static/img)")
+    dedupe_parser.add_argument("--dry-run", action="store_true", help="Only report duplicates")
+
+    args = parser.parse_args()
+
+    if args.command == "dedupe":
+        saved = dedupe(Path(args.root), args.dry_run)
+        print(f"✓ {'Reclaimable' if args.dry_run else 'Reclaimed'}: {saved / 1024 / 1024:.2f} MiB")
+        return
+
+    objects = [p for p in cache_dir("results", "objects").rglob("*") if p.is_file()]
+    stats = index().stats()
+    print(f"Store: {cache_dir('results')}")
+    print(f"Objects: {len(objects)} ({sum(p.stat().st_size for p in objects) / 1024 / 1024:.1f} MiB)")
+    print(f"Hits: {stats.get('hits', 0)}, Misses: {stats.get('misses', 0)}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
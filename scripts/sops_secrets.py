@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+API keys from the sops-encrypted secrets.yaml, decrypted on demand.
+
+Scripts read their provider keys from the environment. A key that is not
+set there is filled in from secrets.yaml, decrypted with a single
+`sops -d --output-type json` into memory (never to disk) the first time a
+process needs one, so a run handed to the image daemon, a dry run or a
+replayed cassette never pays for sops at all. The image daemon calls
+load_secrets() once at startup instead.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+SECRETS_FILE = Path(__file__).resolve().parent.parent / "secrets.yaml"
+
+# Environment variable -> key in secrets.yaml
+SECRETS = {
+    "NOVITA_API_KEY": "novita_api_key",
+    "OPENAI_API_KEY": "openai_api_key",
+    "GEMINI_API_KEY": "gemini_api_key",
+}
+
+_lock = threading.Lock()
+_attempted = set()
+
+
+def decrypt_secrets(path: Path) -> dict:
+    """Decrypt a sops file once and return it as a dict."""
+    result = subprocess.run(
+        ["sops", "-d", "--output-type", "json", str(path)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def load_secrets(path: Path = SECRETS_FILE, verbose: bool = False):
+    """
+    Put API keys from the sops file into this process's environment, keeping any already set.
+
+    Decrypts at most once per file and process, even if it fails.
+
+    Args:
+        path: sops-encrypted secrets (default: secrets.yaml at the repository root)
+        verbose: Report which keys are available afterwards
+    """
+    path = Path(path)
+    with _lock:
+        missing = [name for name in SECRETS if not os.environ.get(name)]
+        if not missing or path.resolve() in _attempted:
+            return
+        _attempted.add(path.resolve())
+
+        try:
+            secrets = decrypt_secrets(path)
+        except (OSError, subprocess.CalledProcessError, ValueError) as e:
+            print(f"Warning: could not decrypt {path} ({e}); using keys from the environment only", file=sys.stderr)
+            return
+
+        for name in missing:
+            if secrets.get(SECRETS[name]):
+                os.environ[name] = secrets[SECRETS[name]]
+    if verbose:
+        print(f"✓ Decrypted {path} once ({', '.join(n for n in SECRETS if os.environ.get(n))} available)")
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Subset the site's web fonts to the characters it uses and convert them to WOFF2.
+
+The Literation Mono Nerd Font faces in static/fonts are about 2.2 MB each,
+nearly all of it Nerd Font icon glyphs the site never shows. This scans the
+committed sources (blog/, docs/, src/ and docusaurus.config.ts; never
+build/, whose contents change with every build) for the code points they
+contain, adds an allow-list (printable ASCII,
+Latin-1, typographic punctuation, arrows, box drawing and the Powerline
+symbols by default), and writes each face restricted to those characters as
+WOFF2:
+
+  - static/fonts/subset/<face>.<glyph hash>.woff2
+  - static/fonts/subset/manifest.json: source, output, glyph-set hash and
+    sizes per face
+  - src/css/fonts.css: the @font-face rules pointing at the subsets
+
+A face is only re-subset when its glyph set (the used code points it
+actually has) or its source file changes, so re-runs are cheap. Output names
+carry the glyph-set hash, so they can be cached as immutable.
+
+Usage:
+    python scripts/subset_fonts.py
+    python scripts/subset_fonts.py --allow U+2190-21FF U+25A0-25FF
+    python scripts/subset_fonts.py --check
+"""
+
+import argparse
+import html
+import json
+import re
+import sys
+from pathlib import Path
+
+try:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    print("Error: fonttools package not installed. Run: pip install fonttools brotli", file=sys.stderr)
+    sys.exit(1)
+
+from disk_cache import make_key, write_json_atomic
+from result_store import file_sha256
+
+FONT_DIR = Path("static/fonts")
+OUTPUT_DIR = FONT_DIR / "subset"
+MANIFEST_NAME = "manifest.json"
+CSS_PATH = Path("src/css/fonts.css")
+FAMILY = "LiterationMono Nerd Font"
+
+SCAN_ROOTS = (Path("blog"), Path("docs"), Path("src"), Path("docusaurus.config.ts"))
+SCAN_SUFFIXES = {".md", ".mdx", ".html", ".css", ".js", ".jsx", ".ts", ".tsx", ".yml", ".json"}
+
+# Always kept, whatever the content uses today
+DEFAULT_ALLOW = (
+    "U+0020-007E",  # printable ASCII
+    "U+00A0-00FF",  # Latin-1
+    "U+2010-2027",  # dashes, quotes, ellipsis
+    "U+2190-21FF",  # arrows
+    "U+2500-259F",  # box drawing and blocks
+    "U+E0A0-E0A3",  # Powerline
+    "U+E0B0-E0B3",
+)
+
+CSS_ESCAPE = re.compile(r"\\([0-9a-fA-F]{1,6})\s?")
+JS_ESCAPE = re.compile(r"\\u\{([0-9a-fA-F]{1,6})\}|\\u([0-9a-fA-F]{4})")
+
+
+def parse_ranges(ranges) -> set:
+    """Code points in "U+0020-007E" / "U+2500" style ranges."""
+    codepoints = set()
+    for value in ranges:
+        start, _, end = value.upper().removeprefix("U+").partition("-")
+        codepoints.update(range(int(start, 16), int(end or start, 16) + 1))
+    return codepoints
+
+
+def text_codepoints(text: str, css: bool = False) -> set:
+    """
+    Code points in text, including HTML entities and JS escapes.
+
+    CSS escapes (e.g. content: "\\e0b0") are only decoded with css, since in
+    scripts "\\d" and the like are regex classes, not characters.
+    """
+    codepoints = {ord(c) for c in html.unescape(text)}
+    if css:
+        for match in CSS_ESCAPE.finditer(text):
+            codepoints.add(int(match.group(1), 16))
+    for match in JS_ESCAPE.finditer(text):
+        codepoints.add(int(match.group(1) or match.group(2), 16))
+    return {c for c in codepoints if c <= 0x10FFFF}
+
+
+def used_codepoints(roots) -> set:
+    """Every code point in the content files under roots."""
+    codepoints = set()
+    for root in roots:
+        files = [root] if root.is_file() else (root.rglob("*") if root.exists() else [])
+        for path in files:
+            if path.suffix in SCAN_SUFFIXES and path.is_file() and OUTPUT_DIR not in path.parents:
+                text = path.read_text(encoding="utf-8", errors="ignore")
+                codepoints |= text_codepoints(text, css=path.suffix == ".css")
+    return codepoints
+
+
+def face_style(font: TTFont) -> tuple:
+    """(CSS font-weight, font-style) of a face, from its OS/2 table."""
+    os2 = font["OS/2"]
+    italic = bool(os2.fsSelection & 0x01)
+    return os2.usWeightClass, "italic" if italic else "normal"
+
+
+def unicode_range(codepoints) -> str:
+    """CSS unicode-range covering codepoints, merging consecutive runs."""
+    runs = []
+    for c in sorted(codepoints):
+        if runs and c == runs[-1][1] + 1:
+            runs[-1][1] = c
+        else:
+            runs.append([c, c])
+    return ", ".join(f"U+{a:X}" if a == b else f"U+{a:X}-{b:X}" for a, b in runs)
+
+
+def subset_face(source: Path, codepoints: set, output_path: Path):
+    """Write source restricted to codepoints as WOFF2."""
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["*"]
+    options.name_IDs = ["*"]
+    options.notdef_outline = True
+    # FontForge's private table, which fontTools cannot subset
+    options.drop_tables += ["PfEd"]
+
+    font = subset.load_font(str(source), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    subset.save_font(font, str(output_path), options)
+
+
+def write_css(faces: dict):
+    """Write the @font-face rules for the subset faces."""
+    rules = [f"/* Generated by scripts/subset_fonts.py from {FONT_DIR}/*.ttf - do not edit */"]
+    for entry in sorted(faces.values(), key=lambda e: (e["style"], e["weight"])):
+        rules.append(
+            "@font-face {\n"
+            f"  font-family: '{FAMILY}';\n"
+            f"  src: url('/{Path(entry['output']).relative_to('static').as_posix()}') format('woff2');\n"
+            f"  font-weight: {entry['weight']};\n"
+            f"  font-style: {entry['style']};\n"
+            "  font-display: swap;\n"
+            f"  unicode-range: {entry['unicode_range']};\n"
+            "}"
+        )
+    CSS_PATH.write_text("\n\n".join(rules) + "\n")
+
+
+def load_manifest() -> dict:
+    """Read the subset manifest, or an empty one if there is none yet."""
+    try:
+        return json.loads((OUTPUT_DIR / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def subset_fonts(allow: set, check: bool = False) -> tuple:
+    """
+    Re-subset every face whose glyph set or source changed, then rewrite the manifest and CSS.
+
+    Returns:
+        (manifest, names of the faces that were (or with check, would be) rewritten)
+    """
+    used = used_codepoints(SCAN_ROOTS)
+    wanted = used | allow
+    faces = load_manifest().get("faces", {})
+    changed = []
+
+    sources = sorted(FONT_DIR.glob("*.ttf"))
+    if not sources:
+        raise FileNotFoundError(f"No .ttf fonts in {FONT_DIR}")
+
+    for source in sources:
+        font = TTFont(source, lazy=True)
+        # Only code points the face can draw; the rest fall back to the next family
+        glyph_set = sorted(wanted & set(font.getBestCmap()))
+        source_sha256 = file_sha256(source)
+        glyph_hash = make_key(source_sha256, glyph_set)[:10]
+        output_path = OUTPUT_DIR / f"{source.stem}.{glyph_hash}.woff2"
+
+        entry = faces.get(source.stem)
+        if entry and entry["glyph_hash"] == glyph_hash and Path(entry["output"]).exists():
+            continue
+        changed.append(source.stem)
+        if check:
+            continue
+
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        subset_face(source, set(glyph_set), output_path)
+        if entry and entry["output"] != output_path.as_posix():
+            Path(entry["output"]).unlink(missing_ok=True)
+
+        weight, style = face_style(font)
+        faces[source.stem] = {
+            "source": source.as_posix(),
+            "output": output_path.as_posix(),
+            "glyph_hash": glyph_hash,
+            "glyphs": len(glyph_set),
+            "unicode_range": unicode_range(glyph_set),
+            "weight": weight,
+            "style": style,
+            "source_bytes": source.stat().st_size,
+            "bytes": output_path.stat().st_size,
+        }
+        print(
+            f"✓ {source.name}: {len(glyph_set)} glyphs, "
+            f"{faces[source.stem]['source_bytes'] / 1e6:.1f} MB -> {faces[source.stem]['bytes'] / 1e3:.0f} KB"
+        )
+
+    # Faces whose source was removed
+    for stem in set(faces) - {source.stem for source in sources}:
+        changed.append(stem)
+        if not check:
+            Path(faces.pop(stem)["output"]).unlink(missing_ok=True)
+
+    manifest = {"family": FAMILY, "faces": dict(sorted(faces.items()))}
+    if changed and not check:
+        write_json_atomic(OUTPUT_DIR / MANIFEST_NAME, manifest)
+        write_css(faces)
+    return manifest, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Subset the web fonts to the characters the site uses, as WOFF2")
+    parser.add_argument(
+        "--allow",
+        nargs="+",
+        default=[],
+        metavar="RANGE",
+        help="Extra code points to keep, e.g. U+2190-21FF U+25CF (added to the built-in allow-list)",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit with status 1 if any face is out of date, without writing anything",
+    )
+    args = parser.parse_args()
+
+    try:
+        allow = parse_ranges(DEFAULT_ALLOW + tuple(args.allow))
+    except ValueError:
+        parser.error("--allow ranges look like U+2190-21FF or U+25CF")
+
+    manifest, changed = subset_fonts(allow, check=args.check)
+    if args.check:
+        if changed:
+            print(f"✗ Out of date: {', '.join(changed)}; run: python scripts/subset_fonts.py", file=sys.stderr)
+            sys.exit(1)
+        print("✓ Font subsets are up to date")
+        return
+
+    faces = manifest["faces"].values()
+    total_source = sum(face["source_bytes"] for face in faces)
+    total = sum(face["bytes"] for face in faces)
+    state = f"{len(changed)} rewritten" if changed else "all up to date"
+    print(f"✓ {len(manifest['faces'])} faces ({state}): {total_source / 1e6:.1f} MB -> {total / 1e3:.0f} KB")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Per-phase timing spans written to a JSON-lines trace file.
+
+Scripts wrap each phase of a run (enhance, submit, queue, render, download,
+write, ...) in a span. Spans are no-ops until tracing is enabled with a
+--trace FILE flag (see add_trace_argument) or the WORKFORT_TRACE environment
+variable; then every finished span is appended to the file as one JSON
+object with its start/end time, duration, parent span, status and
+attributes such as provider, model, size, bytes and retries.
+
+Spans nest through contextvars, so phases inside a batch job (including
+work handed to asyncio.to_thread) are parented to that job. The trace file
+and trace id are per process for a CLI run; the image daemon runs each job
+in its own scope (see job_scope) so concurrent jobs never share either.
+
+Summarize one or many trace files:
+    python scripts/tracing.py trace.jsonl
+    python scripts/tracing.py traces/*.jsonl --by provider
+"""
+
+import argparse
+import contextlib
+import contextvars
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+_current = contextvars.ContextVar("span", default=None)
+_lock = threading.Lock()
+
+
+class _Trace:
+    """Where one run's spans go: its trace id, open file and default --trace path."""
+
+    def __init__(self, default_path=None):
+        self.id = uuid.uuid4().hex[:16]
+        self.file = None
+        self.default_path = default_path
+
+
+_process = _Trace(os.environ.get("WORKFORT_TRACE"))
+_scoped = contextvars.ContextVar("trace", default=None)
+
+
+def _trace() -> _Trace:
+    scoped = _scoped.get()
+    return scoped if scoped is not None else _process
+
+
+@contextlib.contextmanager
+def job_scope(default_path=None):
+    """
+    Give one in-process job (a daemon request) its own trace id and file.
+
+    Args:
+        default_path: The client's $WORKFORT_TRACE, used when the job's
+            arguments have no --trace of their own
+    """
+    scoped = _Trace(default_path)
+    token = _scoped.set(scoped)
+    try:
+        yield
+    finally:
+        _scoped.reset(token)
+        with _lock:
+            if scoped.file is not None:
+                scoped.file.close()
+                scoped.file = None
+
+
+# Attributes a span takes from its parent unless it sets them itself
+INHERITED = ("provider", "model")
+
+
+class Span:
+    """A timed phase. Attributes set while it runs are written when it ends."""
+
+    def __init__(self, phase: str, parent, attrs: dict):
+        self.phase = phase
+        self.id = uuid.uuid4().hex[:16]
+        self.parent = parent.id if parent is not None else None
+        self.attrs = attrs
+        self.start = time.time()
+
+        if parent is not None:
+            for name in INHERITED:
+                if name not in attrs and name in parent.attrs:
+                    attrs[name] = parent.attrs[name]
+
+    def set(self, **attrs):
+        """Add or replace attributes."""
+        self.attrs.update(attrs)
+
+    def count(self, name: str, n: int = 1):
+        """Increment a counter attribute such as retries or polls."""
+        self.attrs[name] = self.attrs.get(name, 0) + n
+
+
+class _NullSpan:
+    """Stand-in returned while tracing is disabled."""
+
+    def set(self, **attrs):
+        pass
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def enable(path):
+    """Append spans from this run (the process, or the current job scope) to the JSON-lines file at path."""
+    trace = _trace()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        if trace.file is not None:
+            trace.file.close()
+        trace.file = open(path, "a", buffering=1)
+
+
+def enabled() -> bool:
+    return _trace().file is not None
+
+
+def add_trace_argument(parser: argparse.ArgumentParser):
+    """Add the shared --trace FILE option to a script's argument parser."""
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=_trace().default_path,
+        help="Append per-phase timing spans to a JSON-lines file (default: $WORKFORT_TRACE)",
+    )
+
+
+def configure(args: argparse.Namespace):
+    """Enable tracing if the parsed arguments ask for it."""
+    if getattr(args, "trace", None):
+        enable(args.trace)
+
+
+def _write(trace: _Trace, record: dict):
+    line = json.dumps(record, default=str) + "\n"
+    with _lock:
+        if trace.file is not None:
+            trace.file.write(line)
+
+
+def current_span():
+    """The innermost running span, or a no-op span when there is none."""
+    span = _current.get()
+    return span if span is not None else _NULL_SPAN
+
+
+@contextlib.contextmanager
+def span(phase: str, **attrs):
+    """
+    Time a phase of the run.
+
+    Args:
+        phase: Phase name (e.g., enhance, submit, download)
+        **attrs: Attributes recorded with the span (provider, model, size, ...)
+
+    Yields:
+        The span, so attributes such as bytes can be added once known
+    """
+    if _trace().file is None:
+        yield _NULL_SPAN
+        return
+
+    current = Span(phase, _current.get(), attrs)
+    token = _current.set(current)
+    status, error = "ok", None
+    try:
+        yield current
+    except BaseException as e:
+        status, error = "error", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        _emit(current, time.time(), status, error)
+
+
+def record(phase: str, start: float, end: float, **attrs):
+    """Write a span whose boundaries were observed after the fact (e.g. queue wait)."""
+    if _trace().file is None:
+        return
+    recorded = Span(phase, _current.get(), attrs)
+    recorded.start = start
+    _emit(recorded, end, "ok", None)
+
+
+def _emit(finished: Span, end: float, status: str, error):
+    trace = _trace()
+    entry = {
+        "trace": trace.id,
+        "span": finished.id,
+        "parent": finished.parent,
+        "script": Path(sys.argv[0]).name,
+        "phase": finished.phase,
+        "start": round(finished.start, 6),
+        "end": round(end, 6),
+        "duration_s": round(end - finished.start, 6),
+        "status": status,
+    }
+    if error is not None:
+        entry["error"] = error
+    entry.update(finished.attrs)
+    _write(trace, entry)
+
+
+# ---------------------------------------------------------------------------
+# Summarizer
+# ---------------------------------------------------------------------------
+
+
+def load_spans(paths) -> list:
+    """Read spans from trace files, skipping lines that are not valid JSON."""
+    spans = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue
+    return spans
+
+
+def _percentile(values: list, pct: float) -> float:
+    rank = max(0, math.ceil(pct / 100 * len(values)) - 1)
+    return values[rank]
+
+
+def summarize(spans: list, by: str = None) -> list:
+    """
+    Aggregate spans per phase (and optionally per attribute such as provider).
+
+    Returns:
+        One dict per phase/group with the group's attribute value, count, errors, p50, p95, max, bytes and retries
+    """
+    groups = defaultdict(list)
+    for s in spans:
+        key = (s.get("phase"), s.get(by) if by else None)
+        groups[key].append(s)
+
+    rows = []
+    for (phase, value), members in sorted(groups.items(), key=lambda item: (str(item[0][0]), str(item[0][1]))):
+        durations = sorted(s["duration_s"] for s in members)
+        rows.append(
+            {
+                "phase": phase,
+                "group": value,
+                "count": len(members),
+                "errors": sum(1 for s in members if s.get("status") == "error"),
+                "p50_s": _percentile(durations, 50),
+                "p95_s": _percentile(durations, 95),
+                "max_s": durations[-1],
+                "bytes": sum(s.get("bytes", 0) for s in members),
+                "retries": sum(s.get("retries", 0) for s in members),
+            }
+        )
+    return rows
+
+
+def main():
+    """Print p50/p95 per phase across one or more trace files."""
+    parser = argparse.ArgumentParser(description="Summarize JSON-lines trace files per phase")
+    parser.add_argument("files", nargs="+", help="Trace files written with --trace")
+    parser.add_argument("--by", metavar="ATTR", help="Also group by a span attribute (e.g., provider, model, size)")
+
+    args = parser.parse_args()
+
+    spans = load_spans(args.files)
+    if not spans:
+        print("No spans found")
+        return
+
+    runs = len({s.get("trace") for s in spans})
+    print(f"{len(spans)} spans from {runs} runs\n")
+
+    label = args.by or ""
+    print(
+        f"{'phase':14} {label:16} {'count':>6} {'err':>4} {'p50':>8} {'p95':>8} {'max':>8} "
+        f"{'MB':>8} {'retries':>7}"
+    )
+    for row in summarize(spans, args.by):
+        group = "" if row["group"] is None else str(row["group"])
+        print(
+            f"{row['phase']:14} {group:16} {row['count']:>6} {row['errors']:>4} "
+            f"{row['p50_s']:>7.2f}s {row['p95_s']:>7.2f}s {row['max_s']:>7.2f}s "
+            f"{row['bytes'] / 1024 / 1024:>8.1f} {row['retries']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+One fast-starting entry point for the image scripts.
+
+Subcommands map onto the existing scripts and take the same arguments:
+
+  generate  generate-image-hunyuan.py, generate-image.py (--provider openai),
+            generate-image-nanobana.py (--provider gemini) or
+            generate-image-hedged.py (--provider hedged)
+  batch     generate-image-hunyuan.py --batch FILE
+  enhance   enhance_prompt.py
+  advise    advise_prompt.py
+
+Only the chosen script is imported, and it loads requests and the provider
+SDKs when a client is first built, so --help and argument or API key errors
+return without importing any of them. Runs go to the image daemon when one
+is listening (see image_daemon.py). bench_startup.py tracks the cold-start
+time of each subcommand.
+
+Usage:
+    python scripts/workfort-img.py generate --prompt "..." --output static/img/hero/post.png --size 1536x1024
+    python scripts/workfort-img.py generate --provider openai --prompt "..." --output static/img/avatars/a.png
+    python scripts/workfort-img.py batch jobs.jsonl --concurrency 8
+    python scripts/workfort-img.py enhance "A futuristic city"
+    python scripts/workfort-img.py advise --prompt "A warrior in battle"
+"""
+
+import argparse
+import sys
+
+import daemon_client
+from image_jobs import run_job
+
+# --provider -> job that renders with it
+PROVIDERS = {
+    "hunyuan": "hunyuan",
+    "openai": "openai",
+    "gemini": "nanobana",
+    "hedged": "hedged",
+}
+
+COMMANDS = {
+    "generate": "Render one image (--provider hunyuan|openai|gemini|hedged, default: hunyuan)",
+    "batch": "Render many Hunyuan images from a JSON-lines FILE ('-' for stdin)",
+    "enhance": "Enhance prompts with Kimi K2.5",
+    "advise": "Get advice on a prompt idea from Kimi K2.5",
+}
+
+
+def resolve(command: str, args: list) -> tuple:
+    """
+    Translate a subcommand and its arguments into a job and that script's argv.
+
+    Returns:
+        (job name, argv for the job's main())
+    """
+    if command == "generate":
+        parser = argparse.ArgumentParser(prog="workfort-img.py generate", add_help=False)
+        parser.add_argument("--provider", choices=PROVIDERS, default="hunyuan")
+        known, rest = parser.parse_known_args(args)
+        return PROVIDERS[known.provider], rest
+
+    if command == "batch":
+        if args and not args[0].startswith("-"):
+            return "hunyuan", ["--batch", args[0], *args[1:]]
+        return "hunyuan", args
+
+    return command, args
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate, enhance and advise on images for the WorkFort site",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(f"  {name:10}{help}" for name, help in COMMANDS.items()),
+    )
+    parser.add_argument("command", choices=COMMANDS, help="See COMMAND --help for its options")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    job, argv = resolve(args.command, args.args)
+    daemon_client.delegate(job, argv)
+    sys.exit(run_job(job, argv))
+
+
+if __name__ == "__main__":
+    main()